@@ -0,0 +1,385 @@
+"""
+Benchmarks for the visitor counter.
+
+Run from the billionth_visitor directory, e.g.:
+    python -m src.benchmark retention --increments 100000000
+    python -m src.benchmark increment --increments 1000000
+    python -m src.benchmark checkpoint --increments 2000000
+    python -m src.benchmark throughput --increments 1000000
+    python -m src.benchmark aggregation --max-shards 10000
+    python -m src.benchmark http --requests 20000 --concurrency 64
+    python -m src.benchmark all --json results.json
+
+Every suite can write its results as JSON with --json, so runs can be diffed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .checkpoint import Checkpointer
+from .counter_shard import CounterShard
+from .global_aggregator import GlobalAggregator
+from .regional_aggregator import RegionalAggregator
+from .retention import MilestoneRetention
+
+def get_rss_mb() -> float:
+    """Get the current resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        # Peak RSS: kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if os.uname().sysname == 'Darwin' else peak / 2**10
+
+def summarize(latencies_ns: List[int], elapsed_s: float) -> Dict:
+    """Reduce per-operation latencies to ops/s and p50/p99/max in microseconds."""
+    latencies_ns = sorted(latencies_ns)
+    count = len(latencies_ns)
+
+    def percentile(p: float) -> float:
+        if not count:
+            return 0.0
+        return round(latencies_ns[min(count - 1, int(p * count))] / 1000, 2)
+
+    return {
+        "ops": count,
+        "ops_per_sec": int(count / elapsed_s) if elapsed_s else 0,
+        "p50_us": percentile(0.50),
+        "p99_us": percentile(0.99),
+        "max_us": percentile(1.0)
+    }
+
+def bench_retention(increments: int = 100_000_000, report_every: int = 10_000_000) -> List[Dict]:
+    """Measure increments per second and RSS while a shard counts visits."""
+    shard = CounterShard(
+        shard_id="bench-shard",
+        retention=MilestoneRetention(target_count=increments // 2)
+    )
+    metadata = {"region_id": "bench", "shard_id": "bench-shard"}
+
+    results = []
+    print(f"{'increments':>14}{'incr/s':>12}{'rss MB':>10}{'retained':>10}")
+    start = last = time.perf_counter()
+    done = 0
+    while done < increments:
+        batch = min(report_every, increments - done)
+        for _ in range(batch):
+            shard.increment(metadata)
+        done += batch
+
+        now = time.perf_counter()
+        row = {
+            "increments": done,
+            "increments_per_sec": int(batch / (now - last)),
+            "rss_mb": round(get_rss_mb(), 1),
+            "retained_visits": len(shard.visits)
+        }
+        last = now
+        results.append(row)
+        print(f"{row['increments']:>14}{row['increments_per_sec']:>12}"
+              f"{row['rss_mb']:>10}{row['retained_visits']:>10}")
+
+    print(f"total: {int(increments / (time.perf_counter() - start))} increments/s")
+    return results
+
+@dataclass
+class LegacyVisit:
+    """Visit as increment used to build it: uuid4 id and datetime per visit."""
+    id: str
+    timestamp: datetime
+    metadata: Dict = field(default_factory=dict)
+    sequence: int = 0
+
+class LegacyCounterShard(CounterShard):
+    """CounterShard whose increment builds a LegacyVisit, with the same bookkeeping."""
+
+    def increment(self, metadata: Optional[Dict] = None) -> LegacyVisit:
+        number = self.counts.get(self.replica_id, 0) + 1
+        self.counts[self.replica_id] = number
+        self._apply_count_delta(1)
+        sequence = self._next_ticket() if self.allocator else self.count
+        visit = LegacyVisit(
+            id=str(uuid.uuid4()),
+            timestamp=datetime.utcnow(),
+            metadata=metadata or {},
+            sequence=sequence
+        )
+        self.retention.record(visit)
+        if self.count >= self.milestone_threshold and not self.high_precision_mode:
+            self.high_precision_mode = True
+        return visit
+
+def _time_increments(shard: CounterShard, increments: int) -> float:
+    """Time `increments` increments of a shard counted through a region."""
+    global_agg = GlobalAggregator()
+    region = RegionalAggregator(region_id="bench")
+    region.add_shard(shard)
+    global_agg.add_region(region)
+    metadata = {"region_id": "bench", "shard_id": shard.shard_id}
+
+    start = time.perf_counter()
+    for _ in range(increments):
+        shard.increment(metadata)
+    return time.perf_counter() - start
+
+def bench_increment(increments: int = 1_000_000) -> Dict:
+    """
+    Compare increments building uuid4 + datetime visits with compact visits.
+
+    Both shards lease tickets, notify their region and record every visit
+    in the default retention, so only the visit representation differs.
+    """
+    legacy_s = _time_increments(LegacyCounterShard(shard_id="bench-shard", block_size=10_000), increments)
+    increment_s = _time_increments(CounterShard(shard_id="bench-shard", block_size=10_000), increments)
+
+    result = {
+        "increments": increments,
+        "legacy_increment_ns": round(legacy_s / increments * 1e9),
+        "increment_ns": round(increment_s / increments * 1e9),
+        "speedup": round(legacy_s / increment_s, 2),
+        "increments_per_sec": int(increments / increment_s)
+    }
+    print(f"legacy increment: {result['legacy_increment_ns']} ns/visit")
+    print(f"increment:        {result['increment_ns']} ns/visit "
+          f"({result['increments_per_sec']} increments/s, {result['speedup']}x)")
+    return result
+
+async def _count_with_checkpoints(increments: int, interval_s: Optional[float], directory: str) -> Dict:
+    """Count visits on the event loop while checkpoints run every `interval_s`."""
+    global_agg = GlobalAggregator()
+    region = RegionalAggregator(region_id="bench")
+    for i in range(4):
+        region.add_shard(CounterShard(shard_id=f"bench-shard-{i}", block_size=10_000))
+    global_agg.add_region(region)
+    shards = list(region.shards.values())
+
+    checkpointer = None
+    task = None
+    if interval_s is not None:
+        checkpointer = Checkpointer(path=os.path.join(directory, f"checkpoint-{interval_s}.log"), interval_s=interval_s)
+        checkpointer.recover(global_agg)
+        task = asyncio.create_task(checkpointer.checkpoint_loop(global_agg))
+
+    start = time.perf_counter()
+    done = 0
+    while done < increments:
+        # Yield regularly, like a server handling requests
+        for _ in range(1_000):
+            shards[done % 4].increment()
+            done += 1
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        checkpointer.close()
+    return {
+        "interval_s": interval_s,
+        "increments_per_sec": int(increments / elapsed),
+        "fsyncs": checkpointer.stats["fsyncs"] if checkpointer else 0
+    }
+
+def bench_checkpoint(increments: int = 2_000_000) -> List[Dict]:
+    """Measure increment throughput without and with checkpointing."""
+    results = []
+    print(f"{'interval s':>12}{'incr/s':>12}{'fsyncs':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for interval_s in (None, 1.0, 0.1, 0.01):
+            row = asyncio.run(_count_with_checkpoints(increments, interval_s, directory))
+            results.append(row)
+            label = "off" if interval_s is None else interval_s
+            print(f"{label:>12}{row['increments_per_sec']:>12}{row['fsyncs']:>8}")
+    return results
+
+def bench_throughput(increments: int = 1_000_000, shards: int = 12) -> Dict:
+    """Time every in-process increment through a full region/global setup."""
+    global_agg = GlobalAggregator()
+    region = RegionalAggregator(region_id="bench")
+    for i in range(shards):
+        region.add_shard(CounterShard(shard_id=f"bench-shard-{i}", block_size=10_000))
+    global_agg.add_region(region)
+    shard_list = list(region.shards.values())
+    metadata = {"region_id": "bench"}
+
+    latencies = [0] * increments
+    clock = time.perf_counter_ns
+    start = time.perf_counter()
+    for i in range(increments):
+        began = clock()
+        visit = shard_list[i % shards].increment(metadata)
+        global_agg.check_for_winner(visit)
+        latencies[i] = clock() - began
+    result = summarize(latencies, time.perf_counter() - start)
+    print(f"increment: {result['ops_per_sec']} ops/s, p50 {result['p50_us']}us, p99 {result['p99_us']}us")
+    return result
+
+def bench_aggregation(max_shards: int = 10_000, rounds: int = 200) -> List[Dict]:
+    """Measure aggregation costs as the number of shards grows."""
+    results = []
+    print(f"{'shards':>8}{'snapshot p50':>14}{'snapshot p99':>14}{'reconcile p50':>15}{'reconcile p99':>15}")
+    shard_count = 10
+    while shard_count <= max_shards:
+        global_agg = GlobalAggregator()
+        regions = [RegionalAggregator(region_id=f"region-{r}") for r in range(10)]
+        for i in range(shard_count):
+            shard = CounterShard(shard_id=f"shard-{i}", count=i)
+            regions[i % len(regions)].add_shard(shard)
+        for region in regions:
+            global_agg.add_region(region)
+
+        # One aggregation round: every region publishes a snapshot
+        snapshot_ns = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            began = time.perf_counter_ns()
+            for region in regions:
+                global_agg.receive_snapshot(region.take_snapshot())
+            snapshot_ns.append(time.perf_counter_ns() - began)
+        snapshot = summarize(snapshot_ns, time.perf_counter() - start)
+
+        reconcile_ns = []
+        start = time.perf_counter()
+        for _ in range(max(rounds // 10, 1)):
+            began = time.perf_counter_ns()
+            global_agg.reconcile()
+            reconcile_ns.append(time.perf_counter_ns() - began)
+        reconcile = summarize(reconcile_ns, time.perf_counter() - start)
+
+        row = {"shards": shard_count, "snapshot_round": snapshot, "reconcile": reconcile}
+        results.append(row)
+        print(f"{shard_count:>8}{snapshot['p50_us']:>12}us{snapshot['p99_us']:>12}us"
+              f"{reconcile['p50_us']:>13}us{reconcile['p99_us']:>13}us")
+        shard_count *= 10
+    return results
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_for_port(port: int, timeout_s: float = 30.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not start on port {port}")
+
+def bench_http(requests: int = 20_000, concurrency: int = 64) -> Dict:
+    """
+    Load test POST /visit on a local server with an async client.
+
+    The app runs under uvicorn in a child process, so the client does not
+    compete with it for the GIL, with checkpoints in a temporary directory.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        port = _free_port()
+        env = {**os.environ, "CHECKPOINT_PATH": os.path.join(directory, "checkpoint.log")}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.main:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            env=env
+        )
+        try:
+            _wait_for_port(port)
+            result = asyncio.run(_load_visits(port, requests, concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"POST /visit: {result['ops_per_sec']} req/s, p50 {result['p50_us']}us, "
+          f"p99 {result['p99_us']}us, {result['errors']} errors")
+    return result
+
+async def _load_visits(port: int, requests: int, concurrency: int) -> Dict:
+    """Send `requests` visits over `concurrency` connections and time each one."""
+    import aiohttp
+
+    base = f"http://127.0.0.1:{port}"
+    latencies: List[int] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{base}/metrics") as response:
+            regions = (await response.json())["regions"]
+        targets = [
+            (region_id, f"{region_id}-shard-{i}")
+            for region_id, region in regions.items()
+            for i in range(region["shard_count"])
+        ]
+
+        async def client() -> None:
+            nonlocal errors
+            for i in remaining:
+                region_id, shard_id = targets[i % len(targets)]
+                began = time.perf_counter_ns()
+                async with session.post(f"{base}/visit", json={"region_id": region_id, "shard_id": shard_id}) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                latencies.append(time.perf_counter_ns() - began)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {**summarize(latencies, elapsed), "errors": errors, "concurrency": concurrency}
+
+BENCHMARKS = {
+    "retention": lambda args: bench_retention(
+        increments=args.increments or 100_000_000,
+        report_every=max((args.increments or 100_000_000) // 10, 1)
+    ),
+    "increment": lambda args: bench_increment(increments=args.increments or 1_000_000),
+    "checkpoint": lambda args: bench_checkpoint(increments=args.increments or 2_000_000),
+    "throughput": lambda args: bench_throughput(increments=args.increments or 1_000_000),
+    "aggregation": lambda args: bench_aggregation(max_shards=args.max_shards),
+    "http": lambda args: bench_http(requests=args.requests, concurrency=args.concurrency)
+}
+
+# Suites run by "all": the retention run is too long to include
+ALL_SUITES = ["increment", "throughput", "aggregation", "checkpoint", "http"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Visitor counter benchmarks")
+    parser.add_argument("suite", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--increments", type=int, default=None, help="defaults depend on the suite")
+    parser.add_argument("--max-shards", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    suites = ALL_SUITES if args.suite == "all" else [args.suite]
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.time(),
+        "results": {}
+    }
+    for suite in suites:
+        print(f"== {suite}")
+        results["results"][suite] = BENCHMARKS[suite](args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"results written to {args.json}")
@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional, TYPE_CHECKING
+import asyncio
+import json
+import time
+
+if TYPE_CHECKING:
+    from .global_aggregator import GlobalAggregator
+
+@dataclass
+class SnapshotBroadcaster:
+    """
+    Serializes the latest global snapshot once per tick for every subscriber.
+
+    The tick follows the shortest aggregation interval of any region, so
+    subscribers see each new snapshot once, however many there are. Slow
+    subscribers skip to the newest frame instead of queueing old ones.
+    """
+    global_agg: 'GlobalAggregator'
+    frame: str = ""
+    version: int = 0
+    subscribers: int = 0
+    _tick: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def get_interval_s(self) -> float:
+        """Seconds until the next frame: the shortest region aggregation interval."""
+        intervals = [region.aggregation_interval_ms for region in self.global_agg.regions.values()]
+        return min(intervals, default=1000) / 1000
+
+    def build_frame(self) -> str:
+        """Serialize the latest snapshot, without recounting any shard."""
+        snapshot = self.global_agg.get_snapshot()
+        eta_s = self.global_agg.rate.get_eta_s(self.global_agg.target_count - snapshot.count)
+        winner = self.global_agg.get_winner()
+        return json.dumps({
+            "count": snapshot.count,
+            "target_count": self.global_agg.target_count,
+            "approaching_target": snapshot.approaching_target,
+            "rate_per_s": round(self.global_agg.rate.get_rate(), 1),
+            "eta_s": None if eta_s is None else round(eta_s, 1),
+            "snapshot_age_ms": round((time.time() - snapshot.taken_at) * 1000, 1),
+            "winner_ticket": winner.sequence if winner else None
+        }, separators=(",", ":"))
+
+    def publish(self) -> None:
+        """Build a frame and wake every subscriber."""
+        self.frame = self.build_frame()
+        self.version += 1
+        tick, self._tick = self._tick, asyncio.Event()
+        tick.set()
+
+    async def run(self) -> None:
+        """Publish a frame every tick until cancelled."""
+        while True:
+            self.publish()
+            await asyncio.sleep(self.get_interval_s())
+
+    async def subscribe(self, max_frames: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Yield the current frame, then every new one.
+
+        Args:
+            max_frames: Stop after this many frames
+        """
+        self.subscribers += 1
+        try:
+            if not self.version:
+                self.publish()
+            sent = 0
+            while True:
+                version = self.version
+                yield self.frame
+                sent += 1
+                if max_frames is not None and sent >= max_frames:
+                    return
+                if self.version == version:
+                    await self._tick.wait()
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,260 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+
+from .counter_shard import CounterShard, Visit
+from .sequence import SequenceBackend
+
+if TYPE_CHECKING:
+    from .global_aggregator import GlobalAggregator
+
+@dataclass
+class DurableSequence(SequenceBackend):
+    """
+    Ticket sequence whose high-water mark is made durable ahead of use.
+
+    Before a reservation goes past the durable ceiling, the ceiling is
+    raised by `chunk` tickets and fsynced. After a crash the sequence
+    resumes above the ceiling, so no ticket is handed out twice; at most
+    `chunk` tickets are skipped. The ceiling never jumps past the target
+    before the target ticket is handed out, so the target is never skipped.
+    """
+    inner: SequenceBackend
+    checkpointer: 'Checkpointer'
+    target_count: int
+    chunk: int = 1_000_000
+    ceiling: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def reserve(self, count: int = 1) -> int:
+        first = self.inner.reserve(count)
+        last = first + count - 1
+        if last > self.ceiling:
+            with self.lock:
+                if last > self.ceiling:
+                    ceiling = last + self.chunk
+                    if last < self.target_count:
+                        ceiling = min(ceiling, self.target_count - 1)
+                    self.checkpointer.write_ceiling(ceiling)
+                    self.ceiling = ceiling
+        return first
+
+    def advance_to(self, value: int) -> None:
+        self.inner.advance_to(value)
+
+def read_ticket_state(path: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Read the ticket ceiling and winner recorded in checkpoint files.
+
+    `path` and every per-worker file next to it (`<path>.worker-<n>`, from
+    any earlier worker count) are read, stopping at a torn line.
+
+    Returns:
+        The highest ceiling (0 if none) and the winner (None if none)
+    """
+    ceiling = 0
+    winner = None
+    for file_path in [path] + sorted(glob.glob(glob.escape(path) + ".worker-*")):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record["type"] == "ceiling":
+                    ceiling = max(ceiling, record["value"])
+                elif record["type"] == "winner":
+                    winner = record["visit"]
+    return ceiling, winner
+
+@dataclass
+class Checkpointer:
+    """
+    Periodic, append-only checkpoints of shard counts.
+
+    Every `interval_s` the G-Counter entries that changed since the last
+    checkpoint are appended as one JSON line and fsynced, so the cost is one
+    write per interval no matter how many visits were counted. Entries only
+    grow, so recovery merges every line and a lost tail only loses the last
+    interval. Ticket ceilings and the winner are written synchronously.
+    """
+    path: str
+    interval_s: float = 1.0
+    ticket_chunk: int = 1_000_000
+    compact_bytes: int = 16 * 1024 * 1024  # Rewrite as one full checkpoint above this
+    written: Dict[str, Dict[str, int]] = field(default_factory=dict, repr=False)
+    ceiling: int = 0
+    winner: Optional[Dict[str, Any]] = None
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "checkpoints": 0,
+        "fsyncs": 0,
+        "compactions": 0,
+        "recovered_visits": 0
+    })
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    _file: Any = field(default=None, repr=False, compare=False)
+
+    def _append_locked(self, records: List[Dict]) -> None:
+        """Append records and fsync them as one batch; the caller holds the lock."""
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.stats["fsyncs"] += 1
+
+    def write_ceiling(self, ceiling: int) -> None:
+        """Durably record the highest ticket that may have been handed out."""
+        with self.lock:
+            self._append_locked([{"type": "ceiling", "value": ceiling}])
+            self.ceiling = ceiling
+
+    def write_winner(self, visit: Visit) -> None:
+        """Durably record the winning visit."""
+        winner = {
+            "replica_id": visit.replica_id,
+            "number": visit.number,
+            "timestamp_ns": visit.timestamp_ns,
+            "metadata": visit.metadata,
+            "sequence": visit.sequence
+        }
+        with self.lock:
+            self._append_locked([{"type": "winner", "visit": winner}])
+            self.winner = winner
+
+    def collect(self, global_agg: 'GlobalAggregator') -> Dict[str, Dict[str, int]]:
+        """Get the shard entries that changed since the last checkpoint."""
+        changed = {}
+        for region in global_agg.regions.values():
+            for shard_id, shard in region.shards.items():
+                written = self.written.get(shard_id, {})
+                delta = {
+                    replica_id: value
+                    for replica_id, value in shard.counts.items()
+                    if written.get(replica_id) != value
+                }
+                if delta:
+                    changed[shard_id] = delta
+        return changed
+
+    def checkpoint(self, changed: Dict[str, Dict[str, int]]) -> None:
+        """Append one checkpoint of changed shard entries."""
+        with self.lock:
+            if changed:
+                self._append_locked([{"type": "shards", "ts": time.time(), "shards": changed}])
+            for shard_id, delta in changed.items():
+                self.written.setdefault(shard_id, {}).update(delta)
+            self.stats["checkpoints"] += 1
+            if self._file is not None and self._file.tell() > self.compact_bytes:
+                self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        """Replace the log with one full checkpoint; the caller holds the lock."""
+        records = [{"type": "shards", "ts": time.time(), "shards": self.written}]
+        if self.ceiling:
+            records.append({"type": "ceiling", "value": self.ceiling})
+        if self.winner:
+            records.append({"type": "winner", "visit": self.winner})
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(tmp_path, self.path)
+        self.stats["compactions"] += 1
+
+    def recover(self, global_agg: 'GlobalAggregator') -> int:
+        """
+        Load the checkpoint into the aggregator and make future writes durable.
+
+        Shard entries are merged with the G-Counter rules, the sequence is
+        advanced past the durable ceiling and a recorded winner is restored.
+        A torn last line is cut off. Afterwards the running totals are
+        reconciled against the recovered shard counts.
+
+        Returns:
+            The number of visits recovered
+        """
+        shards: Dict[str, CounterShard] = {
+            shard_id: shard
+            for region in global_agg.regions.values()
+            for shard_id, shard in region.shards.items()
+        }
+        recovered = 0
+        valid = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Torn write at the tail
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    valid += len(line)
+                    if record["type"] == "shards":
+                        for shard_id, delta in record["shards"].items():
+                            written = self.written.setdefault(shard_id, {})
+                            for replica_id, value in delta.items():
+                                written[replica_id] = max(written.get(replica_id, 0), value)
+                            shard = shards.get(shard_id)
+                            if shard is not None:
+                                recovered += shard.apply_delta(delta)
+                    elif record["type"] == "ceiling":
+                        self.ceiling = max(self.ceiling, record["value"])
+                    elif record["type"] == "winner":
+                        self.winner = record["visit"]
+            if valid < os.path.getsize(self.path):
+                os.truncate(self.path, valid)
+
+        if self.ceiling:
+            global_agg.sequence.advance_to(self.ceiling)
+        if self.winner and global_agg.get_winner() is None:
+            global_agg.set_winner(Visit(**self.winner))
+        global_agg.use_sequence(DurableSequence(
+            inner=global_agg.sequence,
+            checkpointer=self,
+            target_count=global_agg.target_count,
+            chunk=self.ticket_chunk,
+            ceiling=self.ceiling
+        ))
+        global_agg.winner_listeners.append(self.write_winner)
+        global_agg.reconcile()
+        self.stats["recovered_visits"] = recovered
+        return recovered
+
+    async def checkpoint_loop(self, global_agg: 'GlobalAggregator') -> None:
+        """Checkpoint every `interval_s` until cancelled, then once more."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval_s)
+                # Collect on the event loop, write and fsync off it
+                await asyncio.to_thread(self.checkpoint, self.collect(global_agg))
+        finally:
+            self.checkpoint(self.collect(global_agg))
+
+    def close(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get checkpoint statistics."""
+        return {**self.stats, "ticket_ceiling": self.ceiling}
@@ -1,31 +1,114 @@
-from dataclasses import dataclass, field
-from datetime import datetime
-import uuid
-from typing import Dict, Optional
+from dataclasses import InitVar, dataclass, field
+from datetime import datetime, timezone
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .retention import VisitRetention, RingBufferRetention
 
-@dataclass
+@dataclass(slots=True)
 class Visit:
-    id: str
-    timestamp: datetime
-    metadata: Dict = field(default_factory=dict)
+    """
+    A counted visit, stored as plain integers.
+    
+    The string id and the datetime are only built when asked for, so
+    counting a visit costs one small allocation.
+    """
+    replica_id: str
+    number: int  # Monotonic per replica
+    timestamp_ns: int  # time.time_ns() when counted
+    metadata: Optional[Dict] = None
+    sequence: int = 0  # Position at which the visit was counted
+    
+    @property
+    def id(self) -> str:
+        """Unique visit id: replica id plus the replica's visit number."""
+        return f"{self.replica_id}-{self.number}"
+    
+    @property
+    def timestamp(self) -> datetime:
+        """When the visit was counted, as a naive UTC datetime."""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9, timezone.utc).replace(tzinfo=None)
 
 @dataclass
 class CounterShard:
     shard_id: str
-    count: int = 0
-    visits: Dict[str, Visit] = field(default_factory=dict)
+    # Initial count of this replica; afterwards `count` is a property
+    count: InitVar[int] = 0
+    retention: VisitRetention = field(default_factory=RingBufferRetention)
     high_precision_mode: bool = False
     milestone_threshold: int = 99_900_000_000  # 99.9B
+    # Called with every change of count, so aggregators can keep running totals
+    listeners: List[Callable[[int], None]] = field(default_factory=list, repr=False, compare=False)
+    # Anything with reserve(count) -> first ticket, usually the shard's region
+    allocator: Optional[Any] = field(default=None, repr=False, compare=False)
+    block_size: int = 1  # Tickets leased from the allocator at a time
+    lease_next: int = field(default=0, repr=False, compare=False)
+    lease_end: int = field(default=0, repr=False, compare=False)  # Exclusive
+    # G-Counter state: increments made by each replica of this shard
+    replica_id: str = ""  # Defaults to shard_id
+    counts: Dict[str, int] = field(default_factory=dict)
+    shipped: Dict[str, int] = field(default_factory=dict, repr=False, compare=False)
+    # Cached sum of counts, kept up to date by _apply_count_delta
+    _count: int = field(default=0, init=False, repr=False, compare=False)
+
+    def __post_init__(self, count: int):
+        if not self.replica_id:
+            self.replica_id = self.shard_id
+        if count and not self.counts:
+            self.counts[self.replica_id] = count
+        self._count = sum(self.counts.values())
+
+    def _get_count(self) -> int:
+        """Visits counted by all replicas of this shard (the sum of counts)."""
+        return self._count
+
+    def _set_count(self, value: int) -> None:
+        """Set the total; the difference is counted for this replica."""
+        delta = value - self._count
+        self.counts[self.replica_id] = self.counts.get(self.replica_id, 0) + delta
+        self._apply_count_delta(delta)
+
+    def add(self, delta: int) -> None:
+        """
+        Count `delta` visits of this replica without recording them.
+        
+        Used to seed or fast-forward a shard; listeners see the change like
+        any other increment.
+        """
+        if delta < 0:
+            raise ValueError("A G-Counter shard can only grow")
+        self.counts[self.replica_id] = self.counts.get(self.replica_id, 0) + delta
+        self._apply_count_delta(delta)
+
+    def _apply_count_delta(self, delta: int) -> None:
+        """Change the cached total and notify listeners."""
+        if delta:
+            self._count += delta
+            for listener in self.listeners:
+                listener(delta)
+
+    @property
+    def visits(self) -> Dict[str, Visit]:
+        """Visits kept in full detail by the retention policy."""
+        return self.retention.visits()
 
     def increment(self, metadata: Optional[Dict] = None) -> Visit:
-        """Increment the counter and return visit details."""
-        self.count += 1
-        visit = Visit(
-            id=str(uuid.uuid4()),
-            timestamp=datetime.utcnow(),
-            metadata=metadata or {}
-        )
-        self.visits[visit.id] = visit
+        """
+        Increment the counter and return visit details.
+        
+        With an allocator the visit's sequence is its global ticket, otherwise
+        it is the shard's own count. Tickets are leased from the allocator in
+        blocks of `block_size`, or one at a time in high precision mode so
+        tickets near the milestone are handed out in arrival order.
+        """
+        number = self.counts.get(self.replica_id, 0) + 1
+        self.counts[self.replica_id] = number
+        self._apply_count_delta(1)
+        if self.allocator:
+            sequence = self._next_ticket()
+        else:
+            sequence = self.count
+        visit = Visit(self.replica_id, number, time.time_ns(), metadata, sequence)
+        self.retention.record(visit)
         
         # Check if we should enter high precision mode
         if self.count >= self.milestone_threshold and not self.high_precision_mode:
@@ -33,14 +116,135 @@ class CounterShard:
             
         return visit
 
+    def increment_batch(self, metadata: List[Optional[Dict]]) -> List[Visit]:
+        """
+        Count one visit per metadata entry in a single step.
+        
+        The count, the listeners and the ticket allocator are each touched
+        once per batch instead of once per visit. Tickets come from the
+        current lease and then one reservation for the rest, so visits in
+        a batch get consecutive tickets except across that boundary.
+        
+        Returns:
+            The visits in batch order
+        """
+        size = len(metadata)
+        if not size:
+            return []
+        first = self.counts.get(self.replica_id, 0) + 1
+        self.counts[self.replica_id] = first + size - 1
+        self._apply_count_delta(size)
+        
+        if self.allocator:
+            tickets = self._take_tickets(size)
+        else:
+            tickets = [(self.count - size + 1, size)]
+        
+        sequences = [ticket for start, length in tickets for ticket in range(start, start + length)]
+        now = time.time_ns()
+        visits = [
+            Visit(self.replica_id, first + index, now, meta, sequence)
+            for index, (meta, sequence) in enumerate(zip(metadata, sequences))
+        ]
+        for visit in visits:
+            self.retention.record(visit)
+        
+        if self.count >= self.milestone_threshold and not self.high_precision_mode:
+            self.high_precision_mode = True
+        return visits
+    
+    def _take_tickets(self, count: int) -> List[Tuple[int, int]]:
+        """
+        Take `count` tickets as (first ticket, length) ranges.
+        
+        Whatever is left of the current lease is used first. The rest is
+        reserved in one call, rounded up to a block outside high precision
+        mode so the remainder becomes the next lease.
+        """
+        ranges = []
+        leased = min(self.get_leased_remaining(), count)
+        if leased:
+            ranges.append((self.lease_next, leased))
+            self.lease_next += leased
+            count -= leased
+        if count:
+            size = count if self.high_precision_mode else max(count, self.block_size)
+            start = self.allocator.reserve(size)
+            ranges.append((start, count))
+            self.lease_next = start + count
+            self.lease_end = start + size
+        return ranges
+
+    def _next_ticket(self) -> int:
+        """Take the next ticket of the current lease, leasing a new block if needed."""
+        if self.lease_next >= self.lease_end:
+            size = 1 if self.high_precision_mode else self.block_size
+            self.lease_next = self.allocator.reserve(size)
+            self.lease_end = self.lease_next + size
+        ticket = self.lease_next
+        self.lease_next += 1
+        return ticket
+
+    def get_leased_remaining(self) -> int:
+        """Get the number of leased tickets not used yet."""
+        return self.lease_end - self.lease_next
+
+    def enter_high_precision_mode(self) -> None:
+        """Switch to leasing one ticket per visit."""
+        self.high_precision_mode = True
+
     def get_count(self) -> int:
         """Get current count for this shard."""
         return self.count
 
     def merge(self, other: 'CounterShard') -> None:
-        """Merge another counter shard into this one (CRDT-like behavior)."""
-        self.count = max(self.count, other.count)
-        self.visits.update(other.visits)
+        """Merge another replica of this shard into this one (G-Counter)."""
+        self.apply_delta(other.counts)
+        self.retention.merge(other.retention)
+
+    def apply_delta(self, delta: Dict[str, int], forward: bool = True) -> int:
+        """
+        Merge per-replica counts received from another replica.
+        
+        Each entry only ever grows, so taking the maximum per replica is
+        commutative, associative and idempotent: replicas converge no matter
+        how often or in which order deltas arrive.
+        
+        Args:
+            delta: Per-replica counts
+            forward: Include the merged entries in the next take_delta
+            
+        Returns:
+            The increase of this shard's count
+        """
+        increase = 0
+        for replica_id, value in delta.items():
+            current = self.counts.get(replica_id, 0)
+            if value > current:
+                self.counts[replica_id] = value
+                increase += value - current
+                if not forward:
+                    self.shipped[replica_id] = value
+        self._apply_count_delta(increase)
+        return increase
+
+    def take_delta(self) -> Dict[str, int]:
+        """
+        Get the replica entries that changed since the last call.
+        
+        Used by anti-entropy so only changed entries are shipped.
+        """
+        delta = {
+            replica_id: value
+            for replica_id, value in self.counts.items()
+            if self.shipped.get(replica_id) != value
+        }
+        self.shipped.update(delta)
+        return delta
+
+    def get_state(self) -> Dict[str, int]:
+        """Get the full per-replica state."""
+        return dict(self.counts)
         
     def is_high_precision_mode(self) -> bool:
         """Check if counter is in high precision mode."""
@@ -48,9 +252,7 @@ class CounterShard:
 
     def get_recent_visits(self, limit: int = 100) -> Dict[str, Visit]:
         """Get most recent visits, useful for debugging and monitoring."""
-        sorted_visits = sorted(
-            self.visits.items(),
-            key=lambda x: x[1].timestamp,
-            reverse=True
-        )
-        return dict(sorted_visits[:limit]) 
\ No newline at end of file
+        return {visit.id: visit for visit in self.retention.recent(limit)} 
+
+# Set after the class body, where `count` is the constructor argument
+CounterShard.count = property(CounterShard._get_count, CounterShard._set_count, doc=CounterShard._get_count.__doc__)
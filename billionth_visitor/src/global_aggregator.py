@@ -1,63 +1,310 @@
-from dataclasses import dataclass, field
-from typing import Dict, Optional
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
-from .regional_aggregator import RegionalAggregator
+from functools import partial
+import asyncio
+import time
+from .regional_aggregator import RegionalAggregator, RegionSnapshot
 from .counter_shard import Visit
+from .sequence import SequenceBackend, LocalSequence
+from .shared_counts import SharedCounts
+from .rate import RateEstimator
+
+APPROACH_MARGIN = 100_000_000  # Used until there is a rate estimate
+
+@dataclass
+class GlobalSnapshot:
+    """Global count assembled from the latest region snapshots."""
+    count: int = 0
+    approaching_target: bool = False
+    taken_at: float = 0.0  # Oldest region snapshot it includes
 
 @dataclass
 class GlobalAggregator:
     regions: Dict[str, RegionalAggregator] = field(default_factory=dict)
     target_count: int = 100_000_000_000  # 100B
     winner: Optional[Visit] = None
+    total_count: int = 0  # Running total maintained from region deltas
+    reconcile_interval_s: float = 10.0
+    reconciliations: int = 0
+    last_drift: int = 0
+    # Source of global visit tickets shared by every region
+    sequence: SequenceBackend = field(default_factory=LocalSequence, repr=False)
+    # Latest snapshot pushed by each region's aggregation loop
+    region_snapshots: Dict[str, RegionSnapshot] = field(default_factory=dict, repr=False)
+    snapshot: GlobalSnapshot = field(default_factory=GlobalSnapshot)
+    # Called once with the winning visit, e.g. to persist it
+    winner_listeners: List[Callable[[Visit], None]] = field(default_factory=list, repr=False)
+    # Counts of every worker in the multi-process deployment
+    shared_counts: Optional[SharedCounts] = field(default=None, repr=False)
+    workers: int = 1  # Processes counting on these shards, set by attach_shared_counts
+    # Visit rate per region, fed by region snapshots
+    rate: RateEstimator = field(default_factory=RateEstimator, repr=False)
+    precision_lead_s: float = 60.0  # Enter high precision this long before the predicted milestone
+    # High precision regardless of the ETA within this many visits of the
+    # target; raised to the tickets shards can hold in leases if lower
+    approach_floor: int = 1_000_000
     
     def add_region(self, region: RegionalAggregator) -> None:
         """Add a new region to the global aggregator."""
+        previous = self.regions.get(region.region_id)
+        if previous is not None:
+            previous.listeners.remove(self._on_region_delta)
+            self._on_region_delta(-previous.get_total_count())
         self.regions[region.region_id] = region
+        self.rate.forget(region.region_id)
+        region.sequence = self.sequence
+        region.listeners.append(self._on_region_delta)
+        self._on_region_delta(region.get_total_count())
+        self.receive_snapshot(region.take_snapshot())
+    
+    def receive_snapshot(self, snapshot: RegionSnapshot) -> None:
+        """
+        Store a region snapshot and rebuild the global snapshot from it.
+        
+        Precision and aggregation intervals are adjusted here, off the
+        request path, so they follow the published counts. Only the
+        publishing region is adjusted, except when the target first comes
+        within reach: then every region switches at once.
+        """
+        was_approaching = self.snapshot.approaching_target
+        self.region_snapshots[snapshot.region_id] = snapshot
+        self.rate.update(snapshot.region_id, snapshot.count, snapshot.taken_at)
+        snapshots = [
+            self.region_snapshots[region_id]
+            for region_id in self.regions
+            if region_id in self.region_snapshots
+        ]
+        count = sum(s.count for s in snapshots)
+        self.snapshot = GlobalSnapshot(
+            count=count,
+            approaching_target=self.is_approaching_target(),
+            taken_at=min((s.taken_at for s in snapshots), default=snapshot.taken_at)
+        )
+        region = self.regions.get(snapshot.region_id)
+        if self.snapshot.approaching_target and not was_approaching or region is None:
+            self.adjust_precision()
+        else:
+            self.adjust_precision([region])
+    
+    def get_snapshot(self) -> GlobalSnapshot:
+        """Get the most recent global snapshot without recomputing it."""
+        return self.snapshot
+    
+    def start_aggregation(self) -> List[asyncio.Task]:
+        """Start one aggregation task per region pushing snapshots here."""
+        return [
+            asyncio.create_task(region.aggregation_loop(self.receive_snapshot))
+            for region in self.regions.values()
+        ]
+    
+    def use_sequence(self, sequence: SequenceBackend) -> None:
+        """Switch every region to another ticket sequence."""
+        self.sequence = sequence
+        for region in self.regions.values():
+            region.sequence = sequence
+    
+    def shared_slots(self, workers: int) -> int:
+        """Number of shared count slots needed for `workers` workers."""
+        return sum(len(region.shards) for region in self.regions.values()) * workers
+    
+    def attach_shared_counts(self, shared: SharedCounts, worker_index: int, workers: int) -> None:
+        """
+        Publish this worker's shard counts into shared memory and read totals from it.
+        
+        Every worker builds the same regions and shards in the same order, so
+        slot (shard position * workers + worker_index) belongs to exactly one
+        worker and each region's slots are contiguous. Shards count under the
+        replica id `<shard_id>-w<worker_index>`, so visit ids are unique
+        across workers.
+        """
+        if shared.slots < self.shared_slots(workers):
+            raise ValueError(f"Need {self.shared_slots(workers)} shared slots, got {shared.slots}")
+        
+        slot = 0
+        for region in self.regions.values():
+            region.slot_start = slot
+            for shard in region.shards.values():
+                shard.replica_id = f"{shard.shard_id}-w{worker_index}"
+                own = slot + worker_index
+                shared.add(own, shard.get_count())
+                shard.listeners.append(partial(shared.add, own))
+                slot += workers
+            region.slot_stop = slot
+            region.shared_counts = shared
+        self.shared_counts = shared
+        self.workers = workers
+    
+    def _on_region_delta(self, delta: int) -> None:
+        """Apply a change of one region's total to the global total."""
+        self.total_count += delta
         
     def get_global_count(self) -> int:
         """Get the total count across all regions."""
-        return sum(region.get_total_count() for region in self.regions.values())
+        if self.shared_counts is not None:
+            return self.shared_counts.sum()
+        return self.total_count
+    
+    def recount(self) -> int:
+        """Sum all shard counts in all regions from scratch."""
+        return sum(region.recount() for region in self.regions.values())
+    
+    def reconcile(self) -> int:
+        """
+        Check the running totals against a full recount and repair them.
+        
+        Returns:
+            The drift of the global count that was corrected
+        """
+        previous = self.total_count
+        for region in self.regions.values():
+            region.reconcile()
+        
+        total = sum(region.total_count for region in self.regions.values())
+        drift = total - previous
+        self.total_count = total
+        self.reconciliations += 1
+        self.last_drift = drift
+        return drift
     
     def check_for_winner(self, visit: Visit) -> bool:
-        """Check if this visit is the winner and store if so."""
-        current_count = self.get_global_count()
+        """
+        Check if this visit is the winner and store if so.
         
-        if current_count == self.target_count and not self.winner:
-            self.winner = visit
+        Tickets are unique, so exactly one visit holds the target ticket no
+        matter how increments interleave across shards.
+        """
+        if visit.sequence == self.target_count and self.get_winner() is None:
+            self.set_winner(visit)
+            for listener in self.winner_listeners:
+                listener(visit)
             return True
         return False
     
+    def set_winner(self, visit: Visit) -> None:
+        """Record the winning visit and share it with the other workers."""
+        self.winner = visit
+        if self.shared_counts is not None:
+            self.shared_counts.set_winner(asdict(visit))
+    
+    def get_winner(self) -> Optional[Visit]:
+        """Get the winning visit, also when another worker counted it."""
+        if self.winner is None and self.shared_counts is not None:
+            winner = self.shared_counts.get_winner()
+            if winner is not None:
+                self.winner = Visit(**winner)
+        return self.winner
+    
+    def check_batch_for_winner(self, visits: List[Visit]) -> Optional[Visit]:
+        """Check a batch of visits and return the winner if it is among them."""
+        for visit in visits:
+            if self.check_for_winner(visit):
+                return visit
+        return None
+    
+    def get_eta_s(self) -> Optional[float]:
+        """Predict the seconds until the target count, None without a rate estimate."""
+        return self.rate.get_eta_s(self.target_count - self.get_global_count())
+    
     def is_approaching_target(self) -> bool:
-        """Check if we're approaching the target count."""
-        current_count = self.get_global_count()
-        return current_count >= (self.target_count - 100_000_000)  # Within 100M
-    
-    def adjust_precision(self) -> None:
-        """Adjust precision mode for all regions if approaching target."""
-        if self.is_approaching_target():
-            for region in self.regions.values():
-                region.adjust_aggregation_interval()
+        """
+        Check if we're approaching the target count.
+        
+        True once the predicted time to the target is below
+        `precision_lead_s`, or within `get_approach_floor()` visits of it
+        whatever the rate. Until the rate is known the fixed 100M margin applies.
+        """
+        remaining = self.target_count - self.get_global_count()
+        if remaining <= self.get_approach_floor():
+            return True
+        eta_s = self.rate.get_eta_s(remaining)
+        if eta_s is None:
+            return remaining <= APPROACH_MARGIN
+        return eta_s <= self.precision_lead_s
+    
+    def get_approach_floor(self) -> int:
+        """
+        Get the distance to the target that forces high precision mode.
+        
+        Shards lease tickets one at a time in high precision mode, so the
+        blocks leased earlier must end before the target. This is
+        `approach_floor`, raised above the tickets all shards of all
+        workers can hold in leases (shards x workers x block_size).
+        """
+        leasable = self.workers * sum(
+            shard.block_size for region in self.regions.values() for shard in region.shards.values()
+        )
+        return max(self.approach_floor, leasable + 1)
+    
+    def get_aggregation_interval_ms(self) -> int:
+        """
+        Suggest the regions' aggregation interval.
+        
+        With a rate estimate the interval is a hundredth of the predicted
+        time to the target, between 100ms and 1s. Before that it shrinks
+        linearly from 1s at ten approach margins to 100ms at one margin.
+        """
+        remaining = self.target_count - self.get_global_count()
+        eta_s = self.rate.get_eta_s(remaining)
+        if eta_s is not None:
+            return int(min(1000, max(100, eta_s * 1000 / 100)))
+        window = 10 * APPROACH_MARGIN
+        if remaining >= window:
+            return 1000
+        if remaining <= APPROACH_MARGIN:
+            return 100
+        return 100 + 900 * (remaining - APPROACH_MARGIN) // (window - APPROACH_MARGIN)
+    
+    def adjust_precision(self, regions: Optional[List[RegionalAggregator]] = None) -> None:
+        """
+        Adjust precision mode and aggregation intervals for all regions.
+        
+        Shards lease tickets one at a time once the target is approaching,
+        so the ticket blocks leased earlier must end before the target; see
+        `get_approach_floor`.
+        
+        Args:
+            regions: Only adjust these regions
+        """
+        approaching = self.is_approaching_target()
+        interval_ms = self.get_aggregation_interval_ms()
+        for region in self.regions.values() if regions is None else regions:
+            if approaching:
+                region.enter_high_precision_mode()
+            region.adjust_aggregation_interval(interval_ms)
                 
     def get_winner_details(self) -> Optional[Dict]:
         """Get details about the winning visit if exists."""
-        if not self.winner:
+        winner = self.get_winner()
+        if not winner:
             return None
             
         return {
-            "visit_id": self.winner.id,
-            "timestamp": self.winner.timestamp.isoformat(),
-            "metadata": self.winner.metadata
+            "visit_id": winner.id,
+            "ticket": winner.sequence,
+            "timestamp": winner.timestamp.isoformat(),
+            "metadata": winner.metadata or {}
         }
         
     def get_metrics(self) -> Dict:
         """Get global metrics for monitoring."""
+        eta_s = self.get_eta_s()
         return {
             "global_count": self.get_global_count(),
             "region_count": len(self.regions),
             "approaching_target": self.is_approaching_target(),
-            "has_winner": self.winner is not None,
+            "rate_per_s": round(self.rate.get_rate(), 1),
+            "eta_s": None if eta_s is None else round(eta_s, 1),
+            "has_winner": self.get_winner() is not None,
+            "reconciliations": self.reconciliations,
+            "last_drift": self.last_drift,
+            "snapshot_count": self.snapshot.count,
+            "snapshot_age_ms": round((time.time() - self.snapshot.taken_at) * 1000, 1),
             "regions": {
-                region_id: region.get_metrics()
+                region_id: {
+                    **region.get_metrics(),
+                    "rate_per_s": round(self.rate.get_rate(region_id), 1)
+                }
                 for region_id, region in self.regions.items()
             }
         } 
\ No newline at end of file
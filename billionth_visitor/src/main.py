@@ -1,18 +1,72 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Optional
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import msgpack
+import os
 import uuid
 
 from .counter_shard import CounterShard
 from .regional_aggregator import RegionalAggregator
 from .global_aggregator import GlobalAggregator
+from .retention import MilestoneRetention
+from .sequence import LocalSequence, RedisSequence
+from .checkpoint import Checkpointer
+from .broadcast import SnapshotBroadcaster
 
-app = FastAPI(title="Google's 100 Billionth Visitor Counter")
+async def reconcile_periodically():
+    """Check the running totals against a full recount in the background."""
+    while True:
+        await asyncio.sleep(global_aggregator.reconcile_interval_s)
+        global_aggregator.reconcile()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if checkpointer is not None:
+        checkpointer.recover(global_aggregator)
+        checkpoints = asyncio.create_task(checkpointer.checkpoint_loop(global_aggregator))
+    reconciler = asyncio.create_task(reconcile_periodically())
+    # Regions push snapshots to the global aggregator on their own interval
+    aggregators = global_aggregator.start_aggregation()
+    streamer = asyncio.create_task(broadcaster.run())
+    yield
+    streamer.cancel()
+    reconciler.cancel()
+    for task in aggregators:
+        task.cancel()
+    if checkpointer is not None:
+        # Cancelling writes a final checkpoint
+        checkpoints.cancel()
+        await asyncio.gather(checkpoints, return_exceptions=True)
+        checkpointer.close()
+
+app = FastAPI(title="Google's 100 Billionth Visitor Counter", lifespan=lifespan)
+
+def create_sequence():
+    """Share visit tickets through Redis when REDIS_URL is set."""
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        return LocalSequence()
+    import redis
+    return RedisSequence(client=redis.Redis.from_url(redis_url))
+
+def create_checkpointer(suffix: str = "") -> Optional[Checkpointer]:
+    """Checkpoint shard counts to CHECKPOINT_PATH; an empty path disables it."""
+    path = os.getenv("CHECKPOINT_PATH", "data/visitor-checkpoint.log")
+    if not path:
+        return None
+    return Checkpointer(
+        path=path + suffix,
+        interval_s=float(os.getenv("CHECKPOINT_INTERVAL_S", "1.0"))
+    )
 
 # Initialize our system with some example regions and shards
 def initialize_system():
     # Create global aggregator
-    global_agg = GlobalAggregator()
+    global_agg = GlobalAggregator(sequence=create_sequence())
     
     # Create some example regions
     regions = ["us-west", "us-east", "europe", "asia"]
@@ -21,7 +75,11 @@ def initialize_system():
         
         # Add some shards to each region
         for i in range(3):  # 3 shards per region
-            shard = CounterShard(shard_id=f"{region_id}-shard-{i}")
+            shard = CounterShard(
+                shard_id=f"{region_id}-shard-{i}",
+                block_size=10_000,
+                retention=MilestoneRetention(target_count=global_agg.target_count)
+            )
             region.add_shard(shard)
             
         global_agg.add_region(region)
@@ -30,6 +88,8 @@ def initialize_system():
 
 # Initialize our system
 global_aggregator = initialize_system()
+checkpointer = create_checkpointer()
+broadcaster = SnapshotBroadcaster(global_agg=global_aggregator)
 
 class VisitRequest(BaseModel):
     user_agent: Optional[str] = None
@@ -66,23 +126,164 @@ async def register_visit(visit_req: VisitRequest):
     # Check if this is the winning visit
     is_winner = global_aggregator.check_for_winner(visit)
     
-    # Adjust precision if needed
-    global_aggregator.adjust_precision()
-    
+    # Precision is adjusted by the aggregation pipeline, not per request
     return VisitResponse(
         visit_id=visit.id,
         is_winner=is_winner,
-        global_count=global_aggregator.get_global_count()
+        global_count=global_aggregator.get_snapshot().count
+    )
+
+class VisitBatchRequest(BaseModel):
+    visits: List[VisitRequest]
+
+class VisitRange(BaseModel):
+    region_id: str
+    shard_id: str
+    count: int
+    first_visit_id: str  # Ids in between share the prefix and count up
+    last_visit_id: str
+    tickets: List[List[int]]  # [first, last] ticket ranges, inclusive
+    indexes: List[int]  # Positions of these visits in the request
+
+class BatchWinner(BaseModel):
+    index: int
+    visit_id: str
+    ticket: int
+
+class VisitBatchResponse(BaseModel):
+    accepted: int
+    ranges: List[VisitRange]
+    winner: Optional[BatchWinner] = None
+    global_count: int
+
+MSGPACK = "application/msgpack"
+
+def contains_bytes(value) -> bool:
+    """Check a decoded msgpack value for bin values, which no field accepts."""
+    if isinstance(value, (bytes, bytearray)):
+        return True
+    if isinstance(value, dict):
+        return any(contains_bytes(k) or contains_bytes(v) for k, v in value.items())
+    if isinstance(value, list):
+        return any(contains_bytes(item) for item in value)
+    return False
+
+def ticket_ranges(visits) -> List[List[int]]:
+    """Collapse the visits' tickets into inclusive [first, last] ranges."""
+    ranges = []
+    for visit in visits:
+        if ranges and ranges[-1][1] + 1 == visit.sequence:
+            ranges[-1][1] = visit.sequence
+        else:
+            ranges.append([visit.sequence, visit.sequence])
+    return ranges
+
+@app.post("/visits/batch", response_model=VisitBatchResponse)
+async def register_visit_batch(request: Request):
+    """
+    Register many visits in one request, as JSON or msgpack.
+    
+    Visits are grouped per shard and counted with one increment_batch call
+    each. Every referenced region and shard is checked before any visit is
+    counted, so a bad batch counts nothing.
+    """
+    body = await request.body()
+    use_msgpack = request.headers.get("content-type", "").startswith(MSGPACK)
+    try:
+        if use_msgpack:
+            data = msgpack.unpackb(body, raw=False)
+            # Validation errors echo the input, which can't be encoded as
+            # JSON if it holds bytes that aren't UTF-8
+            if contains_bytes(data):
+                raise HTTPException(status_code=400, detail="Binary values are not accepted, send strings")
+            batch = VisitBatchRequest.model_validate(data)
+        else:
+            batch = VisitBatchRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed request body")
+    
+    groups: Dict[tuple, List[int]] = {}
+    for index, visit_req in enumerate(batch.visits):
+        groups.setdefault((visit_req.region_id, visit_req.shard_id), []).append(index)
+    
+    shards = {}
+    for region_id, shard_id in groups:
+        region = global_aggregator.regions.get(region_id)
+        if not region:
+            raise HTTPException(status_code=404, detail=f"Region not found: {region_id}")
+        shard = region.shards.get(shard_id)
+        if not shard:
+            raise HTTPException(status_code=404, detail=f"Shard not found: {shard_id}")
+        shards[(region_id, shard_id)] = shard
+    
+    ranges = []
+    winner = None
+    for (region_id, shard_id), indexes in groups.items():
+        metadata = [
+            {
+                "user_agent": batch.visits[i].user_agent,
+                "ip_address": batch.visits[i].ip_address,
+                "region_id": region_id,
+                "shard_id": shard_id
+            }
+            for i in indexes
+        ]
+        visits = shards[(region_id, shard_id)].increment_batch(metadata)
+        winning = global_aggregator.check_batch_for_winner(visits)
+        if winning is not None:
+            winner = BatchWinner(
+                index=indexes[visits.index(winning)],
+                visit_id=winning.id,
+                ticket=winning.sequence
+            )
+        ranges.append(VisitRange(
+            region_id=region_id,
+            shard_id=shard_id,
+            count=len(visits),
+            first_visit_id=visits[0].id,
+            last_visit_id=visits[-1].id,
+            tickets=ticket_ranges(visits),
+            indexes=indexes
+        ))
+    
+    result = VisitBatchResponse(
+        accepted=len(batch.visits),
+        ranges=ranges,
+        winner=winner,
+        global_count=global_aggregator.get_snapshot().count
     )
+    if use_msgpack:
+        return Response(content=msgpack.packb(result.model_dump()), media_type=MSGPACK)
+    return result
 
 @app.get("/count")
 async def get_count():
-    """Get the current global count."""
+    """Get the global count as of the latest aggregation snapshot."""
+    snapshot = global_aggregator.get_snapshot()
     return {
-        "count": global_aggregator.get_global_count(),
-        "approaching_target": global_aggregator.is_approaching_target()
+        "count": snapshot.count,
+        "approaching_target": snapshot.approaching_target
     }
 
+@app.get("/stream")
+async def stream_count():
+    """
+    Stream the global count as server-sent events.
+    
+    One frame is built per aggregation tick and shared by all subscribers.
+    """
+    async def events():
+        async for frame in broadcaster.subscribe():
+            yield f"data: {frame}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/winner")
 async def get_winner():
     """Get information about the winner if exists."""
@@ -94,7 +295,11 @@ async def get_winner():
 @app.get("/metrics")
 async def get_metrics():
     """Get system metrics."""
-    return global_aggregator.get_metrics()
+    metrics = global_aggregator.get_metrics()
+    if checkpointer is not None:
+        metrics["checkpoint"] = checkpointer.get_stats()
+    metrics["stream_subscribers"] = broadcaster.subscribers
+    return metrics
 
 if __name__ == "__main__":
     import uvicorn
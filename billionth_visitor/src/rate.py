@@ -0,0 +1,64 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+import math
+
+@dataclass
+class RateEstimator:
+    """
+    Visit rate per region as an exponentially weighted moving average.
+
+    Every region snapshot contributes the rate since that region's previous
+    snapshot, weighted by how much time it covers, so samples older than a
+    few `time_constant_s` barely count and irregular snapshot intervals are
+    handled correctly.
+    """
+    time_constant_s: float = 10.0
+    # region_id -> (count, taken_at) of the previous snapshot
+    last: Dict[str, Tuple[int, float]] = field(default_factory=dict)
+    rates: Dict[str, float] = field(default_factory=dict)
+
+    def update(self, region_id: str, count: int, taken_at: float) -> None:
+        """Feed one region snapshot."""
+        previous = self.last.get(region_id)
+        self.last[region_id] = (count, taken_at)
+        if previous is None:
+            return
+        elapsed = taken_at - previous[1]
+        if elapsed <= 0:
+            return
+        sample = max(count - previous[0], 0) / elapsed
+        if region_id not in self.rates:
+            self.rates[region_id] = sample
+            return
+        alpha = 1 - math.exp(-elapsed / self.time_constant_s)
+        self.rates[region_id] += alpha * (sample - self.rates[region_id])
+
+    def get_rate(self, region_id: Optional[str] = None) -> float:
+        """Get visits per second of one region, or of all regions combined."""
+        if region_id is not None:
+            return self.rates.get(region_id, 0.0)
+        return sum(self.rates.values())
+
+    def has_estimate(self) -> bool:
+        """Check whether any region has a rate estimate yet."""
+        return bool(self.rates)
+
+    def get_eta_s(self, remaining: int) -> Optional[float]:
+        """
+        Predict the seconds until `remaining` more visits are counted.
+
+        Returns:
+            0 once nothing remains, None while there is no estimate or no
+            traffic, otherwise the predicted seconds
+        """
+        if remaining <= 0:
+            return 0.0
+        rate = self.get_rate()
+        if not self.has_estimate() or rate <= 0:
+            return None
+        return remaining / rate
+
+    def forget(self, region_id: str) -> None:
+        """Drop a region's history, e.g. when it is replaced."""
+        self.last.pop(region_id, None)
+        self.rates.pop(region_id, None)
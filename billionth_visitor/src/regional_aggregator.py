@@ -1,21 +1,170 @@
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import time
 from .counter_shard import CounterShard, Visit
+from .sequence import SequenceBackend, LocalSequence
+from .shared_counts import SharedCounts
+
+@dataclass
+class RegionSnapshot:
+    """A region's count as published by its aggregation loop."""
+    region_id: str
+    count: int
+    high_precision_mode: bool
+    taken_at: float  # time.time() of the snapshot
 
 @dataclass
 class RegionalAggregator:
     region_id: str
     shards: Dict[str, CounterShard] = field(default_factory=dict)
     aggregation_interval_ms: int = 1000  # 1 second by default
+    total_count: int = 0  # Running total maintained from shard deltas
+    # Global ticket sequence, replaced by the global aggregator's on add_region
+    sequence: SequenceBackend = field(default_factory=LocalSequence, repr=False, compare=False)
+    # Regions holding replicas of the same shards, kept in sync by gossip
+    peers: List['RegionalAggregator'] = field(default_factory=list, repr=False, compare=False)
+    gossip_rounds: int = 0
+    # Re-ship state learned from peers; unnecessary when every region is a peer
+    forward_gossip: bool = True
+    # Counts of every worker's shards, set by GlobalAggregator.attach_shared_counts
+    shared_counts: Optional[SharedCounts] = field(default=None, repr=False, compare=False)
+    slot_start: int = 0
+    slot_stop: int = 0
+    # Called with every change of total_count
+    listeners: List[Callable[[int], None]] = field(default_factory=list, repr=False, compare=False)
     
     def add_shard(self, shard: CounterShard) -> None:
         """Add a new counter shard to this region."""
+        previous = self.shards.get(shard.shard_id)
+        if previous is not None:
+            previous.listeners.remove(self._on_shard_delta)
+            self._on_shard_delta(-previous.get_count())
         self.shards[shard.shard_id] = shard
+        shard.listeners.append(self._on_shard_delta)
+        shard.allocator = self
+        self._on_shard_delta(shard.get_count())
+    
+    def reserve(self, count: int = 1) -> int:
+        """Claim `count` consecutive global tickets for a shard."""
+        return self.sequence.reserve(count)
+    
+    def _on_shard_delta(self, delta: int) -> None:
+        """Apply a change of one shard's count to the running total."""
+        if delta:
+            self.total_count += delta
+            for listener in self.listeners:
+                listener(delta)
         
     def get_total_count(self) -> int:
         """Get the total count across all shards in this region."""
+        if self.shared_counts is not None:
+            return self.shared_counts.sum(self.slot_start, self.slot_stop)
+        return self.total_count
+    
+    def recount(self) -> int:
+        """Sum all shard counts from scratch."""
         return sum(shard.get_count() for shard in self.shards.values())
     
+    def reconcile(self) -> int:
+        """
+        Check the running total against a full recount and repair it.
+        
+        Returns:
+            The drift that was corrected (recount - running total)
+        """
+        drift = self.recount() - self.total_count
+        self._on_shard_delta(drift)
+        return drift
+    
+    def add_peer(self, peer: 'RegionalAggregator') -> None:
+        """Gossip shard state with another region."""
+        if peer is not self and peer not in self.peers:
+            self.peers.append(peer)
+    
+    def make_gossip(self, full: bool = False) -> Dict[str, Dict[str, int]]:
+        """
+        Collect the shard state to ship to peers.
+        
+        Args:
+            full: Ship every replica entry instead of only changed ones
+            
+        Returns:
+            Dictionary mapping shard ids to per-replica counts
+        """
+        payload = {}
+        for shard_id, shard in self.shards.items():
+            delta = shard.get_state() if full else shard.take_delta()
+            if delta:
+                payload[shard_id] = delta
+        return payload
+    
+    def receive_gossip(self, payload: Dict[str, Dict[str, int]]) -> int:
+        """
+        Merge shard state received from a peer.
+        
+        State for shards this region holds no replica of is ignored.
+        
+        Returns:
+            The total increase of this region's count
+        """
+        increase = 0
+        for shard_id, delta in payload.items():
+            shard = self.shards.get(shard_id)
+            if shard is not None:
+                increase += shard.apply_delta(delta, forward=self.forward_gossip)
+        return increase
+    
+    async def gossip_loop(
+        self,
+        interval_s: float = 1.0,
+        full_sync_every: int = 10,
+        send: Optional[Callable[['RegionalAggregator', Dict], Awaitable[None]]] = None
+    ) -> None:
+        """
+        Periodically ship shard deltas to every peer until cancelled.
+        
+        Every `full_sync_every` rounds the full state is shipped instead,
+        which repairs peers that missed a delta.
+        
+        Args:
+            interval_s: Seconds between gossip rounds
+            full_sync_every: Rounds between full-state syncs
+            send: Coroutine delivering a payload to a peer; defaults to
+                calling the peer's receive_gossip directly
+        """
+        while True:
+            await asyncio.sleep(interval_s)
+            self.gossip_rounds += 1
+            payload = self.make_gossip(full=self.gossip_rounds % full_sync_every == 0)
+            if not payload:
+                continue
+            for peer in list(self.peers):
+                if send is not None:
+                    await send(peer, payload)
+                else:
+                    peer.receive_gossip(payload)
+    
+    def take_snapshot(self) -> RegionSnapshot:
+        """Capture the region's current count."""
+        return RegionSnapshot(
+            region_id=self.region_id,
+            count=self.get_total_count(),
+            high_precision_mode=self.is_any_shard_high_precision(),
+            taken_at=time.time()
+        )
+    
+    async def aggregation_loop(self, publish: Callable[[RegionSnapshot], None]) -> None:
+        """
+        Publish a snapshot every `aggregation_interval_ms` until cancelled.
+        
+        The interval is re-read every round, so adjust_aggregation_interval
+        takes effect on the next snapshot.
+        """
+        while True:
+            await asyncio.sleep(self.aggregation_interval_ms / 1000)
+            publish(self.take_snapshot())
+    
     def get_all_visits(self) -> Dict[str, Visit]:
         """Combine all visits from all shards."""
         all_visits = {}
@@ -27,10 +176,23 @@ class RegionalAggregator:
         """Check if any shard is in high precision mode."""
         return any(shard.is_high_precision_mode() for shard in self.shards.values())
     
-    def adjust_aggregation_interval(self) -> None:
-        """Adjust aggregation interval based on high precision mode."""
+    def enter_high_precision_mode(self) -> None:
+        """Make every shard lease one ticket per visit."""
+        for shard in self.shards.values():
+            shard.enter_high_precision_mode()
+    
+    def adjust_aggregation_interval(self, interval_ms: Optional[int] = None) -> None:
+        """
+        Adjust aggregation interval based on high precision mode.
+        
+        Args:
+            interval_ms: Interval suggested by the global aggregator for
+                normal mode; defaults to 1s
+        """
         if self.is_any_shard_high_precision():
             self.aggregation_interval_ms = 100  # Switch to 100ms updates
+        elif interval_ms is not None:
+            self.aggregation_interval_ms = interval_ms
         else:
             self.aggregation_interval_ms = 1000  # Normal 1s updates
             
@@ -41,5 +203,6 @@ class RegionalAggregator:
             "total_count": self.get_total_count(),
             "shard_count": len(self.shards),
             "high_precision_mode": self.is_any_shard_high_precision(),
+            "unused_leased_tickets": sum(shard.get_leased_remaining() for shard in self.shards.values()),
             "aggregation_interval_ms": self.aggregation_interval_ms
         } 
\ No newline at end of file
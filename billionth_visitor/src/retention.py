@@ -0,0 +1,80 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .counter_shard import Visit
+
+@dataclass
+class VisitRetention(ABC):
+    """Decides which visits a shard keeps in full detail."""
+
+    @abstractmethod
+    def record(self, visit: 'Visit') -> None:
+        """Offer a newly counted visit to the policy."""
+
+    @abstractmethod
+    def recent(self, limit: int) -> List['Visit']:
+        """Get up to `limit` retained visits, newest first."""
+
+    @abstractmethod
+    def visits(self) -> Dict[str, 'Visit']:
+        """Get every retained visit by id."""
+
+    def merge(self, other: 'VisitRetention') -> None:
+        """Merge the visits retained by another policy into this one."""
+        for visit in sorted(other.visits().values(), key=lambda v: v.timestamp_ns):
+            self.record(visit)
+
+@dataclass
+class RingBufferRetention(VisitRetention):
+    """Keeps only the most recent `capacity` visits."""
+    capacity: int = 1000
+    buffer: Deque['Visit'] = field(init=False)
+
+    def __post_init__(self):
+        self.buffer = deque(maxlen=self.capacity)
+
+    def record(self, visit: 'Visit') -> None:
+        self.buffer.append(visit)
+
+    def recent(self, limit: int) -> List['Visit']:
+        result = []
+        for visit in reversed(self.buffer):
+            if len(result) >= limit:
+                break
+            result.append(visit)
+        return result
+
+    def visits(self) -> Dict[str, 'Visit']:
+        return {visit.id: visit for visit in self.buffer}
+
+@dataclass
+class MilestoneRetention(VisitRetention):
+    """
+    Keeps every visit whose sequence falls within `window` of the target,
+    plus a ring buffer of recent visits for monitoring.
+    """
+    target_count: int = 100_000_000_000  # 100B
+    window: int = 1000
+    recent_visits: VisitRetention = field(default_factory=RingBufferRetention)
+    captured: Dict[str, 'Visit'] = field(default_factory=dict)
+
+    def record(self, visit: 'Visit') -> None:
+        self.recent_visits.record(visit)
+        if abs(visit.sequence - self.target_count) <= self.window:
+            self.captured[visit.id] = visit
+
+    def recent(self, limit: int) -> List['Visit']:
+        return self.recent_visits.recent(limit)
+
+    def visits(self) -> Dict[str, 'Visit']:
+        return {**self.recent_visits.visits(), **self.captured}
+
+    def get_captured(self, sequence: Optional[int] = None) -> List['Visit']:
+        """Get the captured visits around the target, optionally one sequence only."""
+        visits = sorted(self.captured.values(), key=lambda v: v.sequence)
+        if sequence is None:
+            return visits
+        return [visit for visit in visits if visit.sequence == sequence]
@@ -0,0 +1,82 @@
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+import json
+
+try:
+    import numpy
+except ImportError:  # Fall back to summing a memoryview
+    numpy = None
+
+SLOT_SIZE = 8  # int64
+WINNER_SIZE = 4096  # Bytes after the slots for the winning visit, as JSON
+
+@dataclass
+class SharedCounts:
+    """
+    Shard counts in a shared memory array of int64 slots.
+
+    Every slot has exactly one writer, the worker that owns it, so updates
+    need no locks; readers in any process sum the slots they care about.
+    The slots are followed by the winning visit, written once by the worker
+    that counted it: a length slot, then its JSON encoding.
+    """
+    slots: int
+    name: Optional[str] = None  # Attach to an existing block when set
+    memory: shared_memory.SharedMemory = field(init=False, repr=False)
+    view: memoryview = field(init=False, repr=False)
+    owner: bool = field(init=False, default=False)
+
+    def __post_init__(self):
+        if self.name is None:
+            size = (self.slots + 1) * SLOT_SIZE + WINNER_SIZE
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.name = self.memory.name
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=self.name)
+        self.view = self.memory.buf.cast('q')  # New blocks start zeroed
+
+    def add(self, slot: int, delta: int) -> None:
+        """Add to a slot; only the slot's owner may write it."""
+        self.view[slot] += delta
+
+    def get(self, slot: int) -> int:
+        """Read one slot."""
+        return self.view[slot]
+
+    def sum(self, start: int = 0, stop: Optional[int] = None) -> int:
+        """Sum the slots in [start, stop), in one vectorized pass with numpy."""
+        stop = self.slots if stop is None else stop
+        if numpy is not None:
+            return int(numpy.frombuffer(self.memory.buf, dtype=numpy.int64, count=self.slots)[start:stop].sum())
+        return sum(self.view[start:stop])
+
+    def set_winner(self, winner: Dict[str, Any]) -> None:
+        """
+        Publish the winning visit to every process.
+
+        Only one visit holds the winning ticket, so this has a single writer.
+        The length is written last, so readers never see a partial record.
+        """
+        data = json.dumps(winner).encode()
+        if len(data) > WINNER_SIZE:
+            data = json.dumps({**winner, "metadata": None}).encode()
+        offset = (self.slots + 1) * SLOT_SIZE
+        self.memory.buf[offset:offset + len(data)] = data
+        self.view[self.slots] = len(data)
+
+    def get_winner(self) -> Optional[Dict[str, Any]]:
+        """Read the winning visit, None until one is published."""
+        length = self.view[self.slots]
+        if not length:
+            return None
+        offset = (self.slots + 1) * SLOT_SIZE
+        return json.loads(bytes(self.memory.buf[offset:offset + length]))
+
+    def close(self) -> None:
+        """Detach from the block, and remove it if this process created it."""
+        self.view.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,167 @@
+"""
+Gossip simulation for replicated counter shards.
+
+Every region holds a replica of the same shards, counts visits locally and
+gossips G-Counter deltas with its peers. The harness measures how long the
+replicas take to converge once writes stop and how many bytes were shipped,
+compared with shipping full state every round.
+
+Run from the billionth_visitor directory, e.g.:
+    python -m src.simulation --regions 8 --topology ring --drop-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from .counter_shard import CounterShard
+from .regional_aggregator import RegionalAggregator
+
+def build_regions(region_count: int, shard_count: int, topology: str) -> List[RegionalAggregator]:
+    """Create regions holding replicas of the same shards and connect them."""
+    regions = []
+    for r in range(region_count):
+        region = RegionalAggregator(region_id=f"region-{r}")
+        for s in range(shard_count):
+            region.add_shard(CounterShard(shard_id=f"shard-{s}", replica_id=region.region_id))
+        regions.append(region)
+
+    for i, region in enumerate(regions):
+        if topology == "ring":
+            region.add_peer(regions[(i + 1) % region_count])
+            region.add_peer(regions[(i - 1) % region_count])
+        else:
+            region.forward_gossip = False
+            for peer in regions:
+                region.add_peer(peer)
+    return regions
+
+def is_converged(regions: List[RegionalAggregator]) -> bool:
+    """Check that every replica of every shard has the same state."""
+    reference = {shard_id: shard.counts for shard_id, shard in regions[0].shards.items()}
+    return all(
+        shard.counts == reference[shard_id]
+        for region in regions[1:]
+        for shard_id, shard in region.shards.items()
+    )
+
+async def simulate_gossip(
+    regions: int = 4,
+    shards: int = 8,
+    duration_s: float = 2.0,
+    visits_per_sec: int = 5_000,
+    interval_s: float = 0.05,
+    latency_s: float = 0.01,
+    drop_rate: float = 0.0,
+    full_sync_every: int = 10,
+    topology: str = "mesh",
+    seed: int = 42
+) -> Dict:
+    """
+    Run one simulation.
+
+    Args:
+        regions: Number of regions
+        shards: Number of shards replicated in every region
+        duration_s: Seconds during which visits are counted
+        visits_per_sec: Visits per second counted by each region
+        interval_s: Gossip interval
+        latency_s: One-way delay of a gossip message
+        drop_rate: Probability that a gossip message is lost
+        full_sync_every: Gossip rounds between full-state syncs
+        topology: 'mesh' (everyone gossips with everyone) or 'ring'
+        seed: Random seed
+
+    Returns:
+        Dictionary of results
+    """
+    rng = random.Random(seed)
+    nodes = build_regions(regions, shards, topology)
+    stats = {"messages": 0, "dropped": 0, "delta_bytes": 0, "full_state_bytes": 0}
+
+    async def send(peer: RegionalAggregator, payload: Dict) -> None:
+        stats["messages"] += 1
+        stats["delta_bytes"] += len(json.dumps(payload))
+        if rng.random() < drop_rate:
+            stats["dropped"] += 1
+            return
+        await asyncio.sleep(latency_s)
+        peer.receive_gossip(payload)
+
+    async def count_visits(region: RegionalAggregator) -> None:
+        shard_list = list(region.shards.values())
+        tick = 0.01
+        while True:
+            for _ in range(int(visits_per_sec * tick)):
+                rng.choice(shard_list).increment()
+            await asyncio.sleep(tick)
+
+    async def baseline(region: RegionalAggregator) -> None:
+        # Bytes a full-state exchange would ship every round
+        while True:
+            await asyncio.sleep(interval_s)
+            size = len(json.dumps(region.make_gossip(full=True)))
+            stats["full_state_bytes"] += size * len(region.peers)
+
+    gossip = [
+        asyncio.create_task(region.gossip_loop(interval_s, full_sync_every, send))
+        for region in nodes
+    ]
+    writers = [asyncio.create_task(count_visits(region)) for region in nodes]
+    baselines = [asyncio.create_task(baseline(region)) for region in nodes]
+
+    await asyncio.sleep(duration_s)
+    for task in writers + baselines:
+        task.cancel()
+    stopped = time.perf_counter()
+
+    timeout = stopped + max(10.0, interval_s * full_sync_every * 4)
+    while not is_converged(nodes) and time.perf_counter() < timeout:
+        await asyncio.sleep(0.001)
+    converged = is_converged(nodes)
+    convergence_s = time.perf_counter() - stopped
+
+    for task in gossip:
+        task.cancel()
+    await asyncio.gather(*gossip, *writers, *baselines, return_exceptions=True)
+
+    total = sum(shard.count for shard in nodes[0].shards.values())
+    expected = sum(shard.counts.get(region.region_id, 0) for region in nodes for shard in region.shards.values())
+    return {
+        "regions": regions,
+        "shards": shards,
+        "topology": topology,
+        "converged": converged and total == expected,
+        "convergence_ms": round(convergence_s * 1000, 1),
+        "total_count": total,
+        "messages": stats["messages"],
+        "dropped": stats["dropped"],
+        "delta_kb": round(stats["delta_bytes"] / 1024, 1),
+        "full_state_kb": round(stats["full_state_bytes"] / 1024, 1)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate G-Counter gossip between regions")
+    parser.add_argument("--regions", type=int, default=4)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--rate", type=int, default=5_000, help="visits/s per region")
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--topology", choices=["mesh", "ring"], default="mesh")
+    args = parser.parse_args()
+
+    result = asyncio.run(simulate_gossip(
+        regions=args.regions,
+        shards=args.shards,
+        duration_s=args.duration,
+        visits_per_sec=args.rate,
+        interval_s=args.interval,
+        latency_s=args.latency,
+        drop_rate=args.drop_rate,
+        topology=args.topology
+    ))
+    print(json.dumps(result, indent=2))
@@ -1,8 +1,12 @@
 import pytest
+import asyncio
 from datetime import datetime
 from .counter_shard import CounterShard, Visit
-from .regional_aggregator import RegionalAggregator
+from .regional_aggregator import RegionalAggregator, RegionSnapshot
 from .global_aggregator import GlobalAggregator
+from .retention import MilestoneRetention, RingBufferRetention, VisitRetention
+from .checkpoint import Checkpointer
+from .broadcast import SnapshotBroadcaster
 
 def test_counter_shard():
     shard = CounterShard(shard_id="test-shard")
@@ -86,4 +90,288 @@ def test_approaching_target():
     
     # Test precision adjustment
     global_agg.adjust_precision()
-    assert region.aggregation_interval_ms == 100  # Should be in high precision mode 
\ No newline at end of file
+    assert region.aggregation_interval_ms == 100  # Should be in high precision mode
+
+def test_approach_floor_covers_leases():
+    global_agg = GlobalAggregator(target_count=1_000_000, approach_floor=1_000)
+    region = RegionalAggregator(region_id="test-region")
+    for i in range(3):
+        region.add_shard(CounterShard(shard_id=f"shard{i}", block_size=10_000))
+    global_agg.add_region(region)
+
+    # Leased blocks must end before the target: above 3 shards x 10k tickets
+    assert global_agg.get_approach_floor() == 30_001
+    global_agg.workers = 4
+    assert global_agg.get_approach_floor() == 120_001
+    region.shards["shard0"].add(880_000)
+    assert global_agg.is_approaching_target()
+    global_agg.approach_floor = 500_000
+    assert global_agg.get_approach_floor() == 500_000
+
+def test_ring_buffer_retention():
+    shard = CounterShard(shard_id="test-shard", retention=RingBufferRetention(capacity=10))
+    
+    visits = [shard.increment() for _ in range(25)]
+    assert shard.get_count() == 25
+    assert len(shard.visits) == 10
+    
+    # Most recent visits first
+    recent = list(shard.get_recent_visits(limit=3).values())
+    assert recent == [visits[24], visits[23], visits[22]]
+
+def test_incomplete_retention_fails_on_creation():
+    class RecordOnly(VisitRetention):
+        def record(self, visit):
+            pass
+
+    with pytest.raises(TypeError):
+        RecordOnly()
+
+def test_milestone_retention():
+    retention = MilestoneRetention(
+        target_count=50,
+        window=2,
+        recent_visits=RingBufferRetention(capacity=5)
+    )
+    shard = CounterShard(shard_id="test-shard", retention=retention)
+    
+    visits = [shard.increment() for _ in range(100)]
+    
+    # Full detail only around the target plus the recent ring buffer
+    assert [v.sequence for v in retention.get_captured()] == [48, 49, 50, 51, 52]
+    assert retention.get_captured(sequence=50) == [visits[49]]
+    assert len(shard.visits) == 10
+
+def test_running_totals():
+    global_agg = GlobalAggregator()
+    region = RegionalAggregator(region_id="test-region")
+    shard1 = CounterShard(shard_id="shard1")
+    shard2 = CounterShard(shard_id="shard2")
+    
+    shard1.increment()
+    region.add_shard(shard1)
+    global_agg.add_region(region)
+    region.add_shard(shard2)
+    
+    # Deltas flow from shards to the region and global totals
+    shard2.increment()
+    shard2.count = 10
+    assert region.total_count == 11
+    assert global_agg.total_count == 11
+    
+    # Reconciliation repairs drift against a full recount
+    region.total_count += 5
+    global_agg.total_count -= 2
+    assert global_agg.reconcile() == 2
+    assert region.get_total_count() == 11
+    assert global_agg.get_global_count() == 11
+    assert global_agg.reconcile() == 0
+
+def test_ticket_leases():
+    global_agg = GlobalAggregator()
+    region = RegionalAggregator(region_id="test-region")
+    shard1 = CounterShard(shard_id="shard1", block_size=100)
+    shard2 = CounterShard(shard_id="shard2", block_size=100)
+    region.add_shard(shard1)
+    region.add_shard(shard2)
+    global_agg.add_region(region)
+    
+    # Each shard counts locally inside its leased block
+    tickets1 = [shard1.increment().sequence for _ in range(150)]
+    tickets2 = [shard2.increment().sequence for _ in range(50)]
+    assert tickets1 == list(range(1, 151))
+    assert tickets2 == list(range(201, 251))
+    assert global_agg.sequence.value == 300
+    assert shard1.get_leased_remaining() == 50
+    
+    # In high precision mode leases shrink to a single ticket
+    region.enter_high_precision_mode()
+    [shard2.increment() for _ in range(50)]
+    assert shard2.increment().sequence == 301
+    assert shard1.increment().sequence == 151  # Finishes its current block first
+
+
+def test_g_counter_replicas():
+    replica_a = CounterShard(shard_id="shard1", replica_id="a")
+    replica_b = CounterShard(shard_id="shard1", replica_id="b")
+    for _ in range(3):
+        replica_a.increment()
+    for _ in range(5):
+        replica_b.increment()
+    
+    # Only entries changed since the last call are shipped
+    assert replica_a.take_delta() == {"a": 3}
+    assert replica_a.take_delta() == {}
+    
+    # Merging is idempotent and keeps increments from both replicas
+    replica_a.merge(replica_b)
+    replica_a.merge(replica_b)
+    replica_b.apply_delta({"a": 3})
+    assert replica_a.count == replica_b.count == 8
+    assert replica_a.get_state() == replica_b.get_state() == {"a": 3, "b": 5}
+    
+    # Stale deltas never move a replica backwards
+    assert replica_b.apply_delta({"a": 1}) == 0
+    assert replica_b.count == 8
+    assert replica_a.take_delta() == {"b": 5}
+
+def test_aggregation_pipeline():
+    global_agg = GlobalAggregator(target_count=2_000_000_000)
+    region = RegionalAggregator(region_id="test-region")
+    shard = CounterShard(shard_id="test-shard")
+    region.add_shard(shard)
+    global_agg.add_region(region)
+    region.aggregation_interval_ms = 10
+    
+    async def run():
+        tasks = global_agg.start_aggregation()
+        shard.count = 5
+        # Readers see the last published snapshot until the next round
+        assert global_agg.get_snapshot().count == 0
+        await asyncio.sleep(0.05)
+        assert global_agg.get_snapshot().count == 5
+        assert region.aggregation_interval_ms == 1000  # Set by the pipeline
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    asyncio.run(run())
+    
+    # Without a rate estimate the interval follows the remaining count
+    global_agg = GlobalAggregator(target_count=2_000_000_000)
+    region = RegionalAggregator(region_id="test-region")
+    shard = CounterShard(shard_id="test-shard", count=1_450_000_000)
+    region.add_shard(shard)
+    global_agg.add_region(region)
+    assert region.aggregation_interval_ms == 550
+    assert not global_agg.get_snapshot().approaching_target
+    shard.count = 1_950_000_000
+    global_agg.adjust_precision()
+    assert global_agg.is_approaching_target()
+    assert region.aggregation_interval_ms == 100
+    assert shard.is_high_precision_mode()
+
+def test_eta_drives_precision():
+    global_agg = GlobalAggregator(target_count=10_000_000_000)
+    region = RegionalAggregator(region_id="test-region")
+    shard = CounterShard(shard_id="test-shard")
+    region.add_shard(shard)
+    global_agg.add_region(region)
+    
+    def publish(count, taken_at):
+        shard.count = count
+        global_agg.receive_snapshot(RegionSnapshot(region.region_id, count, False, taken_at))
+    
+    publish(0, 1000.0)
+    publish(1_000_000_000, 1010.0)
+    # 100M visits/s and 9B to go: 90s away, beyond the 60s precision lead
+    assert global_agg.rate.get_rate() == 100_000_000
+    assert global_agg.get_eta_s() == 90
+    assert region.aggregation_interval_ms == 900
+    assert not shard.is_high_precision_mode()
+    
+    publish(4_000_000_000, 1040.0)
+    assert global_agg.get_eta_s() == 60
+    assert global_agg.get_snapshot().approaching_target
+    assert shard.is_high_precision_mode()
+    assert region.aggregation_interval_ms == 100  # Pinned in high precision mode
+    
+    metrics = global_agg.get_metrics()
+    assert metrics["eta_s"] == 60
+    assert metrics["regions"]["test-region"]["rate_per_s"] == 100_000_000
+    
+    # A slower rate pushes the prediction out again
+    publish(4_100_000_000, 1050.0)
+    assert 60 < global_agg.get_eta_s() < 5_900_000_000 / 10_000_000
+
+def test_increment_batch():
+    global_agg = GlobalAggregator()
+    region = RegionalAggregator(region_id="test-region")
+    shard = CounterShard(shard_id="shard1", block_size=100)
+    region.add_shard(shard)
+    global_agg.add_region(region)
+    
+    shard.increment()
+    visits = shard.increment_batch([{"n": i} for i in range(150)])
+    
+    # The rest of the current lease is used first, then one block-sized reservation
+    assert [v.sequence for v in visits] == list(range(2, 152))
+    assert visits[0].id == "shard1-2" and visits[-1].id == "shard1-151"
+    assert visits[10].metadata == {"n": 10}
+    assert shard.count == 151
+    assert region.get_total_count() == 151
+    assert global_agg.sequence.value == 200
+    assert shard.get_leased_remaining() == 49
+    
+    global_agg.target_count = 150
+    winner = global_agg.check_batch_for_winner(visits)
+    assert winner is visits[148]
+    assert global_agg.winner is winner
+    assert shard.increment_batch([]) == []
+
+def test_checkpoint_recovery(tmp_path):
+    def build(path):
+        global_agg = GlobalAggregator(target_count=5_000)
+        region = RegionalAggregator(region_id="test-region")
+        region.add_shard(CounterShard(shard_id="shard1", block_size=100))
+        region.add_shard(CounterShard(shard_id="shard2", block_size=100))
+        global_agg.add_region(region)
+        checkpointer = Checkpointer(path=str(path), ticket_chunk=1_000)
+        checkpointer.recover(global_agg)
+        return global_agg, region, checkpointer
+    
+    path = tmp_path / "checkpoint.log"
+    global_agg, region, checkpointer = build(path)
+    tickets = [region.shards["shard1"].increment().sequence for _ in range(250)]
+    tickets += [region.shards["shard2"].increment().sequence for _ in range(50)]
+    checkpointer.checkpoint(checkpointer.collect(global_agg))
+    assert checkpointer.collect(global_agg) == {}
+    region.shards["shard2"].increment()  # Lost: counted after the last checkpoint
+    checkpointer.close()
+    with open(path, "a") as f:
+        f.write('{"type": "shards", "shards": {"shard1"')  # Torn write
+    
+    # A restarted process recovers the counts and never reuses a ticket
+    global_agg, region, checkpointer = build(path)
+    assert region.shards["shard1"].get_count() == 250
+    assert region.shards["shard2"].get_count() == 50
+    assert global_agg.get_global_count() == 300
+    assert region.shards["shard1"].increment().sequence > max(tickets)
+    with open(path) as f:
+        assert f.read().endswith("\n")
+    
+    # The ceiling stops short of the target until the target is handed out
+    visits = region.shards["shard2"].increment_batch([None] * 4_800)
+    assert global_agg.check_batch_for_winner(visits) is not None
+    checkpointer.close()
+    global_agg, region, checkpointer = build(path)
+    assert global_agg.winner.sequence == 5_000
+    assert global_agg.sequence.inner.value >= 5_000
+
+def test_snapshot_broadcaster():
+    global_agg = GlobalAggregator()
+    region = RegionalAggregator(region_id="test-region")
+    shard = CounterShard(shard_id="test-shard")
+    region.add_shard(shard)
+    global_agg.add_region(region)
+    broadcaster = SnapshotBroadcaster(global_agg=global_agg)
+    
+    async def collect(frames):
+        return [frame async for frame in broadcaster.subscribe(max_frames=frames)]
+    
+    async def run():
+        subscribers = [asyncio.create_task(collect(2)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert broadcaster.subscribers == 3
+        shard.count = 7
+        global_agg.receive_snapshot(region.take_snapshot())
+        broadcaster.publish()
+        return await asyncio.gather(*subscribers)
+    
+    results = asyncio.run(run())
+    # Every subscriber got the same two frames, each serialized once
+    assert results[0] == results[1] == results[2]
+    assert results[0][0] is results[1][0]
+    assert '"count":0' in results[0][0] and '"count":7' in results[0][1]
+    assert broadcaster.version == 2
+    assert broadcaster.subscribers == 0
@@ -0,0 +1,194 @@
+import multiprocessing
+import threading
+from array import array
+import pytest
+from .checkpoint import Checkpointer, read_ticket_state
+from .counter_shard import CounterShard
+from .regional_aggregator import RegionalAggregator
+from .global_aggregator import GlobalAggregator
+from .sequence import LocalSequence, RedisSequence, SequenceBackend, SharedMemorySequence
+from .shared_counts import SharedCounts
+
+class SharedRedisStandIn:
+    """Minimal Redis stand-in whose INCRBY is atomic across processes."""
+
+    def __init__(self):
+        self.value = multiprocessing.Value('q', 0)
+
+    def incrby(self, key, amount):
+        with self.value.get_lock():
+            self.value.value += amount
+            return self.value.value
+
+def _reserve_tickets(sequence, reservations, batch, results):
+    tickets = array('q')
+    for _ in range(reservations):
+        first = sequence.reserve(batch)
+        tickets.extend(range(first, first + batch))
+    results.put(tickets.tobytes())
+
+def _build_system():
+    global_agg = GlobalAggregator(target_count=12_345)
+    for region_id in ["region1", "region2"]:
+        region = RegionalAggregator(region_id=region_id)
+        for i in range(3):
+            region.add_shard(CounterShard(shard_id=f"{region_id}-shard-{i}", block_size=100))
+        global_agg.add_region(region)
+    return global_agg
+
+def _count_in_worker(index, workers, shared, sequence, visits, results):
+    global_agg = _build_system()
+    global_agg.use_sequence(sequence)
+    global_agg.attach_shared_counts(shared, index, workers)
+    tickets = array('q')
+    for i in range(visits):
+        region = global_agg.regions["region1" if i % 4 else "region2"]
+        shard = region.shards[f"{region.region_id}-shard-{i % 3}"]
+        visit = shard.increment()
+        global_agg.check_for_winner(visit)
+        tickets.append(visit.sequence)
+    results.put(tickets.tobytes())
+
+def test_local_sequence_threads():
+    sequence = LocalSequence()
+    threads_count, reservations = 8, 250_000
+    claimed = bytearray(threads_count * reservations + 1)
+    duplicates = []
+
+    def worker():
+        for _ in range(reservations):
+            ticket = sequence.reserve()
+            if claimed[ticket]:
+                duplicates.append(ticket)
+            claimed[ticket] = 1
+
+    threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Two million tickets, each handed out exactly once with no gaps
+    assert not duplicates
+    assert claimed.count(1) == threads_count * reservations
+    assert claimed[0] == 0
+
+def test_incomplete_sequence_fails_on_creation():
+    class ReserveOnly(SequenceBackend):
+        def reserve(self, count=1):
+            return 1
+
+    with pytest.raises(TypeError):
+        ReserveOnly()
+
+def test_redis_sequence_processes():
+    context = multiprocessing.get_context("fork")
+    sequence = RedisSequence(client=SharedRedisStandIn())
+    results = context.Queue()
+    processes_count, reservations, batch = 4, 50_000, 5
+
+    processes = [
+        context.Process(target=_reserve_tickets, args=(sequence, reservations, batch, results))
+        for _ in range(processes_count)
+    ]
+    for process in processes:
+        process.start()
+    tickets = array('q')
+    for _ in processes:
+        tickets.frombytes(results.get())
+    for process in processes:
+        process.join()
+
+    total = processes_count * reservations * batch
+    assert sorted(tickets) == list(range(1, total + 1))
+
+def test_exactly_one_winner_under_concurrency():
+    global_agg = GlobalAggregator(target_count=100_000)
+    shards = []
+    for region_id in ["region1", "region2"]:
+        region = RegionalAggregator(region_id=region_id)
+        for i in range(4):
+            shard = CounterShard(shard_id=f"{region_id}-shard-{i}")
+            region.add_shard(shard)
+            shards.append(shard)
+        global_agg.add_region(region)
+
+    # The target is within the approach margin, so shards lease one ticket per visit
+    global_agg.adjust_precision()
+    winners = []
+
+    def worker(shard):
+        for _ in range(25_000):
+            visit = shard.increment()
+            if global_agg.check_for_winner(visit):
+                winners.append(visit)
+
+    threads = [threading.Thread(target=worker, args=(shard,)) for shard in shards]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(winners) == 1
+    assert winners[0].sequence == 100_000
+    assert global_agg.winner is winners[0]
+
+def test_shared_counts_across_workers():
+    context = multiprocessing.get_context("fork")
+    workers, visits = 3, 10_000
+    layout = _build_system()
+    shared = SharedCounts(slots=layout.shared_slots(workers))
+    sequence = SharedMemorySequence()
+    results = context.Queue()
+
+    processes = [
+        context.Process(target=_count_in_worker, args=(i, workers, shared, sequence, visits, results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    tickets = array('q')
+    for _ in processes:
+        tickets.frombytes(results.get())
+    for process in processes:
+        process.join()
+
+    # Any process sees every worker's counts
+    layout.attach_shared_counts(shared, 0, workers)
+    try:
+        assert layout.get_global_count() == workers * visits
+        assert layout.regions["region2"].get_total_count() == workers * visits // 4
+        assert layout.regions["region1"].get_total_count() == workers * visits * 3 // 4
+        # Tickets are unique across workers
+        assert len(set(tickets)) == workers * visits
+        # The winner counted by one worker is visible to all of them
+        winner = layout.get_winner()
+        assert winner.sequence == 12_345
+        assert winner.replica_id.rsplit("-w", 1)[1] in {str(i) for i in range(workers)}
+        assert layout.get_metrics()["has_winner"]
+    finally:
+        shared.close()
+
+def test_worker_checkpoints_share_one_ceiling(tmp_path):
+    base = tmp_path / "data" / "checkpoint.log"
+    sequence = LocalSequence()
+    checkpointers = [Checkpointer(path=f"{base}.worker-{i}", ticket_chunk=100) for i in range(2)]
+    # Nothing is created until a worker writes
+    assert not (tmp_path / "data").exists()
+
+    tickets = []
+    for index, checkpointer in enumerate(checkpointers):
+        global_agg = _build_system()
+        global_agg.use_sequence(sequence)
+        checkpointer.recover(global_agg)
+        shard = global_agg.regions["region1"].shards["region1-shard-0"]
+        tickets += [shard.increment().sequence for _ in range(50 + 500 * index)]
+        checkpointer.close()
+
+    # After a restart the shared sequence resumes above every worker's ceiling
+    ceiling, winner = read_ticket_state(str(base))
+    assert ceiling == max(checkpointer.ceiling for checkpointer in checkpointers)
+    assert winner is None
+    restarted = LocalSequence()
+    restarted.advance_to(ceiling)
+    assert restarted.reserve() > max(tickets)
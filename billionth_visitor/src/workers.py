@@ -0,0 +1,113 @@
+"""
+Multi-process deployment: several uvicorn workers sharing shard counts.
+
+Run from the billionth_visitor directory, e.g.:
+    python -m src.workers --workers 4 --port 8000
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+from typing import List
+
+from .checkpoint import read_ticket_state
+from .sequence import SequenceBackend
+from .shared_counts import SharedCounts
+
+def _worker_main(
+    index: int,
+    workers: int,
+    sock: socket.socket,
+    shared: SharedCounts,
+    sequence: SequenceBackend
+) -> None:
+    """Entry point of a worker process."""
+    import uvicorn
+    from . import main
+
+    main.global_aggregator.use_sequence(sequence)
+    main.global_aggregator.attach_shared_counts(shared, index, workers)
+    # Each worker checkpoints and recovers its own shard counts; the shared
+    # ticket ceiling and winner were recovered by the launcher
+    main.checkpointer = main.create_checkpointer(suffix=f".worker-{index}")
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="warning"))
+    try:
+        server.run(sockets=[sock])
+    except KeyboardInterrupt:
+        pass
+
+def run_workers(host: str, port: int, workers: int) -> None:
+    """
+    Start worker processes serving one port and wait for them.
+
+    The launcher binds the socket and creates the shared count slots and
+    ticket sequence, then forks the workers, which inherit all three. Each
+    worker counts visits on its own shard objects and publishes them into
+    its slots, so every worker reads the same totals, and the winning visit
+    is published in the same block. Tickets come from
+    Redis when REDIS_URL is set, otherwise from shared memory.
+
+    Workers checkpoint to their own files, but the sequence is shared, so
+    before forking the launcher advances it past the highest ticket ceiling
+    in any of those files and publishes a recovered winner. No worker can
+    then hand out a ticket another worker handed out before a restart.
+
+    Args:
+        host: Host to bind
+        port: Port shared by all workers
+        workers: Number of worker processes
+    """
+    from . import main
+    from .sequence import SharedMemorySequence
+
+    context = multiprocessing.get_context("fork")
+    shared = SharedCounts(slots=main.global_aggregator.shared_slots(workers))
+    sequence = main.create_sequence() if os.getenv("REDIS_URL") else SharedMemorySequence()
+    checkpointer = main.create_checkpointer()
+    if checkpointer is not None:
+        ceiling, winner = read_ticket_state(checkpointer.path)
+        if ceiling:
+            sequence.advance_to(ceiling)
+        if winner:
+            shared.set_winner(winner)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    processes: List[multiprocessing.Process] = []
+    for index in range(workers):
+        process = context.Process(
+            target=_worker_main,
+            args=(index, workers, sock, shared, sequence),
+            name=f"visitor-worker-{index}"
+        )
+        process.start()
+        processes.append(process)
+
+    def _stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        for process in processes:
+            process.join()
+    except (KeyboardInterrupt, SystemExit):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+    finally:
+        sock.close()
+        shared.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the visitor counter on several worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    run_workers(args.host, args.port, args.workers)
@@ -0,0 +1,158 @@
+import argparse
+import json
+import random
+import shutil
+import string
+import tempfile
+import time
+import tracemalloc
+import msgpack
+from src.cache_node import CacheNode
+from src.compression import ValueCodec, lz4_frame
+
+def make_payloads():
+    """Build representative payloads: HTML fragments, JSON blobs and noise."""
+    rng = random.Random(42)
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+             for _ in range(500)]
+
+    html = ''.join(
+        f'<div class="item" data-id="{i}"><a href="/p/{i}">'
+        f'{" ".join(rng.choices(words, k=8))}</a><span>${rng.randint(1, 999)}</span></div>'
+        for i in range(200)
+    )
+    blob = {
+        'users': [
+            {
+                'id': i,
+                'name': rng.choice(words).title(),
+                'tags': rng.choices(words, k=5),
+                'active': rng.random() > 0.5
+            }
+            for i in range(300)
+        ]
+    }
+    return {
+        'small_string': 'user:session:' + 'x' * 64,
+        'html_fragment': html,
+        'json_blob': json.loads(json.dumps(blob)),
+        'random_bytes': bytes(rng.getrandbits(8) for _ in range(16 * 1024))
+    }
+
+def _measure_node_memory(make_value, items: int) -> int:
+    """Bytes actually allocated per item by a CacheNode holding fresh values."""
+    node = CacheNode(max_memory_mb=1024)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(items):
+        node.set(f"key:{i}", make_value())
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) // items
+
+def bench_compression(iterations: int = 2000, items: int = 100):
+    """Compare wire size, node memory and round-trip throughput per codec."""
+    codecs = {'none': None, 'zlib': ValueCodec(threshold=1024, algorithm='zlib')}
+    if lz4_frame is not None:
+        codecs['lz4'] = ValueCodec(threshold=1024, algorithm='lz4')
+
+    results = []
+    for payload_name, payload in make_payloads().items():
+        for codec_name, codec in codecs.items():
+            if codec:
+                encode, decode = codec.encode, codec.decode
+            else:
+                # Without a codec the server keeps the unpacked object
+                encode = lambda v: msgpack.packb(v, use_bin_type=True)
+                decode = lambda v: msgpack.unpackb(v, raw=False)
+
+            wire = encode(payload)
+            if codec:
+                make_value = lambda: bytes(bytearray(wire))
+            else:
+                make_value = lambda: decode(wire)
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                decode(encode(payload))
+            elapsed = time.perf_counter() - start
+
+            results.append({
+                'payload': payload_name,
+                'codec': codec_name,
+                'wire_bytes': len(wire),
+                'node_bytes_per_item': _measure_node_memory(make_value, items),
+                'roundtrips_per_sec': int(iterations / elapsed)
+            })
+
+    print(f"{'payload':<15}{'codec':<7}{'wire bytes':>12}{'node bytes':>12}{'ops/s':>12}")
+    for r in results:
+        print(f"{r['payload']:<15}{r['codec']:<7}{r['wire_bytes']:>12}"
+              f"{r['node_bytes_per_item']:>12}{r['roundtrips_per_sec']:>12}")
+    return results
+
+def bench_persistence(items: int = 100_000):
+    """Measure append-only log write overhead and recovery time."""
+    value = {'id': 1, 'name': 'visitor', 'tags': ['a', 'b', 'c']}
+    configs = [('memory', None), ('aof 1ms', 1), ('aof 10ms', 10), ('aof 100ms', 100)]
+
+    print(f"{'mode':<12}{'sets/s':>12}{'log MB':>10}")
+    results = {'writes': [], 'recovery': []}
+    for name, fsync_interval_ms in configs:
+        directory = tempfile.mkdtemp(prefix='cache-aof-')
+        try:
+            node = CacheNode(
+                max_memory_mb=1024,
+                persistence_dir=directory if fsync_interval_ms else None,
+                fsync_interval_ms=fsync_interval_ms or 10
+            )
+            start = time.perf_counter()
+            for i in range(items):
+                node.set(f"key:{i}", value, ttl=3600)
+            elapsed = time.perf_counter() - start
+            log_bytes = 0
+            if node.aof:
+                node.aof.flush()
+                log_bytes = node.aof.log_bytes
+            node.close()
+            results['writes'].append({'mode': name, 'sets_per_sec': int(items / elapsed)})
+            print(f"{name:<12}{int(items / elapsed):>12}{log_bytes / 2**20:>10.1f}")
+        finally:
+            shutil.rmtree(directory)
+
+    print(f"\n{'recover from':<24}{'items':>10}{'seconds':>10}")
+    directory = tempfile.mkdtemp(prefix='cache-aof-')
+    try:
+        node = CacheNode(max_memory_mb=1024, persistence_dir=directory)
+        for i in range(items):
+            node.set(f"key:{i}", value, ttl=3600)
+        for i in range(items // 2):  # Overwrites that compaction drops
+            node.set(f"key:{i}", value, ttl=3600)
+        node.close()
+
+        for label in ('log only', 'snapshot'):
+            if label == 'snapshot':
+                node = CacheNode(max_memory_mb=1024, persistence_dir=directory)
+                node.snapshot()
+                node.close()
+            start = time.perf_counter()
+            node = CacheNode(max_memory_mb=1024, persistence_dir=directory)
+            elapsed = time.perf_counter() - start
+            count = node.get_stats()['item_count']
+            node.close()
+            results['recovery'].append({'source': label, 'items': count, 'seconds': elapsed})
+            print(f"{label:<24}{count:>10}{elapsed:>10.3f}")
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+BENCHMARKS = {
+    'compression': bench_compression,
+    'persistence': bench_persistence
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Distributed cache benchmarks")
+    parser.add_argument('suite', choices=sorted(BENCHMARKS), nargs='?', default='compression')
+    args = parser.parse_args()
+    BENCHMARKS[args.suite]()
@@ -2,5 +2,9 @@ from .cache_node import CacheNode
 from .cache_server import CacheServer
 from .cache_client import DistributedCacheClient
 from .consistent_hash import ConsistentHash
+from .compression import ValueCodec
+from .hot_keys import HotKeyDetector
+from .workers import worker_for_key
+from .persistence import AppendOnlyLog
 
-__all__ = ['CacheNode', 'CacheServer', 'DistributedCacheClient', 'ConsistentHash'] 
\ No newline at end of file
+__all__ = ['CacheNode', 'CacheServer', 'DistributedCacheClient', 'ConsistentHash', 'ValueCodec', 'HotKeyDetector', 'worker_for_key', 'AppendOnlyLog'] 
\ No newline at end of file
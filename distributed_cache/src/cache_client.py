@@ -1,76 +1,209 @@
 import asyncio
+import math
+import random
+import time
 import aiohttp
 import msgpack
-from typing import Any, List, Optional, Dict, Tuple
+from typing import Any, Awaitable, Callable, List, Optional, Dict, Tuple
 from .consistent_hash import ConsistentHash
+from .compression import ValueCodec
+from .hot_keys import HOT_KEY_HEADER
+from .workers import worker_for_key
+from urllib.parse import urlsplit
+
+# Result shared with waiting `get_or_compute` callers when the computing one is cancelled
+_LEADER_CANCELLED = object()
 
 class DistributedCacheClient:
-    def __init__(self, nodes: List[str], replicas: int = 100):
+    def __init__(
+        self,
+        nodes: List[str],
+        replicas: int = 100,
+        compression_threshold: Optional[int] = 1024,
+        compression: str = 'auto',
+        hot_key_replicas: int = 2,
+        hot_key_ttl: float = 10.0,
+        local_copy_ttl: Optional[float] = None
+    ):
         """
         Initialize the distributed cache client.
         
         Args:
             nodes: List of node URLs (e.g., ['http://localhost:8001', 'http://localhost:8002'])
             replicas: Number of virtual nodes per physical node
+            compression_threshold: Serialized size in bytes above which values
+                are compressed, or None to send values as-is
+            compression: Compression algorithm ('zlib', 'lz4' or 'auto')
+            hot_key_replicas: Extra nodes that serve reads of hot keys
+            hot_key_ttl: Seconds a key stays hot after a node last advertised it
+            local_copy_ttl: Seconds to serve hot keys from a local copy, or
+                None to always read them from a node
         """
         self.consistent_hash = ConsistentHash(nodes, replicas)
+        self.codec: Optional[ValueCodec] = None
+        if compression_threshold is not None:
+            self.codec = ValueCodec(compression_threshold, compression)
+        self.hot_key_replicas = hot_key_replicas
+        self.hot_key_ttl = hot_key_ttl
+        self.local_copy_ttl = local_copy_ttl
+        self.hot_keys: Dict[str, float] = {}  # Maps hot keys to hotness expiry
+        self._local_copies: Dict[str, Tuple[Any, float]] = {}
+        self._worker_urls: Dict[str, List[str]] = {}  # Maps nodes to worker URLs
+        self._inflight: Dict[str, asyncio.Future] = {}  # Maps keys to running computations
+        self.lease_poll_interval = 0.05  # seconds
         self._session: Optional[aiohttp.ClientSession] = None
         self.default_timeout = 5.0  # seconds
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create the aiohttp session."""
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                json_serialize=msgpack.packb,
-                json_deserialize=msgpack.unpackb
-            )
+            self._session = aiohttp.ClientSession()
         return self._session
     
+    async def _read(self, response: aiohttp.ClientResponse) -> Any:
+        """Decode a msgpack response body."""
+        return msgpack.unpackb(await response.read(), raw=False)
+    
     async def close(self):
         """Close the client session."""
         if self._session and not self._session.closed:
             await self._session.close()
     
+    def _encode(self, value: Any) -> Any:
+        """Encode a value for the wire, compressing it if configured."""
+        return self.codec.encode(value) if self.codec else value
+    
+    def _decode(self, value: Any) -> Any:
+        """Decode a value received from a node."""
+        return self.codec.decode(value) if self.codec else value
+    
+    def _mark_hot(self, key: str) -> None:
+        """Remember that a node advertised a key as hot."""
+        self.hot_keys[key] = time.time() + self.hot_key_ttl
+    
+    def _is_hot(self, key: str) -> bool:
+        """Check if a key is currently considered hot."""
+        expiry = self.hot_keys.get(key)
+        if expiry is None:
+            return False
+        if time.time() > expiry:
+            del self.hot_keys[key]
+            self._local_copies.pop(key, None)
+            return False
+        return True
+    
+    def _read_nodes(self, key: str) -> List[str]:
+        """Get the nodes that may serve reads of a key, primary first."""
+        if self._is_hot(key):
+            return self.consistent_hash.get_nodes(key, 1 + self.hot_key_replicas)
+        return self.consistent_hash.get_nodes(key, 1)
+    
+    def _route(self, node: str, key: str) -> str:
+        """Get the URL of the worker owning a key on a node."""
+        workers = self._worker_urls.get(node)
+        if not workers:
+            return node
+        return workers[worker_for_key(key, len(workers))]
+    
+    async def _fetch(
+        self,
+        session: aiohttp.ClientSession,
+        node: str,
+        key: str
+    ) -> Tuple[Any, Optional[float], int]:
+        """
+        Fetch the raw stored value of a key from one node.
+        
+        Returns:
+            Tuple of (raw value, remaining TTL or None, HTTP status)
+        """
+        async with session.get(
+            f"{self._route(node, key)}/cache/{key}",
+            timeout=self.default_timeout
+        ) as response:
+            if response.status != 200:
+                return None, None, response.status
+            if response.headers.get(HOT_KEY_HEADER):
+                self._mark_hot(key)
+            data = await self._read(response)
+            return data['value'], data.get('ttl'), 200
+    
+    async def _put(
+        self,
+        session: aiohttp.ClientSession,
+        node: str,
+        key: str,
+        data: bytes
+    ) -> bool:
+        """Send an already packed set request to one node."""
+        try:
+            async with session.put(
+                f"{self._route(node, key)}/cache/{key}",
+                data=data,
+                headers={'Content-Type': 'application/msgpack'},
+                timeout=self.default_timeout
+            ) as response:
+                return response.status == 200
+        except:
+            return False
+    
     async def get(self, key: str) -> Tuple[Any, bool]:
         """
         Retrieve a value from the cache.
         
+        Reads of hot keys are spread across the primary node and
+        `hot_key_replicas` extra nodes, or served from a local copy when
+        `local_copy_ttl` is set.
+        
         Args:
             key: The key to look up
             
         Returns:
             Tuple of (value, success)
         """
-        node = self.consistent_hash.get_node(key)
-        if not node:
+        local = self._local_copies.get(key)
+        if local is not None:
+            if time.time() <= local[1] and self._is_hot(key):
+                return local[0], True
+            self._local_copies.pop(key, None)
+        
+        nodes = self._read_nodes(key)
+        if not nodes:
             return None, False
         
         session = await self._get_session()
+        node = random.choice(nodes)
         try:
-            async with session.get(
-                f"{node}/cache/{key}",
-                timeout=self.default_timeout
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data['value'], True
-                elif response.status == 404:
-                    return None, False
-                else:
-                    # Try backup nodes in case of failure
-                    backup_nodes = self.consistent_hash.get_nodes(key, 2)[1:]
-                    for backup_node in backup_nodes:
-                        try:
-                            async with session.get(
-                                f"{backup_node}/cache/{key}",
-                                timeout=self.default_timeout
-                            ) as backup_response:
-                                if backup_response.status == 200:
-                                    data = await backup_response.json()
-                                    return data['value'], True
-                        except:
-                            continue
-                    return None, False
+            raw, _, status = await self._fetch(session, node, key)
+            if status == 404 and node != nodes[0]:
+                # The replica has not been filled yet: read the primary
+                # and copy the value over for the following reads, expiring
+                # when the primary's copy does
+                raw, ttl, status = await self._fetch(session, nodes[0], key)
+                if status == 200:
+                    await self._put(session, node, key, msgpack.packb(
+                        {'value': raw, 'ttl': ttl},
+                        use_bin_type=True
+                    ))
+            
+            if status == 200:
+                value = self._decode(raw)
+                if self.local_copy_ttl and self._is_hot(key):
+                    self._local_copies[key] = (value, time.time() + self.local_copy_ttl)
+                return value, True
+            elif status == 404:
+                return None, False
+            else:
+                # Try backup nodes in case of failure
+                backup_nodes = self.consistent_hash.get_nodes(key, 2)[1:]
+                for backup_node in backup_nodes:
+                    try:
+                        raw, _, status = await self._fetch(session, backup_node, key)
+                        if status == 200:
+                            return self._decode(raw), True
+                    except:
+                        continue
+                return None, False
         except:
             return None, False
     
@@ -88,33 +221,28 @@ class DistributedCacheClient:
             key: The key to store
             value: The value to store
             ttl: Time-to-live in seconds
-            replicas: Number of replicas to maintain
+            replicas: Number of replicas to maintain. The hot key read
+                replicas are always written too: other clients may treat
+                the key as hot even if this one does not
             
         Returns:
             True if successful on at least one node
         """
-        nodes = self.consistent_hash.get_nodes(key, replicas)
+        self._local_copies.pop(key, None)
+        nodes = self.consistent_hash.get_nodes(key, max(replicas, 1 + self.hot_key_replicas))
         if not nodes:
             return False
         
         session = await self._get_session()
-        data = {
-            'value': value,
+        data = msgpack.packb({
+            'value': self._encode(value),
             'ttl': ttl
-        }
+        }, use_bin_type=True)
         
         success = False
         for node in nodes:
-            try:
-                async with session.put(
-                    f"{node}/cache/{key}",
-                    json=data,
-                    timeout=self.default_timeout
-                ) as response:
-                    if response.status == 200:
-                        success = True
-            except:
-                continue
+            if await self._put(session, node, key, data):
+                success = True
         
         return success
     
@@ -122,13 +250,17 @@ class DistributedCacheClient:
         """
         Delete a key from all nodes.
         
+        Whether or not the key is hot now, other clients may have copied
+        it to the hot key read replicas, so those are always included.
+        
         Args:
             key: The key to delete
             
         Returns:
             True if deleted from at least one node
         """
-        nodes = self.consistent_hash.get_nodes(key, 2)
+        self._local_copies.pop(key, None)
+        nodes = self.consistent_hash.get_nodes(key, max(2, 1 + self.hot_key_replicas))
         if not nodes:
             return False
         
@@ -138,7 +270,7 @@ class DistributedCacheClient:
         for node in nodes:
             try:
                 async with session.delete(
-                    f"{node}/cache/{key}",
+                    f"{self._route(node, key)}/cache/{key}",
                     timeout=self.default_timeout
                 ) as response:
                     if response.status == 200:
@@ -165,8 +297,230 @@ class DistributedCacheClient:
                     timeout=self.default_timeout
                 ) as response:
                     if response.status == 200:
-                        stats[node] = await response.json()
+                        stats[node] = await self._read(response)
+            except:
+                continue
+        
+        return stats 
+    
+    async def refresh_hot_keys(self) -> Dict[str, float]:
+        """
+        Pull the hot keys advertised by every node.
+        
+        Returns:
+            Dictionary mapping hot keys to their share of reads on their node
+        """
+        session = await self._get_session()
+        hot_keys = {}
+        
+        for node in set(self.consistent_hash.ring.values()):
+            try:
+                async with session.get(
+                    f"{node}/hotkeys",
+                    timeout=self.default_timeout
+                ) as response:
+                    if response.status == 200:
+                        hot_keys.update(await self._read(response))
+            except:
+                continue
+        
+        for key in hot_keys:
+            self._mark_hot(key)
+        return hot_keys
+    
+    async def discover_workers(self) -> Dict[str, List[str]]:
+        """
+        Learn the worker layout of every node for client-side routing.
+        
+        Requests to multi-worker nodes are then sent straight to the worker
+        owning the key instead of being forwarded between workers.
+        
+        Returns:
+            Dictionary mapping node URLs to their worker URLs
+        """
+        session = await self._get_session()
+        
+        for node in set(self.consistent_hash.ring.values()):
+            try:
+                async with session.get(
+                    f"{node}/topology",
+                    timeout=self.default_timeout
+                ) as response:
+                    if response.status != 200:
+                        continue
+                    topology = await self._read(response)
             except:
                 continue
+            
+            if topology['workers'] > 1:
+                parts = urlsplit(node)
+                self._worker_urls[node] = [
+                    f"{parts.scheme}://{parts.hostname}:{port}"
+                    for port in topology['ports']
+                ]
+            else:
+                self._worker_urls.pop(node, None)
+        
+        return dict(self._worker_urls)
+    
+    async def _acquire_lease(self, key: str, ttl: float) -> Optional[str]:
+        """
+        Ask the key's primary node for the right to recompute it.
         
-        return stats 
\ No newline at end of file
+        Returns:
+            A token if granted, None if another process holds the lease, or
+            an empty string if the node could not be asked (proceed unguarded)
+        """
+        node = self.consistent_hash.get_node(key)
+        if not node:
+            return ''
+        
+        session = await self._get_session()
+        try:
+            async with session.post(
+                f"{self._route(node, key)}/lease/{key}",
+                data=msgpack.packb({'ttl': ttl}),
+                headers={'Content-Type': 'application/msgpack'},
+                timeout=self.default_timeout
+            ) as response:
+                if response.status == 409:
+                    return None
+                if response.status == 200:
+                    return (await self._read(response))['token']
+                return ''
+        except:
+            return ''
+    
+    async def _release_lease(self, key: str, token: str) -> None:
+        """Release a lease obtained from `_acquire_lease`."""
+        node = self.consistent_hash.get_node(key)
+        if not node or not token:
+            return
+        
+        session = await self._get_session()
+        try:
+            async with session.delete(
+                f"{self._route(node, key)}/lease/{key}",
+                params={'token': token},
+                timeout=self.default_timeout
+            ):
+                pass
+        except:
+            pass
+    
+    def _should_refresh_early(self, entry: Dict[str, Any], beta: float) -> bool:
+        """
+        Decide whether to recompute a value before it expires (XFetch).
+        
+        The probability grows as expiry approaches and with the time the
+        last computation took, so one caller usually refreshes the value
+        shortly before it would have expired for everybody.
+        """
+        expiry = entry.get('expiry')
+        if expiry is None:
+            return False
+        delta = entry.get('delta') or 0.0
+        return time.time() - delta * beta * math.log(1.0 - random.random()) >= expiry
+    
+    async def get_or_compute(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        beta: float = 1.0,
+        lease_ttl: float = 10.0
+    ) -> Any:
+        """
+        Get a value, computing and storing it on a miss without stampedes.
+        
+        Concurrent calls for the same key in this process share a single
+        computation. Across processes, the process holding the key's lease
+        recomputes while the others keep serving the previous value or wait
+        for the new one. Values are refreshed probabilistically ahead of
+        expiry (XFetch), so the origin sees about one recompute per expiry.
+        
+        Keys used with this method must only be written through it: the
+        value is stored together with its expiry and computation time.
+        
+        Args:
+            key: The key to look up
+            coro_factory: Called without arguments to create the coroutine
+                that computes the value
+            ttl: Time-to-live in seconds
+            beta: XFetch eagerness; larger values refresh earlier
+            lease_ttl: Seconds a recompute lease lasts, which also bounds
+                how long other processes wait for the result
+            
+        Returns:
+            The cached or freshly computed value
+        """
+        while key in self._inflight:
+            value = await asyncio.shield(self._inflight[key])
+            if value is not _LEADER_CANCELLED:
+                return value
+            # The caller computing the value was cancelled: retry, so one
+            # of the waiting callers takes over
+        
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on the future, so retrieve failures here
+        future.add_done_callback(lambda f: f.exception())
+        self._inflight[key] = future
+        try:
+            value = await self._get_or_compute(key, coro_factory, ttl, beta, lease_ttl)
+        except asyncio.CancelledError:
+            # Only this caller was cancelled, not the callers waiting on it
+            del self._inflight[key]
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            del self._inflight[key]
+            future.set_exception(e)
+            raise
+        else:
+            del self._inflight[key]
+            future.set_result(value)
+            return value
+    
+    async def _get_or_compute(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+        beta: float,
+        lease_ttl: float
+    ) -> Any:
+        """Body of `get_or_compute` run by one coroutine per key."""
+        entry, found = await self.get(key)
+        stale = None
+        if found and isinstance(entry, dict) and 'value' in entry:
+            if not self._should_refresh_early(entry, beta):
+                return entry['value']
+            stale = entry
+        
+        token = await self._acquire_lease(key, lease_ttl)
+        if token is None:
+            if stale is not None:
+                return stale['value']
+            
+            # Another process is recomputing: wait for it to store the value
+            deadline = time.time() + lease_ttl
+            while time.time() < deadline:
+                await asyncio.sleep(self.lease_poll_interval)
+                entry, found = await self.get(key)
+                if found and isinstance(entry, dict) and 'value' in entry:
+                    return entry['value']
+        
+        try:
+            start = time.monotonic()
+            value = await coro_factory()
+            delta = time.monotonic() - start
+            
+            await self.set(key, {
+                'value': value,
+                'delta': delta,
+                'expiry': time.time() + ttl if ttl else None
+            }, ttl=ttl)
+            return value
+        finally:
+            if token:
+                await self._release_lease(key, token)
\ No newline at end of file
@@ -1,8 +1,10 @@
 import time
 import threading
-from typing import Dict, Tuple, Any, Optional
+import secrets
+from typing import Dict, Tuple, Any, Optional, Callable, List
 from dataclasses import dataclass
 import sys
+from .persistence import AppendOnlyLog, OP_SET, OP_DELETE, OP_CLEAR
 
 @dataclass
 class CacheItem:
@@ -12,12 +14,22 @@ class CacheItem:
     size: int
 
 class CacheNode:
-    def __init__(self, max_memory_mb: int = 1024):
+    def __init__(
+        self,
+        max_memory_mb: int = 1024,
+        persistence_dir: Optional[str] = None,
+        fsync_interval_ms: float = 10,
+        snapshot_interval_s: float = 300
+    ):
         """
         Initialize a cache node.
         
         Args:
             max_memory_mb: Maximum memory in megabytes
+            persistence_dir: Directory for the append-only log and snapshots,
+                or None to keep data in memory only
+            fsync_interval_ms: Interval between group commits of the log
+            snapshot_interval_s: Minimum seconds between compacted snapshots
         """
         self.cache: Dict[str, CacheItem] = {}
         self.max_memory = max_memory_mb * 1024 * 1024  # Convert to bytes
@@ -28,6 +40,18 @@ class CacheNode:
             'misses': 0,
             'evictions': 0
         }
+        
+        self.leases: Dict[str, Tuple[str, float]] = {}  # Maps keys to (token, expiry)
+        
+        self.aof: Optional[AppendOnlyLog] = None
+        if persistence_dir:
+            self.aof = AppendOnlyLog(
+                persistence_dir,
+                fsync_interval_ms=fsync_interval_ms,
+                snapshot_interval_s=snapshot_interval_s,
+                snapshot_source=self._snapshot_items
+            )
+            self._recover()
     
     def _get_item_size(self, key: str, value: Any) -> int:
         """Calculate the approximate size of a cache item in bytes."""
@@ -44,23 +68,37 @@ class CacheNode:
         Returns:
             Tuple of (value, success)
         """
+        value, _, success = self.get_with_ttl(key)
+        return value, success
+    
+    def get_with_ttl(self, key: str) -> Tuple[Any, Optional[float], bool]:
+        """
+        Retrieve a value and the seconds it has left to live.
+        
+        Args:
+            key: The key to look up
+            
+        Returns:
+            Tuple of (value, remaining TTL or None if it never expires, success)
+        """
         with self.lock:
             item = self.cache.get(key)
             if not item:
                 self.stats['misses'] += 1
-                return None, False
+                return None, None, False
             
             # Check expiration
-            if item.expiry and time.time() > item.expiry:
+            now = time.time()
+            if item.expiry and now > item.expiry:
                 del self.cache[key]
                 self.current_memory -= item.size
                 self.stats['misses'] += 1
-                return None, False
+                return None, None, False
             
             # Update access time
-            item.access_time = time.time()
+            item.access_time = now
             self.stats['hits'] += 1
-            return item.value, True
+            return item.value, (item.expiry - now if item.expiry else None), True
     
     def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
         """
@@ -75,31 +113,39 @@ class CacheNode:
             True if successful, False otherwise
         """
         with self.lock:
-            # Calculate size of new item
-            size = self._get_item_size(key, value)
-            
-            # If key exists, remove its size from current_memory
-            if key in self.cache:
-                self.current_memory -= self.cache[key].size
-            
-            # Check if we need to make room
-            while self.current_memory + size > self.max_memory:
-                if not self._evict_one():
-                    return False
-            
             # Calculate expiry time if TTL is provided
             expiry = time.time() + ttl if ttl else None
             
-            # Add/update the item
-            self.cache[key] = CacheItem(
-                value=value,
-                expiry=expiry,
-                access_time=time.time(),
-                size=size
-            )
-            self.current_memory += size
+            if not self._store(key, value, expiry):
+                return False
+            if self.aof:
+                self.aof.append(OP_SET, key, value, expiry)
             return True
     
+    def _store(self, key: str, value: Any, expiry: Optional[float]) -> bool:
+        """Add or update an item, evicting others to make room."""
+        # Calculate size of new item
+        size = self._get_item_size(key, value)
+        
+        # If key exists, remove its size from current_memory
+        if key in self.cache:
+            self.current_memory -= self.cache[key].size
+        
+        # Check if we need to make room
+        while self.current_memory + size > self.max_memory:
+            if not self._evict_one():
+                return False
+        
+        # Add/update the item
+        self.cache[key] = CacheItem(
+            value=value,
+            expiry=expiry,
+            access_time=time.time(),
+            size=size
+        )
+        self.current_memory += size
+        return True
+    
     def _evict_one(self) -> bool:
         """
         Evict the least recently used item.
@@ -134,6 +180,8 @@ class CacheNode:
             if key in self.cache:
                 self.current_memory -= self.cache[key].size
                 del self.cache[key]
+                if self.aof:
+                    self.aof.append(OP_DELETE, key)
                 return True
             return False
     
@@ -142,12 +190,79 @@ class CacheNode:
         with self.lock:
             self.cache.clear()
             self.current_memory = 0
+            if self.aof:
+                self.aof.append(OP_CLEAR)
+    
+    def acquire_lease(self, key: str, ttl: float) -> Optional[str]:
+        """
+        Grant the right to recompute a key to a single caller.
+        
+        Args:
+            key: The key to be recomputed
+            ttl: Seconds after which the lease lapses if never released
+            
+        Returns:
+            A lease token, or None if another caller holds the lease
+        """
+        with self.lock:
+            now = time.time()
+            lease = self.leases.get(key)
+            if lease and lease[1] > now:
+                return None
+            
+            if len(self.leases) >= 1024 and key not in self.leases:
+                self.leases = {k: v for k, v in self.leases.items() if v[1] > now}
+            
+            token = secrets.token_hex(8)
+            self.leases[key] = (token, now + ttl)
+            return token
+    
+    def release_lease(self, key: str, token: str) -> bool:
+        """
+        Release a lease granted by `acquire_lease`.
+        
+        Returns:
+            True if the token matched the current lease
+        """
+        with self.lock:
+            lease = self.leases.get(key)
+            if lease and lease[0] == token:
+                del self.leases[key]
+                return True
+            return False
+    
+    def _recover(self) -> None:
+        """Load the items persisted by a previous run."""
+        with self.lock:
+            for key, value, expiry in self.aof.recover():
+                self._store(key, value, expiry)
+    
+    def _snapshot_items(self, rotate: Callable[[], None]) -> List[Tuple[str, Any, Optional[float]]]:
+        """Copy the live items and rotate the log without letting writes in."""
+        with self.lock:
+            items = [(key, item.value, item.expiry) for key, item in self.cache.items()]
+            rotate()
+            return items
+    
+    def snapshot(self) -> None:
+        """Compact the append-only log into a snapshot now."""
+        if self.aof:
+            self.aof.snapshot()
+    
+    def close(self) -> None:
+        """Commit outstanding log writes and stop persistence."""
+        if self.aof:
+            self.aof.close()
+            self.aof = None
     
     def get_stats(self) -> Dict[str, int]:
         """Get cache statistics."""
         with self.lock:
-            return {
+            stats = {
                 **self.stats,
                 'current_memory': self.current_memory,
                 'item_count': len(self.cache)
-            } 
\ No newline at end of file
+            }
+            if self.aof:
+                stats.update({f'aof_{name}': value for name, value in self.aof.get_stats().items()})
+            return stats 
\ No newline at end of file
@@ -1,18 +1,55 @@
+import asyncio
+import aiohttp
 from aiohttp import web
 import msgpack
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from .cache_node import CacheNode
+from .hot_keys import HotKeyDetector, HOT_KEY_HEADER
+from .workers import FORWARDED_HEADER, run_workers, worker_for_key, worker_port
 
 class CacheServer:
-    def __init__(self, max_memory_mb: int = 1024):
+    def __init__(
+        self,
+        max_memory_mb: int = 1024,
+        hot_key_sample_rate: float = 0.01,
+        workers: int = 1,
+        worker_index: int = 0,
+        port: int = 8080,
+        internal_port_base: Optional[int] = None,
+        persistence_dir: Optional[str] = None
+    ):
         """
         Initialize the cache server.
         
         Args:
             max_memory_mb: Maximum memory in megabytes
+            hot_key_sample_rate: Fraction of reads sampled for hot key detection
+            workers: Number of worker processes sharing the node's keyspace
+            worker_index: Index of this worker when running multiple workers
+            port: Public port of the node
+            internal_port_base: First of the internal ports the workers listen
+                on (internal_port_base .. internal_port_base + workers - 1);
+                required with more than one worker. Pick a range that no
+                other node or service uses, e.g. 9001 for a node on 8001
+            persistence_dir: Directory for the node's append-only log, or
+                None to keep data in memory only
         """
-        self.node = CacheNode(max_memory_mb)
-        self.app = web.Application()
+        self.max_memory_mb = max_memory_mb
+        self.hot_key_sample_rate = hot_key_sample_rate
+        self.workers = workers
+        self.worker_index = worker_index
+        self.port = port
+        self.internal_port_base = internal_port_base
+        self.persistence_dir = persistence_dir
+        self.internal_host = '127.0.0.1'
+        self.node = CacheNode(max_memory_mb, persistence_dir=persistence_dir)
+        self.hot_keys = HotKeyDetector(sample_rate=hot_key_sample_rate)
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        middlewares = [self._forward_middleware] if workers > 1 else []
+        self.app = web.Application(middlewares=middlewares)
+        self.app.on_cleanup.append(self._close_session)
+        self.app.on_cleanup.append(self._close_node)
         self._setup_routes()
     
     def _setup_routes(self):
@@ -21,17 +58,96 @@ class CacheServer:
         self.app.router.add_put('/cache/{key}', self.set_handler)
         self.app.router.add_delete('/cache/{key}', self.delete_handler)
         self.app.router.add_get('/stats', self.stats_handler)
+        self.app.router.add_get('/hotkeys', self.hot_keys_handler)
+        self.app.router.add_get('/topology', self.topology_handler)
+        self.app.router.add_post('/lease/{key}', self.acquire_lease_handler)
+        self.app.router.add_delete('/lease/{key}', self.release_lease_handler)
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get or create the session used to reach sibling workers."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+    
+    async def _close_session(self, app: web.Application) -> None:
+        """Close the sibling session on shutdown."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+    
+    async def _close_node(self, app: web.Application) -> None:
+        """Commit outstanding writes of a persistent node on shutdown."""
+        self.node.close()
+    
+    def _worker_url(self, index: int) -> str:
+        """Get the internal URL of a sibling worker."""
+        return f"http://{self.internal_host}:{worker_port(self.internal_port_base, index)}"
+    
+    def _is_forwarded(self, request: web.Request) -> bool:
+        """Check if a request was already routed by a sibling worker."""
+        return bool(request.headers.get(FORWARDED_HEADER))
+    
+    @web.middleware
+    async def _forward_middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        """Forward key requests to the worker that owns the key."""
+        key = request.match_info.get('key')
+        if key is None or self._is_forwarded(request):
+            return await handler(request)
+        
+        owner = worker_for_key(key, self.workers)
+        if owner == self.worker_index:
+            return await handler(request)
+        
+        session = await self._get_session()
+        async with session.request(
+            request.method,
+            f"{self._worker_url(owner)}{request.rel_url}",
+            data=await request.read(),
+            headers={FORWARDED_HEADER: '1', 'Content-Type': request.content_type}
+        ) as response:
+            headers = {}
+            if HOT_KEY_HEADER in response.headers:
+                headers[HOT_KEY_HEADER] = response.headers[HOT_KEY_HEADER]
+            return web.Response(
+                status=response.status,
+                body=await response.read(),
+                content_type=response.content_type,
+                headers=headers
+            )
+    
+    async def _gather_siblings(self, path: str) -> List[Any]:
+        """Fetch a msgpack endpoint from every other worker of this node."""
+        session = await self._get_session()
+        
+        async def fetch(index: int) -> Any:
+            async with session.get(
+                f"{self._worker_url(index)}{path}",
+                headers={FORWARDED_HEADER: '1'}
+            ) as response:
+                return msgpack.unpackb(await response.read(), raw=False)
+        
+        siblings = [i for i in range(self.workers) if i != self.worker_index]
+        results = await asyncio.gather(*(fetch(i) for i in siblings), return_exceptions=True)
+        return [r for r in results if not isinstance(r, BaseException)]
+    
+    def _msgpack_response(self, data: Any, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        """Build a msgpack encoded response."""
+        return web.Response(
+            body=msgpack.packb(data, use_bin_type=True),
+            content_type='application/msgpack',
+            headers=headers
+        )
     
     async def get_handler(self, request: web.Request) -> web.Response:
         """Handle GET requests for cache items."""
         key = request.match_info['key']
-        value, success = self.node.get(key)
+        value, ttl, success = self.node.get_with_ttl(key)
+        is_hot = self.hot_keys.record(key)
         
         if success:
-            return web.json_response(
-                {'value': value},
-                dumps=msgpack.packb
-            )
+            headers = {HOT_KEY_HEADER: '1'} if is_hot else None
+            # Remaining seconds rather than an absolute expiry, so copies
+            # made by clients don't depend on the nodes' clocks agreeing
+            return self._msgpack_response({'value': value, 'ttl': ttl}, headers)
         else:
             return web.Response(status=404)
     
@@ -39,7 +155,7 @@ class CacheServer:
         """Handle PUT requests to set cache items."""
         key = request.match_info['key']
         try:
-            data = await request.json(loads=msgpack.unpackb)
+            data = msgpack.unpackb(await request.read(), raw=False)
             value = data['value']
             ttl = data.get('ttl')
             
@@ -61,11 +177,104 @@ class CacheServer:
         else:
             return web.Response(status=404)
     
+    async def acquire_lease_handler(self, request: web.Request) -> web.Response:
+        """Handle POST requests for a recompute lease on a key."""
+        key = request.match_info['key']
+        try:
+            data = msgpack.unpackb(await request.read(), raw=False)
+            token = self.node.acquire_lease(key, float(data['ttl']))
+        except Exception as e:
+            return web.Response(status=400, text=str(e))
+        
+        if token is None:
+            return web.Response(status=409)  # Someone else is recomputing
+        return self._msgpack_response({'token': token})
+    
+    async def release_lease_handler(self, request: web.Request) -> web.Response:
+        """Handle DELETE requests releasing a recompute lease."""
+        key = request.match_info['key']
+        token = request.query.get('token', '')
+        if self.node.release_lease(key, token):
+            return web.Response(status=200)
+        return web.Response(status=404)
+    
     async def stats_handler(self, request: web.Request) -> web.Response:
         """Handle GET requests for cache statistics."""
         stats = self.node.get_stats()
-        return web.json_response(stats, dumps=msgpack.packb)
+        stats.update(self.hot_keys.get_stats())
+        if self.workers > 1 and not self._is_forwarded(request):
+            # Report the whole node, not just the worker that got the request
+            for sibling in await self._gather_siblings('/stats'):
+                for name, value in sibling.items():
+                    stats[name] = stats.get(name, 0) + value
+        return self._msgpack_response(stats)
+    
+    async def hot_keys_handler(self, request: web.Request) -> web.Response:
+        """Handle GET requests advertising the currently hot keys."""
+        hot_keys = self.hot_keys.get_hot_keys()
+        if self.workers > 1 and not self._is_forwarded(request):
+            for sibling in await self._gather_siblings('/hotkeys'):
+                hot_keys.update(sibling)
+        return self._msgpack_response(hot_keys)
+    
+    async def topology_handler(self, request: web.Request) -> web.Response:
+        """Handle GET requests describing the node's worker layout."""
+        return self._msgpack_response({
+            'workers': self.workers,
+            'ports': [worker_port(self.internal_port_base, i) for i in range(self.workers)]
+        })
+    
+    async def serve_worker(self, host: str) -> None:
+        """
+        Serve as one worker of a multi-worker node until cancelled.
+        
+        The worker shares the public port with its siblings through
+        SO_REUSEPORT and also listens on its own internal port, which
+        siblings forward to and clients may route to directly.
+        """
+        if host not in ('0.0.0.0', '::', ''):
+            self.internal_host = host
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        await web.TCPSite(runner, host, self.port, reuse_port=True).start()
+        await web.TCPSite(runner, host, worker_port(self.internal_port_base, self.worker_index)).start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
     
-    def run(self, host: str = 'localhost', port: int = 8080):
-        """Run the cache server."""
-        web.run_app(self.app, host=host, port=port) 
\ No newline at end of file
+    def run(
+        self,
+        host: str = 'localhost',
+        port: int = 8080,
+        workers: Optional[int] = None,
+        internal_port_base: Optional[int] = None
+    ):
+        """
+        Run the cache server.
+        
+        Args:
+            host: Host to bind
+            port: Port to listen on
+            workers: Number of worker processes, defaulting to the `workers`
+                the server was created with. With more than one, each worker
+                owns a sub-partition of the keyspace and also listens on an
+                internal port. Persistent workers each log to their own
+                subdirectory.
+            internal_port_base: First internal worker port, defaulting to
+                the one the server was created with
+        """
+        workers = self.workers if workers is None else workers
+        if internal_port_base is None:
+            internal_port_base = self.internal_port_base
+        if workers > 1:
+            if internal_port_base is None:
+                raise ValueError("internal_port_base is required with more than one worker")
+            if internal_port_base <= port < internal_port_base + workers:
+                raise ValueError(f"Internal ports {internal_port_base}-{internal_port_base + workers - 1} include the public port {port}")
+            run_workers(
+                host, port, workers, self.max_memory_mb,
+                self.hot_key_sample_rate, internal_port_base, self.persistence_dir
+            )
+        else:
+            web.run_app(self.app, host=host, port=port)
@@ -0,0 +1,122 @@
+import zlib
+import msgpack
+from typing import Any, Optional
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # lz4 is optional, zlib is always available
+    lz4_frame = None
+
+# Flag byte prepended to every encoded value
+FLAG_RAW = 0x00
+FLAG_ZLIB = 0x01
+FLAG_LZ4 = 0x02
+
+class ValueCodec:
+    def __init__(
+        self,
+        threshold: int = 1024,
+        algorithm: str = 'auto',
+        level: Optional[int] = None
+    ):
+        """
+        Initialize the value codec.
+
+        Values are serialized with msgpack and compressed only when the
+        serialized payload is at least `threshold` bytes long and the
+        compressed form is actually smaller.
+
+        Args:
+            threshold: Minimum serialized size in bytes before compressing
+            algorithm: 'zlib', 'lz4' or 'auto' (lz4 if installed, else zlib)
+            level: Compression level passed to the underlying library
+        """
+        if algorithm == 'auto':
+            algorithm = 'lz4' if lz4_frame is not None else 'zlib'
+        if algorithm == 'lz4' and lz4_frame is None:
+            raise ValueError("lz4 compression requested but lz4 is not installed")
+        if algorithm not in ('zlib', 'lz4'):
+            raise ValueError(f"Unknown compression algorithm: {algorithm}")
+
+        self.threshold = threshold
+        self.algorithm = algorithm
+        self.level = level
+        self.stats = {
+            'compressed': 0,
+            'uncompressed': 0,
+            'bytes_in': 0,
+            'bytes_out': 0
+        }
+
+    def _compress(self, payload: bytes) -> bytes:
+        """Compress a payload with the configured algorithm."""
+        if self.algorithm == 'lz4':
+            if self.level is None:
+                return lz4_frame.compress(payload)
+            return lz4_frame.compress(payload, compression_level=self.level)
+        return zlib.compress(payload, -1 if self.level is None else self.level)
+
+    def encode(self, value: Any) -> bytes:
+        """
+        Serialize and, if worthwhile, compress a value.
+
+        Args:
+            value: Any msgpack-serializable value
+
+        Returns:
+            Flag byte followed by the (possibly compressed) payload
+        """
+        payload = msgpack.packb(value, use_bin_type=True)
+        self.stats['bytes_in'] += len(payload)
+
+        if len(payload) >= self.threshold:
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                flag = FLAG_LZ4 if self.algorithm == 'lz4' else FLAG_ZLIB
+                self.stats['compressed'] += 1
+                self.stats['bytes_out'] += len(compressed) + 1
+                return bytes([flag]) + compressed
+
+        self.stats['uncompressed'] += 1
+        self.stats['bytes_out'] += len(payload) + 1
+        return bytes([FLAG_RAW]) + payload
+
+    def decode(self, data: Any) -> Any:
+        """
+        Reverse `encode`.
+
+        Values that were not written by a codec (anything that is not
+        bytes) are returned unchanged.
+
+        Args:
+            data: Encoded value as returned by `encode`
+
+        Returns:
+            The original value
+        """
+        if not isinstance(data, (bytes, bytearray)) or not data:
+            return data
+
+        flag, payload = data[0], memoryview(data)[1:]
+        if flag == FLAG_RAW:
+            return msgpack.unpackb(payload, raw=False)
+        if flag == FLAG_ZLIB:
+            return msgpack.unpackb(zlib.decompress(payload), raw=False)
+        if flag == FLAG_LZ4:
+            if lz4_frame is None:
+                raise ValueError("Value is lz4 compressed but lz4 is not installed")
+            return msgpack.unpackb(lz4_frame.decompress(payload), raw=False)
+        raise ValueError(f"Unknown compression flag: {flag:#04x}")
+
+    def get_stats(self) -> dict:
+        """Get codec statistics."""
+        ratio = (
+            self.stats['bytes_out'] / self.stats['bytes_in']
+            if self.stats['bytes_in'] else 1.0
+        )
+        return {
+            **self.stats,
+            'algorithm': self.algorithm,
+            'threshold': self.threshold,
+            'ratio': ratio
+        }
@@ -0,0 +1,161 @@
+import hashlib
+import random
+import threading
+import time
+from typing import Dict, List
+
+# Response header set on reads of keys the server considers hot
+HOT_KEY_HEADER = 'X-Cache-Hot-Key'
+
+class CountMinSketch:
+    def __init__(self, width: int = 2048, depth: int = 4):
+        """
+        Initialize a count-min sketch.
+
+        Args:
+            width: Number of counters per row
+            depth: Number of independent hash rows
+        """
+        self.width = width
+        self.depth = depth
+        self.table: List[List[int]] = [[0] * width for _ in range(depth)]
+
+    def _indexes(self, key: str) -> List[int]:
+        """Derive one counter index per row from a single digest."""
+        digest = hashlib.blake2b(key.encode(), digest_size=4 * self.depth).digest()
+        return [
+            int.from_bytes(digest[i * 4:(i + 1) * 4], 'little') % self.width
+            for i in range(self.depth)
+        ]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """
+        Add occurrences of a key.
+
+        Returns:
+            The new estimated count for the key
+        """
+        estimate = None
+        for row, index in zip(self.table, self._indexes(key)):
+            row[index] += count
+            estimate = row[index] if estimate is None else min(estimate, row[index])
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        """Get the estimated count of a key (never an underestimate)."""
+        return min(row[index] for row, index in zip(self.table, self._indexes(key)))
+
+    def decay(self) -> None:
+        """Halve every counter so old traffic fades out."""
+        for row in self.table:
+            for i in range(self.width):
+                row[i] >>= 1
+
+class HotKeyDetector:
+    def __init__(
+        self,
+        sample_rate: float = 0.01,
+        hot_fraction: float = 0.05,
+        min_samples: int = 20,
+        window_seconds: float = 10.0,
+        max_hot_keys: int = 64
+    ):
+        """
+        Initialize the hot key detector.
+
+        Reads are sampled into a count-min sketch. A key is hot when its
+        estimated share of the sampled reads in the current window is at
+        least `hot_fraction`. Counters are halved every window.
+
+        Args:
+            sample_rate: Fraction of reads recorded in the sketch
+            hot_fraction: Share of sampled reads that makes a key hot
+            min_samples: Minimum samples for a key before it can be hot
+            window_seconds: Interval between decays
+            max_hot_keys: Maximum number of keys advertised as hot
+        """
+        self.sample_rate = sample_rate
+        self.hot_fraction = hot_fraction
+        self.min_samples = min_samples
+        self.window_seconds = window_seconds
+        self.max_hot_keys = max_hot_keys
+        self.sketch = CountMinSketch()
+        self.total_samples = 0
+        self.hot_keys: Dict[str, int] = {}  # Maps hot keys to estimated samples
+        self.last_decay = time.time()
+        self.lock = threading.Lock()
+
+    def _decay_if_due(self, now: float) -> None:
+        """Halve the counters once per window."""
+        if now - self.last_decay < self.window_seconds:
+            return
+        self.sketch.decay()
+        self.total_samples >>= 1
+        self.last_decay = now
+        self.hot_keys = {
+            key: self.sketch.estimate(key)
+            for key in self.hot_keys
+            if self._qualifies(self.sketch.estimate(key))
+        }
+
+    def _qualifies(self, estimate: int) -> bool:
+        """Check if an estimated sample count makes a key hot."""
+        return (
+            estimate >= self.min_samples
+            and estimate >= self.hot_fraction * self.total_samples
+        )
+
+    def record(self, key: str) -> bool:
+        """
+        Record a read of a key.
+
+        Args:
+            key: The key that was read
+
+        Returns:
+            True if the key is currently hot
+        """
+        if random.random() >= self.sample_rate:
+            return key in self.hot_keys
+
+        with self.lock:
+            now = time.time()
+            self._decay_if_due(now)
+            self.total_samples += 1
+            estimate = self.sketch.add(key)
+
+            if self._qualifies(estimate):
+                if key in self.hot_keys or len(self.hot_keys) < self.max_hot_keys:
+                    self.hot_keys[key] = estimate
+                else:
+                    # Replace the coldest advertised key if this one is hotter
+                    coldest = min(self.hot_keys, key=self.hot_keys.get)
+                    if self.hot_keys[coldest] < estimate:
+                        del self.hot_keys[coldest]
+                        self.hot_keys[key] = estimate
+            elif key in self.hot_keys:
+                del self.hot_keys[key]
+            return key in self.hot_keys
+
+    def is_hot(self, key: str) -> bool:
+        """Check if a key is currently hot."""
+        return key in self.hot_keys
+
+    def get_hot_keys(self) -> Dict[str, float]:
+        """
+        Get the currently hot keys.
+
+        Returns:
+            Dictionary mapping hot keys to their estimated share of reads
+        """
+        with self.lock:
+            self._decay_if_due(time.time())
+            total = max(self.total_samples, 1)
+            return {key: count / total for key, count in self.hot_keys.items()}
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get detector statistics."""
+        return {
+            'sampled_reads': self.total_samples,
+            'hot_keys': len(self.hot_keys)
+        }
@@ -0,0 +1,292 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import msgpack
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Operation codes stored in each record
+OP_SET = 0
+OP_DELETE = 1
+OP_CLEAR = 2
+
+# Every record is a little-endian length prefix followed by a msgpack array
+RECORD_HEADER = struct.Struct('<I')
+
+SNAPSHOT_PATTERN = re.compile(r'^snapshot-(\d+)\.bin$')
+LOG_PATTERN = re.compile(r'^appendonly-(\d+)\.log$')
+
+def encode_record(op: int, key: Optional[str] = None, value: Any = None,
+                  expiry: Optional[float] = None) -> bytes:
+    """Encode one operation as a length-prefixed record."""
+    body = msgpack.packb([op, key, value, expiry], use_bin_type=True)
+    return RECORD_HEADER.pack(len(body)) + body
+
+def read_records(path: str) -> Tuple[List[list], int]:
+    """
+    Read every complete record of a file through mmap.
+
+    Args:
+        path: File to read
+
+    Returns:
+        Tuple of (records, offset just past the last complete record)
+    """
+    records = []
+    offset = 0
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return records, offset
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        view = memoryview(data)
+        end = len(data)
+        try:
+            while offset + RECORD_HEADER.size <= end:
+                (length,) = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                if start + length > end:
+                    break  # Torn write at the tail
+                try:
+                    records.append(msgpack.unpackb(view[start:start + length], raw=False))
+                except Exception:
+                    break  # Corrupt tail
+                offset = start + length
+        finally:
+            view.release()
+    return records, offset
+
+class AppendOnlyLog:
+    def __init__(
+        self,
+        directory: str,
+        fsync_interval_ms: float = 10,
+        snapshot_interval_s: float = 300,
+        snapshot_min_log_bytes: int = 64 * 1024 * 1024,
+        snapshot_source: Optional[Callable[[Callable[[], None]], Iterable[Tuple[str, Any, Optional[float]]]]] = None
+    ):
+        """
+        Initialize the append-only log.
+
+        Writes are buffered in memory and a background thread writes and
+        fsyncs them as one group every `fsync_interval_ms`, so a crash loses
+        at most that window. Periodically the log is compacted into a
+        snapshot of the live items and a fresh log generation is started.
+
+        Args:
+            directory: Directory holding snapshot and log files
+            fsync_interval_ms: Interval between group commits
+            snapshot_interval_s: Minimum seconds between snapshots
+            snapshot_min_log_bytes: Log size that triggers a snapshot
+                once `snapshot_interval_s` has passed
+            snapshot_source: Callable that, while blocking writes, copies the
+                live (key, value, expiry) items, calls the rotate callback
+                it is given and returns the copy
+        """
+        self.directory = directory
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.snapshot_interval = snapshot_interval_s
+        self.snapshot_min_log_bytes = snapshot_min_log_bytes
+        self.snapshot_source = snapshot_source
+        os.makedirs(directory, exist_ok=True)
+
+        self.generation = max(self._generations(LOG_PATTERN) + self._generations(SNAPSHOT_PATTERN), default=0)
+        self._buffer: List[bytes] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # Serializes file writes and rotation
+        self._snapshot_lock = threading.Lock()
+        self._file = open(self._log_path(self.generation), 'ab')
+        self.log_bytes = self._file.tell()
+        self.last_snapshot = time.time()
+        self.stats = {
+            'appends': 0,
+            'group_commits': 0,
+            'snapshots': 0
+        }
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='aof-flusher', daemon=True)
+        self._thread.start()
+
+    def _generations(self, pattern: re.Pattern) -> List[int]:
+        """List the generations of the files matching a pattern."""
+        return sorted(
+            int(match.group(1))
+            for match in map(pattern.match, os.listdir(self.directory))
+            if match
+        )
+
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f'appendonly-{generation}.log')
+
+    def _snapshot_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f'snapshot-{generation}.bin')
+
+    def append(self, op: int, key: Optional[str] = None, value: Any = None,
+               expiry: Optional[float] = None) -> None:
+        """
+        Queue an operation for the next group commit.
+
+        Args:
+            op: One of OP_SET, OP_DELETE or OP_CLEAR
+            key: Key the operation applies to
+            value: Value stored by OP_SET
+            expiry: Absolute expiry timestamp for OP_SET
+        """
+        record = encode_record(op, key, value, expiry)
+        with self._lock:
+            self._buffer.append(record)
+            self.stats['appends'] += 1
+
+    def flush(self) -> None:
+        """Write and fsync every queued operation as one group."""
+        with self._io_lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        data = b''.join(batch)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.log_bytes += len(data)
+        self.stats['group_commits'] += 1
+
+    def _run(self) -> None:
+        """Background loop: group commits and periodic snapshots."""
+        while not self._stop.wait(self.fsync_interval):
+            self.flush()
+            if (
+                self.snapshot_source is not None
+                and self.log_bytes >= self.snapshot_min_log_bytes
+                and time.time() - self.last_snapshot >= self.snapshot_interval
+            ):
+                self.snapshot()
+
+    def snapshot(self) -> None:
+        """
+        Compact the log into a snapshot of the live items.
+
+        The items are captured and a new log generation is opened in one
+        step, so the snapshot plus the new log always cover every write.
+        Older files are removed only once the snapshot is durable.
+        """
+        if self.snapshot_source is None:
+            return
+
+        with self._snapshot_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self) -> None:
+        with self._io_lock:
+            # snapshot_source blocks writers around the copy and the
+            # rotation, so no operation can land between the two
+            def rotate():
+                self._flush_locked()
+                self._file.close()
+                self.generation += 1
+                self._file = open(self._log_path(self.generation), 'ab')
+                self.log_bytes = 0
+
+            items = self.snapshot_source(rotate)
+            generation = self.generation
+
+        now = time.time()
+        tmp_path = self._snapshot_path(generation) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            for key, value, expiry in items:
+                if expiry is not None and expiry <= now:
+                    continue
+                f.write(encode_record(OP_SET, key, value, expiry))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path(generation))
+        self._fsync_directory()
+
+        for old in self._generations(SNAPSHOT_PATTERN):
+            if old < generation:
+                os.remove(self._snapshot_path(old))
+        for old in self._generations(LOG_PATTERN):
+            if old < generation:
+                os.remove(self._log_path(old))
+
+        self.last_snapshot = time.time()
+        self.stats['snapshots'] += 1
+
+    def _fsync_directory(self) -> None:
+        """Make a rename durable by syncing the directory entry."""
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def recover(self) -> Iterator[Tuple[str, Any, Optional[float]]]:
+        """
+        Rebuild the live items from the latest snapshot and the log tail.
+
+        Entries whose TTL has already expired are skipped. A torn record
+        at the end of the current log is truncated away.
+
+        Returns:
+            Iterator of (key, value, expiry) in write order
+        """
+        snapshots = self._generations(SNAPSHOT_PATTERN)
+        base = snapshots[-1] if snapshots else 0
+        items: Dict[str, Tuple[Any, Optional[float]]] = {}
+
+        if snapshots:
+            records, _ = read_records(self._snapshot_path(base))
+            for _, key, value, expiry in records:
+                items[key] = (value, expiry)
+
+        for generation in self._generations(LOG_PATTERN):
+            if generation < base:
+                continue
+            path = self._log_path(generation)
+            records, valid = read_records(path)
+            if valid < os.path.getsize(path):
+                with self._io_lock:
+                    if generation == self.generation:
+                        self._file.truncate(valid)
+                        self._file.seek(valid)
+                        self.log_bytes = valid
+                    else:
+                        os.truncate(path, valid)
+            for op, key, value, expiry in records:
+                if op == OP_SET:
+                    items.pop(key, None)  # Keep write order for LRU
+                    items[key] = (value, expiry)
+                elif op == OP_DELETE:
+                    items.pop(key, None)
+                elif op == OP_CLEAR:
+                    items.clear()
+
+        now = time.time()
+        for key, (value, expiry) in items.items():
+            if expiry is None or expiry > now:
+                yield key, value, expiry
+
+    def close(self) -> None:
+        """Stop the background thread and commit outstanding writes."""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        self._file.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get log statistics."""
+        return {
+            **self.stats,
+            'log_bytes': self.log_bytes,
+            'generation': self.generation
+        }
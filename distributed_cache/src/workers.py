@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import zlib
+from typing import List, Optional
+
+# Request header marking a request already routed to its owning worker
+FORWARDED_HEADER = 'X-Cache-Forwarded'
+
+def worker_for_key(key: str, workers: int) -> int:
+    """
+    Determine which worker of a node owns a key.
+
+    Both servers and clients use this to agree on the sub-partition a key
+    belongs to.
+
+    Args:
+        key: The cache key
+        workers: Number of workers on the node
+
+    Returns:
+        Index of the owning worker
+    """
+    if workers <= 1:
+        return 0
+    return zlib.crc32(key.encode()) % workers
+
+def worker_port(internal_port_base: int, index: int) -> int:
+    """Get the internal port of a worker (internal_port_base + index)."""
+    return internal_port_base + index
+
+def _worker_main(
+    index: int,
+    workers: int,
+    host: str,
+    port: int,
+    max_memory_mb: int,
+    hot_key_sample_rate: float,
+    internal_port_base: int,
+    persistence_dir: Optional[str] = None
+) -> None:
+    """Entry point of a worker process."""
+    from .cache_server import CacheServer
+
+    server = CacheServer(
+        max_memory_mb=max_memory_mb,
+        hot_key_sample_rate=hot_key_sample_rate,
+        workers=workers,
+        worker_index=index,
+        port=port,
+        internal_port_base=internal_port_base,
+        persistence_dir=persistence_dir
+    )
+    try:
+        asyncio.run(server.serve_worker(host))
+    except KeyboardInterrupt:
+        pass
+
+def run_workers(
+    host: str,
+    port: int,
+    workers: int,
+    max_memory_mb: int,
+    hot_key_sample_rate: float,
+    internal_port_base: int,
+    persistence_dir: Optional[str] = None
+) -> None:
+    """
+    Start worker processes sharing one node's keyspace and wait for them.
+
+    Every worker listens on the public port with SO_REUSEPORT, so the kernel
+    spreads connections across them, and on its own internal port
+    (internal_port_base + index). Each worker gets an equal share of the
+    node's memory budget.
+
+    Args:
+        host: Host to bind
+        port: Public port shared by all workers
+        workers: Number of worker processes
+        max_memory_mb: Memory budget of the whole node in megabytes
+        hot_key_sample_rate: Fraction of reads sampled for hot key detection
+        internal_port_base: First of the `workers` internal ports
+        persistence_dir: Directory under which each worker keeps its own log
+    """
+    processes: List[multiprocessing.Process] = []
+    for index in range(workers):
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(
+                index, workers, host, port, max_memory_mb // workers, hot_key_sample_rate,
+                internal_port_base,
+                os.path.join(persistence_dir, f"worker-{index}") if persistence_dir else None
+            ),
+            name=f"cache-worker-{index}"
+        )
+        process.start()
+        processes.append(process)
+
+    def _stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        for process in processes:
+            process.join()
+    except (KeyboardInterrupt, SystemExit):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
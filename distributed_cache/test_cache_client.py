@@ -0,0 +1,170 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from aiohttp.test_utils import TestServer
+from src.cache_client import DistributedCacheClient
+from src.cache_server import CacheServer
+
+
+@asynccontextmanager
+async def _cluster(count, **server_kwargs):
+    """Start `count` servers on ephemeral ports; yields the servers and their URLs."""
+    servers = [CacheServer(max_memory_mb=10, **server_kwargs) for _ in range(count)]
+    test_servers = [TestServer(server.app, host="127.0.0.1") for server in servers]
+    try:
+        for test_server in test_servers:
+            await test_server.start_server()
+        yield servers, [f"http://127.0.0.1:{test_server.port}" for test_server in test_servers]
+    finally:
+        for test_server in test_servers:
+            await test_server.close()
+
+
+@asynccontextmanager
+async def _cache():
+    async with _cluster(1) as (servers, urls):
+        client = DistributedCacheClient(urls)
+        client.lease_poll_interval = 0.01
+        try:
+            yield servers[0], client
+        finally:
+            await client.close()
+
+
+def _counting_factory(calls, value, delay=0.05):
+    async def compute():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return compute
+
+
+def test_concurrent_calls_share_one_computation():
+    async def run():
+        async with _cache() as (_, client):
+            calls = []
+            results = await asyncio.gather(*(
+                client.get_or_compute("page", _counting_factory(calls, "html"), ttl=60)
+                for _ in range(10)
+            ))
+            assert results == ["html"] * 10
+            assert calls == ["html"]
+
+            # Later calls are served from the cache
+            assert await client.get_or_compute("page", _counting_factory(calls, "new"), ttl=60) == "html"
+            assert calls == ["html"]
+
+    asyncio.run(run())
+
+
+def test_cancelled_computation_is_taken_over():
+    async def run():
+        async with _cache() as (_, client):
+            calls = []
+            leader = asyncio.create_task(
+                client.get_or_compute("page", _counting_factory(calls, "first", delay=1.0), ttl=60)
+            )
+            await asyncio.sleep(0.05)
+            followers = [
+                asyncio.create_task(client.get_or_compute("page", _counting_factory(calls, "second"), ttl=60))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.05)
+            leader.cancel()
+
+            assert await asyncio.gather(*followers) == ["second"] * 3
+            assert leader.cancelled()
+            assert calls == ["first", "second"]
+            assert not client._inflight
+
+    asyncio.run(run())
+
+
+def test_waits_for_lease_holder_without_a_cached_value():
+    async def run():
+        async with _cache() as (server, client):
+            assert server.node.acquire_lease("page", 5.0)
+
+            async def other_process_stores():
+                await asyncio.sleep(0.1)
+                await client.set("page", {"value": "theirs", "delta": 0.1, "expiry": time.time() + 60}, ttl=60)
+
+            calls = []
+            storing = asyncio.create_task(other_process_stores())
+            assert await client.get_or_compute("page", _counting_factory(calls, "ours"), ttl=60) == "theirs"
+            await storing
+            assert calls == []
+
+    asyncio.run(run())
+
+
+def test_serves_stale_value_while_lease_is_held():
+    async def run():
+        async with _cache() as (server, client):
+            # Past its logical expiry, so XFetch always wants to refresh it
+            await client.set("page", {"value": "stale", "delta": 0.1, "expiry": time.time() - 1})
+            assert server.node.acquire_lease("page", 5.0)
+
+            calls = []
+            assert await client.get_or_compute("page", _counting_factory(calls, "fresh"), ttl=60) == "stale"
+            assert calls == []
+
+    asyncio.run(run())
+
+
+def test_refreshes_early_near_expiry():
+    async def run():
+        async with _cache() as (_, client):
+            calls = []
+            await client.set("page", {"value": "old", "delta": 0.1, "expiry": time.time() + 3600})
+            assert await client.get_or_compute("page", _counting_factory(calls, "new"), ttl=60) == "old"
+            assert calls == []
+
+            await client.set("page", {"value": "old", "delta": 0.1, "expiry": time.time() - 1})
+            assert await client.get_or_compute("page", _counting_factory(calls, "new"), ttl=60) == "new"
+            assert calls == ["new"]
+
+            entry, found = await client.get("page")
+            assert found and entry["value"] == "new"
+            assert entry["expiry"] > time.time() + 50
+            assert entry["delta"] >= 0.05
+
+    asyncio.run(run())
+
+
+def test_should_refresh_early_grows_with_delta():
+    client = DistributedCacheClient(["http://127.0.0.1:1"])
+    expiry = time.time() + 1.0
+    assert not client._should_refresh_early({"expiry": None, "delta": 10.0}, beta=1.0)
+    assert not any(
+        client._should_refresh_early({"expiry": expiry, "delta": 0.0}, beta=1.0)
+        for _ in range(100)
+    )
+    assert sum(
+        client._should_refresh_early({"expiry": expiry, "delta": 10.0}, beta=1.0)
+        for _ in range(1000)
+    ) > 800
+
+
+def test_writer_unaware_of_hot_key_updates_read_replicas():
+    async def run():
+        async with _cluster(3) as (servers, urls):
+            reader = DistributedCacheClient(urls, hot_key_replicas=2)
+            writer = DistributedCacheClient(urls, hot_key_replicas=2)
+            try:
+                await writer.set("page", "v1")
+                reader._mark_hot("page")
+                for _ in range(30):  # Reads are spread over all three nodes
+                    assert await reader.get("page") == ("v1", True)
+                assert all(server.node.get("page")[1] for server in servers)
+
+                # The writer has never seen the key advertised as hot
+                assert not writer._is_hot("page")
+                await writer.set("page", "v2")
+                results = [await reader.get("page") for _ in range(60)]
+                assert results == [("v2", True)] * 60
+            finally:
+                await reader.close()
+                await writer.close()
+
+    asyncio.run(run())
@@ -0,0 +1,76 @@
+import os
+import msgpack
+import pytest
+from src.compression import FLAG_LZ4, FLAG_RAW, FLAG_ZLIB, ValueCodec, lz4_frame
+
+
+def _value_of_size(size):
+    """A compressible string whose msgpack encoding is exactly `size` bytes."""
+    value = "a" * (size - 2)
+    assert len(msgpack.packb(value, use_bin_type=True)) == size
+    return value
+
+
+def test_round_trip_around_threshold():
+    codec = ValueCodec(threshold=200, algorithm="zlib")
+    below = codec.encode(_value_of_size(199))
+    at = codec.encode(_value_of_size(200))
+    above = codec.encode(_value_of_size(201))
+
+    assert below[0] == FLAG_RAW
+    assert below[1:] == msgpack.packb(_value_of_size(199), use_bin_type=True)
+    assert at[0] == FLAG_ZLIB and len(at) < 200
+    assert above[0] == FLAG_ZLIB
+    for size, encoded in [(199, below), (200, at), (201, above)]:
+        assert codec.decode(encoded) == _value_of_size(size)
+    assert codec.get_stats()["compressed"] == 2
+    assert codec.get_stats()["uncompressed"] == 1
+
+
+def test_incompressible_values_stay_raw():
+    codec = ValueCodec(threshold=16, algorithm="zlib")
+    value = os.urandom(1024)
+    encoded = codec.encode(value)
+    assert encoded[0] == FLAG_RAW
+    assert codec.decode(encoded) == value
+
+
+def test_round_trips_structured_values():
+    codec = ValueCodec(threshold=64, algorithm="zlib")
+    value = {"items": [{"id": i, "name": f"item-{i}"} for i in range(50)], "raw": b"\x00\x01"}
+    encoded = codec.encode(value)
+    assert encoded[0] == FLAG_ZLIB
+    assert codec.decode(encoded) == value
+
+
+@pytest.mark.skipif(lz4_frame is None, reason="lz4 is not installed")
+def test_lz4_flag():
+    codec = ValueCodec(threshold=64, algorithm="lz4")
+    encoded = codec.encode(_value_of_size(200))
+    assert encoded[0] == FLAG_LZ4
+    assert ValueCodec(algorithm="zlib").decode(encoded) == _value_of_size(200)
+
+
+def test_lz4_requires_the_library(monkeypatch):
+    monkeypatch.setattr("src.compression.lz4_frame", None)
+    with pytest.raises(ValueError):
+        ValueCodec(algorithm="lz4")
+    assert ValueCodec(algorithm="auto").algorithm == "zlib"
+    with pytest.raises(ValueError):
+        ValueCodec().decode(bytes([FLAG_LZ4]) + b"payload")
+
+
+def test_rejects_legacy_raw_bytes():
+    codec = ValueCodec(algorithm="zlib")
+    # Bytes stored by a client without a codec don't start with a known flag
+    with pytest.raises(ValueError):
+        codec.decode(b"legacy value")
+    # Values that were never bytes are passed through
+    assert codec.decode("legacy string") == "legacy string"
+    assert codec.decode(42) == 42
+    assert codec.decode(b"") == b""
+
+
+def test_unknown_algorithm():
+    with pytest.raises(ValueError):
+        ValueCodec(algorithm="brotli")
@@ -0,0 +1,136 @@
+import asyncio
+import time
+from src.cache_client import DistributedCacheClient
+from src.hot_keys import CountMinSketch, HotKeyDetector, HOT_KEY_HEADER
+from test_cache_client import _cluster
+
+
+def test_count_min_sketch_never_underestimates():
+    sketch = CountMinSketch(width=64, depth=4)
+    counts = {f"key-{i}": i for i in range(200)}
+    for key, count in counts.items():
+        sketch.add(key, count)
+    assert all(sketch.estimate(key) >= count for key, count in counts.items())
+
+    sketch.decay()
+    assert sketch.estimate("key-199") >= 199 // 2
+
+
+def test_detector_finds_keys_above_their_share():
+    detector = HotKeyDetector(sample_rate=1.0, hot_fraction=0.05, min_samples=20)
+    for i in range(1000):
+        detector.record(f"cold-{i % 100}")
+        if i % 5 == 0:
+            detector.record("hot")
+
+    assert detector.is_hot("hot")
+    assert not detector.is_hot("cold-1")
+    share = detector.get_hot_keys()["hot"]
+    assert 0.1 < share < 0.25
+    assert detector.get_stats() == {"sampled_reads": 1200, "hot_keys": 1}
+
+
+def test_detector_forgets_keys_that_cool_down():
+    detector = HotKeyDetector(sample_rate=1.0, min_samples=20, window_seconds=10.0)
+    for _ in range(50):
+        detector.record("hot")
+    assert detector.is_hot("hot")
+
+    # Every window halves the counts, so new traffic outweighs old
+    for _ in range(4):
+        detector.last_decay -= 10.0
+        for i in range(500):
+            detector.record(f"other-{i}")
+    assert not detector.is_hot("hot")
+    assert detector.get_hot_keys() == {}
+
+
+def test_detector_caps_advertised_keys():
+    detector = HotKeyDetector(sample_rate=1.0, hot_fraction=0.0, min_samples=1, max_hot_keys=3)
+    for count, key in enumerate(["a", "b", "c", "d"], 1):
+        for _ in range(count * 10):
+            detector.record(key)
+    assert set(detector.get_hot_keys()) == {"b", "c", "d"}
+
+
+def test_hot_keys_are_advertised():
+    async def run():
+        async with _cluster(3, hot_key_sample_rate=1.0) as (servers, urls):
+            client = DistributedCacheClient(urls)
+            fresh = DistributedCacheClient(urls)
+            try:
+                await client.set("page", "html")
+                primary = client.consistent_hash.get_node("page")
+                session = await client._get_session()
+                for _ in range(30):
+                    async with session.get(f"{primary}/cache/page") as response:
+                        hot = response.headers.get(HOT_KEY_HEADER)
+                assert hot == "1"
+
+                # Reads mark the key hot in the reading client
+                assert not client._is_hot("page")
+                await client.get("page")
+                assert client._is_hot("page")
+
+                # Other clients learn about it from GET /hotkeys
+                hot_keys = await fresh.refresh_hot_keys()
+                assert list(hot_keys) == ["page"]
+                assert fresh._is_hot("page")
+            finally:
+                await client.close()
+                await fresh.close()
+
+    asyncio.run(run())
+
+
+def test_hot_key_reads_fill_replicas_with_the_primary_ttl():
+    async def run():
+        async with _cluster(3) as (servers, urls):
+            client = DistributedCacheClient(urls, hot_key_replicas=2, compression_threshold=None)
+            try:
+                nodes = client.consistent_hash.get_nodes("page", 3)
+                by_url = dict(zip(urls, servers))
+                # Only the primary has the value, as after a write before
+                # the key's replicas were known
+                by_url[nodes[0]].node.set("page", "html", ttl=30)
+                client._mark_hot("page")
+
+                for _ in range(40):
+                    assert await client.get("page") == ("html", True)
+                for url in nodes:
+                    value, ttl, found = by_url[url].node.get_with_ttl("page")
+                    assert found and value == "html"
+                    assert 25 < ttl <= 30
+                # Reads were spread over every replica
+                assert all(by_url[url].node.stats["hits"] > 0 for url in nodes[1:])
+
+                # Deletes clear the copies too
+                assert await client.delete("page")
+                assert not any(server.node.get("page")[1] for server in servers)
+            finally:
+                await client.close()
+
+    asyncio.run(run())
+
+
+def test_local_copies_of_hot_keys():
+    async def run():
+        async with _cluster(1) as (servers, urls):
+            client = DistributedCacheClient(urls, local_copy_ttl=60.0)
+            try:
+                await client.set("page", "html")
+                client._mark_hot("page")
+                assert await client.get("page") == ("html", True)
+                servers[0].node.delete("page")
+                # Served locally while hot, dropped when rewritten
+                assert await client.get("page") == ("html", True)
+                await client.set("page", "new")
+                assert await client.get("page") == ("new", True)
+
+                client.hot_keys["page"] = time.time() - 1
+                servers[0].node.delete("page")
+                assert await client.get("page") == (None, False)
+            finally:
+                await client.close()
+
+    asyncio.run(run())
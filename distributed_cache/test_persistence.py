@@ -0,0 +1,89 @@
+import os
+import time
+from src.cache_node import CacheNode
+from src.persistence import OP_SET, encode_record
+
+
+def _restart(node, directory):
+    node.close()
+    return CacheNode(max_memory_mb=10, persistence_dir=directory)
+
+
+def test_replays_set_delete_and_clear(tmp_path):
+    directory = str(tmp_path)
+    node = CacheNode(max_memory_mb=10, persistence_dir=directory)
+    node.set("a", 1)
+    node.set("b", 2)
+    node.set("a", 3)
+    node.delete("b")
+    node = _restart(node, directory)
+    assert node.get("a") == (3, True)
+    assert node.get("b") == (None, False)
+
+    node.clear()
+    node.set("c", 4)
+    node = _restart(node, directory)
+    assert node.get("a") == (None, False)
+    assert node.get("c") == (4, True)
+    node.close()
+
+
+def test_skips_expired_entries(tmp_path):
+    directory = str(tmp_path)
+    node = CacheNode(max_memory_mb=10, persistence_dir=directory)
+    node.set("short", "gone", ttl=0.1)
+    node.set("long", "kept", ttl=60)
+    node.close()
+    time.sleep(0.2)
+
+    node = CacheNode(max_memory_mb=10, persistence_dir=directory)
+    assert node.get("short") == (None, False)
+    assert node.get("long") == ("kept", True)
+    _, ttl, _ = node.get_with_ttl("long")
+    assert 0 < ttl <= 60
+    node.close()
+
+
+def test_truncates_torn_last_record(tmp_path):
+    directory = str(tmp_path)
+    node = CacheNode(max_memory_mb=10, persistence_dir=directory)
+    node.set("a", 1)
+    node.close()
+
+    log_path = os.path.join(directory, "appendonly-0.log")
+    valid_size = os.path.getsize(log_path)
+    with open(log_path, "ab") as f:
+        f.write(encode_record(OP_SET, "b", 2)[:-3])
+
+    node = CacheNode(max_memory_mb=10, persistence_dir=directory)
+    assert node.get("a") == (1, True)
+    assert node.get("b") == (None, False)
+    assert os.path.getsize(log_path) == valid_size
+
+    # Writes after recovery follow the last complete record
+    node.set("c", 3)
+    node = _restart(node, directory)
+    assert node.get("a") == (1, True)
+    assert node.get("c") == (3, True)
+    node.close()
+
+
+def test_recovers_after_snapshot(tmp_path):
+    directory = str(tmp_path)
+    node = CacheNode(max_memory_mb=10, persistence_dir=directory)
+    node.set("a", 1)
+    node.set("b", 2)
+    node.set("expiring", 0, ttl=0.1)
+    time.sleep(0.2)
+    node.snapshot()
+    node.set("c", 3)
+    node.delete("a")
+
+    assert sorted(os.listdir(directory)) == ["appendonly-1.log", "snapshot-1.bin"]
+    node = _restart(node, directory)
+    assert node.get("a") == (None, False)
+    assert node.get("b") == (2, True)
+    assert node.get("c") == (3, True)
+    assert node.get("expiring") == (None, False)
+    assert node.get_stats()["item_count"] == 2
+    node.close()
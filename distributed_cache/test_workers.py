@@ -0,0 +1,124 @@
+import asyncio
+import socket
+from contextlib import asynccontextmanager
+import pytest
+from aiohttp.test_utils import TestServer
+from src.cache_client import DistributedCacheClient
+from src.cache_server import CacheServer
+from src.workers import worker_for_key, worker_port
+
+
+def _free_port_range(count):
+    """Find `count` consecutive free ports on 127.0.0.1."""
+    for _ in range(100):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            base = probe.getsockname()[1]
+        sockets = []
+        try:
+            for port in range(base, base + count):
+                sock = socket.socket()
+                sockets.append(sock)
+                sock.bind(("127.0.0.1", port))
+            return base
+        except OSError:
+            continue
+        finally:
+            for sock in sockets:
+                sock.close()
+    raise RuntimeError("No free port range")
+
+
+@asynccontextmanager
+async def _node(workers):
+    """Run the workers of one node in this process, each on its internal port."""
+    base = _free_port_range(workers)
+    servers = [
+        CacheServer(max_memory_mb=10, workers=workers, worker_index=index, internal_port_base=base)
+        for index in range(workers)
+    ]
+    test_servers = [
+        TestServer(server.app, host="127.0.0.1", port=worker_port(base, index))
+        for index, server in enumerate(servers)
+    ]
+    try:
+        for test_server in test_servers:
+            await test_server.start_server()
+        yield servers, test_servers
+    finally:
+        for test_server in test_servers:
+            await test_server.close()
+
+
+def _keys_by_owner(workers, count=20):
+    keys = [f"key-{i}" for i in range(count)]
+    owners = {key: worker_for_key(key, workers) for key in keys}
+    assert set(owners.values()) == set(range(workers))
+    return owners
+
+
+def test_worker_for_key():
+    assert worker_for_key("anything", 1) == 0
+    assert worker_for_key("key", 4) == worker_for_key("key", 4)
+    assert {worker_for_key(f"key-{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+    assert worker_port(9001, 0) == 9001
+    assert worker_port(9001, 3) == 9004
+
+
+def test_run_requires_an_internal_port_range():
+    with pytest.raises(ValueError):
+        CacheServer(workers=2).run(port=8001)
+    with pytest.raises(ValueError):
+        CacheServer(workers=2, internal_port_base=8000).run(port=8001)
+
+
+def test_requests_are_forwarded_to_the_owning_worker():
+    async def run():
+        async with _node(3) as (servers, test_servers):
+            # The client only knows worker 0, like a client of the public port
+            client = DistributedCacheClient([f"http://127.0.0.1:{test_servers[0].port}"])
+            owners = _keys_by_owner(3)
+            try:
+                for key in owners:
+                    assert await client.set(key, key.upper())
+                for key, owner in owners.items():
+                    assert await client.get(key) == (key.upper(), True)
+                    assert [server.node.get(key)[1] for server in servers] == [
+                        index == owner for index in range(3)
+                    ]
+
+                # Stats cover the whole node
+                stats = await client.get_stats()
+                assert list(stats.values())[0]["item_count"] == len(owners)
+
+                key = next(key for key, owner in owners.items() if owner == 2)
+                assert await client.delete(key)
+                assert not servers[2].node.get(key)[1]
+            finally:
+                await client.close()
+
+    asyncio.run(run())
+
+
+def test_discovered_workers_are_addressed_directly():
+    async def run():
+        async with _node(2) as (servers, test_servers):
+            node = f"http://127.0.0.1:{test_servers[0].port}"
+            client = DistributedCacheClient([node])
+            owners = _keys_by_owner(2)
+            try:
+                assert await client.discover_workers() == {
+                    node: [f"http://127.0.0.1:{test_server.port}" for test_server in test_servers]
+                }
+                for key in owners:
+                    assert await client.set(key, key)
+
+                # Worker 0 is no longer needed for keys owned by worker 1
+                await test_servers[0].close()
+                for key, owner in owners.items():
+                    assert await client.get(key) == ((key, True) if owner == 1 else (None, False))
+                    assert servers[owner].node.get(key)[1]
+            finally:
+                await client.close()
+
+    asyncio.run(run())
@@ -0,0 +1,215 @@
+import json
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from starlette.responses import StreamingResponse
+from app.api.links import cache_ttl
+from app.core import cache
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.shortener import hash_url, key_allocator
+from app.models.url import URL
+from app.schemas.url import URLCreate
+
+router = APIRouter()
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+class InvalidItem:
+    def __init__(self, error: str):
+        self.error = error
+
+def parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return InvalidItem("Line is not valid JSON")
+
+def parse_item(item) -> str:
+    """Validate one input item, a URL string or {"original_url": ...}."""
+    if isinstance(item, str):
+        item = {"original_url": item}
+    return str(URLCreate.model_validate(item).original_url)
+
+async def read_array(request: Request) -> list:
+    """Read the request body as a JSON array of items."""
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    if len(items) > settings.BULK_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_MAX_URLS} URLs per request")
+    return items
+
+async def array_chunks(items: list):
+    """Yield (start index, items) chunks of a JSON array."""
+    for start in range(0, len(items), settings.BULK_CHUNK_SIZE):
+        yield start, items[start:start + settings.BULK_CHUNK_SIZE]
+
+async def ndjson_lines(request: Request):
+    """Yield the non-blank lines of the request body as they arrive."""
+    pending = b""
+    async for data in request.stream():
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+async def ndjson_chunks(request: Request):
+    """
+    Yield (start index, items) chunks of an NDJSON body as it arrives.
+
+    A chunk is yielded as soon as it is full, so it is shortened while the
+    client is still sending the rest and only one chunk is held in memory.
+    The item past BULK_MAX_URLS becomes an error and ends the request.
+    """
+    start = 0
+    chunk = []
+    async for line in ndjson_lines(request):
+        if start + len(chunk) == settings.BULK_MAX_URLS:
+            chunk.append(InvalidItem(f"At most {settings.BULK_MAX_URLS} URLs per request"))
+            break
+        chunk.append(parse_line(line))
+        if len(chunk) == settings.BULK_CHUNK_SIZE:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+async def insert_rows(valid: list[tuple[int, str]], hashes: dict[int, bytes] | None = None) -> list[dict]:
+    """Store URLs under newly allocated keys with one executemany INSERT."""
+    keys = await key_allocator.allocate_async(len(valid))
+    rows = [
+        {
+            "id": url_id,
+            "short_key": short_key,
+            "original_url": original_url,
+            "url_hash": hashes[index] if hashes else None,
+            "click_count": 0
+        }
+        for (url_id, short_key), (index, original_url) in zip(keys, valid)
+    ]
+    async with async_engine.begin() as conn:
+        # One executemany: sent as batched multi-row INSERTs on PostgreSQL
+        # ("insertmanyvalues"), as one prepared statement on SQLite; unlike
+        # .values(rows), the compiled statement is cached
+        await conn.execute(insert(URL), rows)
+    return rows
+
+async def store_urls(valid: list[tuple[int, str]]) -> tuple[dict[int, str], list[dict]]:
+    """
+    Store a chunk of URLs.
+
+    In dedup mode, URLs that are already stored, or repeated within the
+    chunk, get the existing key and only the rest are inserted.
+
+    Returns:
+        The short key of every input index, and the inserted rows
+    """
+    if not settings.DEDUP_URLS:
+        rows = await insert_rows(valid)
+        return {index: row["short_key"] for (index, _), row in zip(valid, rows)}, rows
+
+    hashes = {index: hash_url(original_url) for index, original_url in valid}
+    for attempt in range(2):
+        async with async_engine.connect() as conn:
+            existing = dict((await conn.execute(
+                select(URL.url_hash, URL.short_key).where(URL.url_hash.in_(set(hashes.values())))
+            )).all())
+        first = {}
+        for index, original_url in valid:
+            first.setdefault(hashes[index], (index, original_url))
+        new = [item for url_hash, item in first.items() if url_hash not in existing]
+        try:
+            rows = await insert_rows(new, hashes) if new else []
+        except IntegrityError:
+            # A concurrent request stored some of the URLs first; look them up again
+            if attempt:
+                raise
+            continue
+        existing.update((row["url_hash"], row["short_key"]) for row in rows)
+        return {index: existing[url_hash] for index, url_hash in hashes.items()}, rows
+
+async def shorten_chunk(start: int, items: list) -> list[dict]:
+    """Shorten one chunk: one key lease, one INSERT, one Redis pipeline."""
+    results = []
+    valid = []
+    for index, item in enumerate(items, start):
+        if isinstance(item, InvalidItem):
+            results.append({"index": index, "error": item.error})
+            continue
+        try:
+            valid.append((index, parse_item(item)))
+        except ValidationError as e:
+            results.append({"index": index, "error": e.errors()[0]["msg"]})
+    if not valid:
+        return results
+
+    try:
+        short_keys, rows = await store_urls(valid)
+    except SQLAlchemyError:
+        return results + [{"index": index, "error": "Failed to store URL"} for index, _ in valid]
+
+    # The new keys have nothing to invalidate; a failed cache fill only
+    # costs a database read on the first redirect
+    try:
+        async with cache.async_redis_client.pipeline(transaction=False) as pipe:
+            ttl = cache_ttl()
+            for row in rows:
+                pipe.setex(f"url:{row['short_key']}", ttl, row["original_url"])
+            await pipe.execute()
+    except RedisError:
+        pass
+
+    for index, original_url in valid:
+        results.append({
+            "index": index,
+            "short_url": f"{settings.BASE_URL}/{short_keys[index]}",
+            "original_url": original_url
+        })
+    results.sort(key=lambda result: result["index"])
+    return results
+
+async def stream_results(chunks):
+    async for start, items in chunks:
+        results = await shorten_chunk(start, items)
+        yield "".join(json.dumps(result, separators=(",", ":")) + "\n" for result in results)
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose iterator reads the request body.
+
+    StreamingResponse calls receive() while streaming to notice a client
+    disconnect (ASGI spec < 2.4, as served by uvicorn), which would take body
+    messages away from request.stream(). Here only the iterator receives;
+    request.stream() raises ClientDisconnect when the client goes away.
+    """
+
+    async def listen_for_disconnect(self, receive) -> None:
+        await anyio.sleep_forever()
+
+@router.post("/shorten/bulk")
+async def create_short_urls(request: Request):
+    """
+    Shorten many URLs in one request.
+
+    The body is a JSON array, or NDJSON with one item per line
+    (Content-Type: application/x-ndjson). Items are URL strings or
+    {"original_url": ...} objects. Results are streamed back as NDJSON, one
+    line per item in input order, each with its index and either the
+    short URL or an error. NDJSON is shortened chunk by chunk while it is
+    still being received.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() in NDJSON_TYPES:
+        return BodyStreamingResponse(stream_results(ndjson_chunks(request)), media_type="application/x-ndjson")
+    items = await read_array(request)
+    return StreamingResponse(stream_results(array_chunks(items)), media_type="application/x-ndjson")
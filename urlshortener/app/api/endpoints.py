@@ -1,55 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.shortener import create_unique_short_key
-from app.core.cache import get_url_from_cache, set_url_in_cache, increment_click_count
-from app.core.config import settings
-from app.models.url import URL
+from fastapi import APIRouter, Depends
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.links import (
+    cache_ttl, dedup_hash, existing_key_query, link_query, local_lookup, new_link,
+    not_found, redirect, shortened
+)
+from app.core.database import get_async_db
+from app.core.shortener import create_short_key_async
+from app.core.cache import (
+    MISS, get_url_from_cache_async, set_url_in_cache_async, publish_invalidation_async,
+    get_cache_stats
+)
+from app.core.clicks import click_buffer
 from app.schemas.url import URLCreate, URLResponse
-from typing import Optional
-from starlette.responses import RedirectResponse
 
 router = APIRouter()
 
 @router.post("/shorten/", response_model=URLResponse)
-def create_short_url(url: URLCreate, db: Session = Depends(get_db)):
-    # Create short URL
-    short_key = create_unique_short_key(db, URL)
-    
-    # Create database entry
-    db_url = URL(
-        original_url=str(url.original_url),
-        short_key=short_key
-    )
-    db.add(db_url)
-    db.commit()
-    db.refresh(db_url)
-    
-    # Add to cache
-    set_url_in_cache(short_key, str(url.original_url))
-    
-    # Create response
-    short_url = f"{settings.BASE_URL}/{short_key}"
-    return URLResponse(short_url=short_url, original_url=str(url.original_url))
+async def create_short_url(url: URLCreate, db: AsyncSession = Depends(get_async_db)):
+    # In dedup mode, return the existing key of an already shortened URL
+    url_hash = dedup_hash(url)
+    short_key = None
+    if url_hash is not None:
+        short_key = await db.scalar(existing_key_query(url_hash))
+
+    if short_key is None:
+        url_id, short_key = await create_short_key_async()
+        db.add(new_link(url_id, short_key, url, url_hash))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Another request stored the same URL first
+            await db.rollback()
+            if url_hash is None:
+                raise
+            short_key = await db.scalar(existing_key_query(url_hash))
+        else:
+            # Add to cache; other processes may have cached the key as unknown
+            await set_url_in_cache_async(short_key, str(url.original_url), cache_ttl())
+            await publish_invalidation_async(short_key)
+
+    return shortened(short_key, url)
+
+@router.get("/stats/cache")
+async def cache_stats():
+    return get_cache_stats()
+
+@router.get("/stats/clicks")
+async def click_stats():
+    return click_buffer.get_stats()
 
 @router.get("/{short_key}")
-def redirect_to_url(short_key: str, db: Session = Depends(get_db)):
-    # Try to get URL from cache
-    cached_url = get_url_from_cache(short_key)
+async def redirect_to_url(short_key: str, db: AsyncSession = Depends(get_async_db)):
+    # Try the in-process cache, then Redis
+    cached_url = local_lookup(short_key)
+    if cached_url is MISS:
+        cached_url = await get_url_from_cache_async(short_key)
     if cached_url:
-        increment_click_count(short_key)
-        return RedirectResponse(url=cached_url.decode())
-    
+        return redirect(short_key, cached_url)
+
     # If not in cache, get from database
-    db_url = db.query(URL).filter(URL.short_key == short_key).first()
+    db_url = await db.scalar(link_query(short_key))
     if not db_url:
-        raise HTTPException(status_code=404, detail="URL not found")
-    
-    # Update click count
-    db_url.click_count += 1
-    db.commit()
-    
-    # Add to cache
-    set_url_in_cache(short_key, db_url.original_url)
-    
-    return RedirectResponse(url=db_url.original_url) 
\ No newline at end of file
+        raise not_found(short_key)
+
+    response = redirect(short_key, db_url.original_url)
+    await set_url_in_cache_async(short_key, db_url.original_url, cache_ttl(db_url))
+    return response
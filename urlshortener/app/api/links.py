@@ -0,0 +1,66 @@
+# Request logic shared by app.api.endpoints and its thread-pool variant
+# app.api.sync_endpoints; the two only differ in how they reach the database
+# and Redis
+from fastapi import HTTPException
+from sqlalchemy import select
+from starlette.responses import RedirectResponse
+from app.core.cache import local_cache, popularity_ttl
+from app.core.clicks import click_buffer
+from app.core.config import settings
+from app.core.shortener import hash_url
+from app.models.url import URL
+from app.schemas.url import URLCreate, URLResponse
+
+def dedup_hash(url: URLCreate) -> bytes | None:
+    """Dedup index value of a URL to shorten, None unless DEDUP_URLS is on."""
+    return hash_url(str(url.original_url)) if settings.DEDUP_URLS else None
+
+def existing_key_query(url_hash: bytes):
+    """Select the short key already stored for a URL hash."""
+    return select(URL.short_key).where(URL.url_hash == url_hash)
+
+def new_link(url_id: int, short_key: str, url: URLCreate, url_hash: bytes | None) -> URL:
+    """Row of a newly shortened URL; keys come from a leased ID block, so no existence check."""
+    return URL(
+        id=url_id,
+        original_url=str(url.original_url),
+        short_key=short_key,
+        url_hash=url_hash,
+        click_count=0
+    )
+
+def shortened(short_key: str, url: URLCreate) -> URLResponse:
+    return URLResponse(short_url=f"{settings.BASE_URL}/{short_key}", original_url=str(url.original_url))
+
+def link_query(short_key: str):
+    """Select the row of a short key."""
+    return select(URL).where(URL.short_key == short_key)
+
+def cache_ttl(link: URL | None = None) -> int:
+    """Redis TTL of a link, longer the more popular it is; new links get the shortest."""
+    return popularity_ttl((link.click_count or 0) if link is not None else 0)
+
+def local_lookup(short_key: str):
+    """
+    Look a key up in the in-process cache.
+
+    Returns:
+        The cached URL, or MISS
+
+    Raises:
+        HTTPException: 404 if the key is known not to exist
+    """
+    cached_url = local_cache.get(short_key)
+    if cached_url is None:
+        raise HTTPException(status_code=404, detail="URL not found")
+    return cached_url
+
+def not_found(short_key: str) -> HTTPException:
+    """Remember that a key doesn't exist and return the 404 to raise."""
+    local_cache.set(short_key, None)
+    return HTTPException(status_code=404, detail="URL not found")
+
+def redirect(short_key: str, original_url: str) -> RedirectResponse:
+    # Clicks are counted in memory and flushed in batches, so a redirect never writes
+    click_buffer.record(short_key)
+    return RedirectResponse(url=original_url)
@@ -0,0 +1,74 @@
+# Thread-pool variant of app.api.endpoints, served with ASYNC_ENDPOINTS=false
+# and kept as the baseline of the sync-vs-async benchmark
+from fastapi import APIRouter, Depends
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.api.links import (
+    cache_ttl, dedup_hash, existing_key_query, link_query, local_lookup, new_link,
+    not_found, redirect, shortened
+)
+from app.core.database import get_db
+from app.core.shortener import create_short_key
+from app.core.cache import (
+    MISS, get_url_from_cache, set_url_in_cache, publish_invalidation, get_cache_stats
+)
+from app.core.clicks import click_buffer
+from app.schemas.url import URLCreate, URLResponse
+
+router = APIRouter()
+
+@router.post("/shorten/", response_model=URLResponse)
+def create_short_url(url: URLCreate, db: Session = Depends(get_db)):
+    # In dedup mode, return the existing key of an already shortened URL
+    url_hash = dedup_hash(url)
+    short_key = None
+    if url_hash is not None:
+        short_key = db.scalar(existing_key_query(url_hash))
+        # End the read so its connection isn't held until the session is closed
+        db.rollback()
+
+    if short_key is None:
+        url_id, short_key = create_short_key()
+        db.add(new_link(url_id, short_key, url, url_hash))
+        try:
+            # No refresh: it would keep a connection checked out until the session
+            # is closed, which needs a free worker thread under load
+            db.commit()
+        except IntegrityError:
+            # Another request stored the same URL first
+            db.rollback()
+            if url_hash is None:
+                raise
+            short_key = db.scalar(existing_key_query(url_hash))
+        else:
+            # Add to cache; other processes may have cached the key as unknown
+            set_url_in_cache(short_key, str(url.original_url), cache_ttl())
+            publish_invalidation(short_key)
+
+    return shortened(short_key, url)
+
+@router.get("/stats/cache")
+def cache_stats():
+    return get_cache_stats()
+
+@router.get("/stats/clicks")
+def click_stats():
+    return click_buffer.get_stats()
+
+@router.get("/{short_key}")
+def redirect_to_url(short_key: str, db: Session = Depends(get_db)):
+    # Try the in-process cache, then Redis
+    cached_url = local_lookup(short_key)
+    if cached_url is MISS:
+        cached_url = get_url_from_cache(short_key)
+    if cached_url:
+        return redirect(short_key, cached_url)
+
+    # If not in cache, get from database
+    db_url = db.scalar(link_query(short_key))
+    if not db_url:
+        raise not_found(short_key)
+
+    response = redirect(short_key, db_url.original_url)
+    set_url_in_cache(short_key, db_url.original_url, cache_ttl(db_url))
+    return response
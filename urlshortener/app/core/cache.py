@@ -1,13 +1,150 @@
+import math
+import threading
+import time
+from collections import OrderedDict
 import redis
+import redis.asyncio
 from app.core.config import settings
 
 redis_client = redis.from_url(settings.REDIS_URL)
+async_redis_client = redis.asyncio.from_url(settings.REDIS_URL)
+
+INVALIDATION_CHANNEL = "url:invalidate"
+MISS = object()  # Returned by LocalCache.get when a key is not cached
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache of short key -> original URL.
+
+    Entries expire after `ttl` seconds, so a missed invalidation is only
+    stale for that long. Unknown keys are cached as None for `negative_ttl`
+    seconds, so probing them doesn't reach Redis or the database each time.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 5.0, negative_ttl: float = 1.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries: OrderedDict[str, tuple[str | None, float]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, short_key: str):
+        """Get the cached URL, None if the key is known not to exist, or MISS."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(short_key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self.entries[short_key]
+                self.stats["misses"] += 1
+                return MISS
+            self.entries.move_to_end(short_key)
+            self.stats["hits" if entry[0] is not None else "negative_hits"] += 1
+            return entry[0]
+
+    def set(self, short_key: str, original_url: str | None):
+        """Cache a URL, or None to remember that the key doesn't exist."""
+        ttl = self.ttl if original_url is not None else self.negative_ttl
+        with self.lock:
+            self.entries[short_key] = (original_url, time.monotonic() + ttl)
+            self.entries.move_to_end(short_key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def delete(self, short_key: str):
+        with self.lock:
+            self.entries.pop(short_key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+local_cache = LocalCache(
+    max_size=settings.LOCAL_CACHE_SIZE,
+    ttl=settings.LOCAL_CACHE_TTL,
+    negative_ttl=settings.LOCAL_CACHE_NEGATIVE_TTL
+)
+redis_stats = {"hits": 0, "misses": 0}
+
+def popularity_ttl(clicks: int) -> int:
+    """
+    Redis TTL of a link with `clicks` clicks.
+
+    Starts at CACHE_MIN_TTL and doubles with every tenfold increase in
+    clicks, up to CACHE_MAX_TTL, so popular links stay cached and one-off
+    links free their memory early.
+    """
+    ttl = settings.CACHE_MIN_TTL * 2 ** math.log10(max(clicks, 0) + 1)
+    return int(min(ttl, settings.CACHE_MAX_TTL))
 
 def get_url_from_cache(short_key: str) -> str | None:
-    return redis_client.get(f"url:{short_key}")
+    """Get a URL from Redis and keep it in the local tier."""
+    cached_url = redis_client.get(f"url:{short_key}")
+    if cached_url is None:
+        redis_stats["misses"] += 1
+        return None
+    redis_stats["hits"] += 1
+    original_url = cached_url.decode()
+    local_cache.set(short_key, original_url)
+    return original_url
+
+async def get_url_from_cache_async(short_key: str) -> str | None:
+    """Async `get_url_from_cache`."""
+    cached_url = await async_redis_client.get(f"url:{short_key}")
+    if cached_url is None:
+        redis_stats["misses"] += 1
+        return None
+    redis_stats["hits"] += 1
+    original_url = cached_url.decode()
+    local_cache.set(short_key, original_url)
+    return original_url
+
+def set_url_in_cache(short_key: str, original_url: str, ttl: int):
+    redis_client.setex(f"url:{short_key}", ttl, original_url)
+    local_cache.set(short_key, original_url)
+
+async def set_url_in_cache_async(short_key: str, original_url: str, ttl: int):
+    await async_redis_client.setex(f"url:{short_key}", ttl, original_url)
+    local_cache.set(short_key, original_url)
+
+def publish_invalidation(short_key: str):
+    """Drop a key from the local tier of every process."""
+    local_cache.delete(short_key)
+    redis_client.publish(INVALIDATION_CHANNEL, short_key)
+
+async def publish_invalidation_async(short_key: str):
+    local_cache.delete(short_key)
+    await async_redis_client.publish(INVALIDATION_CHANNEL, short_key)
+
+def invalidate_url(short_key: str):
+    """Drop a changed link from Redis and from the local tier of every process."""
+    redis_client.delete(f"url:{short_key}")
+    publish_invalidation(short_key)
+
+def _handle_invalidation(message):
+    local_cache.delete(message["data"].decode())
+
+def start_invalidation_listener():
+    """Subscribe to invalidations in a background thread; returns the thread."""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{INVALIDATION_CHANNEL: _handle_invalidation})
+    return pubsub.run_in_thread(sleep_time=1.0, daemon=True)
 
-def set_url_in_cache(short_key: str, original_url: str, expire_time: int = 3600):
-    redis_client.setex(f"url:{short_key}", expire_time, original_url)
+def get_cache_stats() -> dict:
+    """Hit ratio of each tier; the Redis tier only sees local misses."""
+    def ratio(hits, total):
+        return round(hits / total, 4) if total else None
 
-def increment_click_count(short_key: str):
-    redis_client.incr(f"clicks:{short_key}") 
\ No newline at end of file
+    local = dict(local_cache.stats)
+    local_lookups = local["hits"] + local["negative_hits"] + local["misses"]
+    redis_lookups = redis_stats["hits"] + redis_stats["misses"]
+    return {
+        "local": {
+            **local,
+            "size": len(local_cache.entries),
+            "hit_ratio": ratio(local["hits"] + local["negative_hits"], local_lookups)
+        },
+        "redis": {**redis_stats, "hit_ratio": ratio(redis_stats["hits"], redis_lookups)}
+    }
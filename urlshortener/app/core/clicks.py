@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import threading
+from collections import Counter
+from redis.exceptions import RedisError
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import SQLAlchemyError
+from app.core import cache
+from app.core.config import settings
+from app.core.database import async_engine
+from app.models.url import URL
+
+logger = logging.getLogger(__name__)
+
+class ClickBuffer:
+    """
+    Per-process click counts, flushed in batches.
+
+    Redirects only bump an in-memory counter. Every flush adds the counted
+    deltas to the Redis click counters with one pipelined INCRBY per key,
+    refreshes the cache TTL of the clicked keys, and adds the deltas to
+    `URL.click_count` with one bulk UPDATE per chunk of keys. Deltas that
+    fail to reach Redis or the database are kept and retried on the next
+    flush, so a short outage delays clicks instead of losing them.
+    """
+
+    def __init__(self, chunk_size: int = 500):
+        self.chunk_size = chunk_size
+        self.counts: Counter[str] = Counter()
+        self.retry_redis: Counter[str] = Counter()
+        self.retry_db: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        self.stats = {"recorded": 0, "flushes": 0, "flushed_keys": 0, "failed_flushes": 0}
+
+    def record(self, short_key: str, count: int = 1):
+        """Count a click; safe to call from the event loop and worker threads."""
+        with self.lock:
+            self.counts[short_key] += count
+            self.stats["recorded"] += count
+
+    def drain(self) -> Counter[str]:
+        """Take the clicks counted since the last drain."""
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+    async def flush_to_redis(self, deltas: Counter[str]) -> list[int]:
+        """Add the deltas to the Redis click counters; returns the new totals."""
+        async with cache.async_redis_client.pipeline(transaction=False) as pipe:
+            for short_key, delta in deltas.items():
+                pipe.incrby(f"clicks:{short_key}", delta)
+            return await pipe.execute()
+
+    async def refresh_ttls(self, short_keys, totals: list[int]):
+        """
+        Reset the cache TTL of clicked links to match their new popularity.
+
+        Hot keys are extended while they are being clicked, so they don't
+        expire and fall through to the database; expired keys are left alone.
+        """
+        async with cache.async_redis_client.pipeline(transaction=False) as pipe:
+            for short_key, total in zip(short_keys, totals):
+                pipe.expire(f"url:{short_key}", cache.popularity_ttl(total))
+            await pipe.execute()
+
+    async def flush_to_db(self, deltas: Counter[str]):
+        items = list(deltas.items())
+        async with async_engine.begin() as conn:
+            for start in range(0, len(items), self.chunk_size):
+                chunk = dict(items[start:start + self.chunk_size])
+                await conn.execute(
+                    update(URL)
+                    .where(URL.short_key.in_(chunk))
+                    .values(click_count=func.coalesce(URL.click_count, 0) + case(chunk, value=URL.short_key, else_=0))
+                )
+
+    async def flush(self) -> int:
+        """
+        Flush the counted clicks and any failed earlier deltas.
+
+        Returns:
+            The number of keys flushed
+        """
+        clicks = self.drain()
+        redis_deltas, self.retry_redis = self.retry_redis + clicks, Counter()
+        db_deltas, self.retry_db = self.retry_db + clicks, Counter()
+        if not redis_deltas and not db_deltas:
+            return 0
+        self.stats["flushes"] += 1
+        if redis_deltas:
+            try:
+                totals = await self.flush_to_redis(redis_deltas)
+            except RedisError:
+                logger.exception("Failed to flush %d click counters to Redis", len(redis_deltas))
+                self.retry_redis.update(redis_deltas)
+                self.stats["failed_flushes"] += 1
+            else:
+                try:
+                    await self.refresh_ttls(redis_deltas, totals)
+                except RedisError:
+                    # The counts are in; a missed refresh only lets keys expire
+                    logger.warning("Failed to refresh the TTL of %d cached links", len(redis_deltas))
+        if db_deltas:
+            try:
+                await self.flush_to_db(db_deltas)
+            except SQLAlchemyError:
+                logger.exception("Failed to flush %d click counters to the database", len(db_deltas))
+                self.retry_db.update(db_deltas)
+                self.stats["failed_flushes"] += 1
+        flushed = len(redis_deltas | db_deltas)
+        self.stats["flushed_keys"] += flushed
+        return flushed
+
+    async def flush_loop(self, interval_s: float):
+        """Flush every `interval_s` until cancelled, then once more."""
+        try:
+            while True:
+                await asyncio.sleep(interval_s)
+                await self.flush()
+        finally:
+            await self.flush()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            pending = len(self.counts)
+        return {
+            **self.stats,
+            "pending_keys": pending,
+            "retry_keys": len(self.retry_redis | self.retry_db)
+        }
+
+click_buffer = ClickBuffer(chunk_size=settings.CLICK_FLUSH_CHUNK)
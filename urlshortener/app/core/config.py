@@ -7,6 +7,22 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     REDIS_URL: str
     BASE_URL: str
+    KEY_LENGTH: int = 7
+    KEY_SEQUENCE: str = "db"  # "db" or "redis"
+    KEY_BLOCK_SIZE: int = 1000
+    SCRAMBLE_KEYS: bool = True
+    CACHE_MIN_TTL: int = 300
+    CACHE_MAX_TTL: int = 86400
+    CACHE_WARMUP_TOP_N: int = 10000
+    LOCAL_CACHE_SIZE: int = 10000
+    LOCAL_CACHE_TTL: float = 5.0
+    LOCAL_CACHE_NEGATIVE_TTL: float = 1.0
+    ASYNC_ENDPOINTS: bool = True
+    CLICK_FLUSH_INTERVAL: float = 1.0
+    CLICK_FLUSH_CHUNK: int = 500
+    BULK_CHUNK_SIZE: int = 1000
+    BULK_MAX_URLS: int = 1_000_000
+    DEDUP_URLS: bool = False
 
     class Config:
         env_file = ".env"
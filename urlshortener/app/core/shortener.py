@@ -1,13 +1,38 @@
+import asyncio
+import hashlib
+import math
 import string
-import random
+import threading
+from urllib.parse import urlsplit, urlunsplit
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
 
 ALPHABET = string.ascii_letters + string.digits
 BASE = len(ALPHABET)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Keys are KEY_LENGTH characters long. IDs start at the first value with that
+# many digits, so allocated keys never collide with the 6-character random
+# keys handed out before IDs were used.
+KEY_SPACE = BASE ** settings.KEY_LENGTH
+FIRST_ID = BASE ** (settings.KEY_LENGTH - 1)
+
+def _scramble_multiplier() -> int:
+    # Near KEY_SPACE / golden ratio, so consecutive IDs land far apart, and
+    # coprime with KEY_SPACE, so multiplying by it is invertible
+    multiplier = int(KEY_SPACE * (math.sqrt(5) - 1) / 2)
+    while math.gcd(multiplier, KEY_SPACE) != 1:
+        multiplier += 1
+    return multiplier
+
+SCRAMBLE_MULTIPLIER = _scramble_multiplier()
+SCRAMBLE_OFFSET = KEY_SPACE // 3
 
 def encode_base62(num: int) -> str:
     if num == 0:
         return ALPHABET[0]
-    
+
     arr = []
     while num:
         num, rem = divmod(num, BASE)
@@ -15,14 +40,169 @@ def encode_base62(num: int) -> str:
     arr.reverse()
     return ''.join(arr)
 
-def generate_short_key(length: int = 6) -> str:
-    """Generate a random short key."""
-    return ''.join(random.choices(ALPHABET, k=length))
-
-def create_unique_short_key(db, URL, length: int = 6) -> str:
-    """Create a unique short key that doesn't exist in the database."""
-    while True:
-        short_key = generate_short_key(length)
-        exists = db.query(URL).filter(URL.short_key == short_key).first()
-        if not exists:
-            return short_key 
\ No newline at end of file
+def decode_base62(key: str) -> int:
+    num = 0
+    for char in key:
+        num = num * BASE + ALPHABET.index(char)
+    return num
+
+def scramble(num: int) -> int:
+    """Map an ID to another ID in the key space; a bijection, so distinct IDs stay distinct."""
+    if not 0 <= num < KEY_SPACE:
+        raise ValueError(f"ID {num} is outside the key space")
+    return (num * SCRAMBLE_MULTIPLIER + SCRAMBLE_OFFSET) % KEY_SPACE
+
+def unscramble(num: int) -> int:
+    """Invert `scramble`."""
+    inverse = pow(SCRAMBLE_MULTIPLIER, -1, KEY_SPACE)
+    return (num - SCRAMBLE_OFFSET) * inverse % KEY_SPACE
+
+def encode_key(num: int, scrambled: bool = True) -> str:
+    """Encode an ID as a short key, optionally scrambled so consecutive IDs don't look sequential."""
+    if scrambled:
+        return encode_base62(scramble(num)).rjust(settings.KEY_LENGTH, ALPHABET[0])
+    return encode_base62(num)
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize the parts of a URL that don't change what it points to.
+
+    Scheme and host are lower-cased, default ports dropped and an empty path
+    becomes "/". Path, query and fragment are kept as they are, since
+    servers and client-side routers may treat them case- or order-sensitively.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if ":" in netloc:
+        netloc = f"[{netloc}]"  # IPv6
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
+
+def hash_url(url: str) -> bytes:
+    """Fixed-width SHA-256 digest of the normalized URL, for the dedup index."""
+    return hashlib.sha256(normalize_url(url).encode()).digest()
+
+class DatabaseSequence:
+    """ID sequence stored as a counter row in the database."""
+
+    def __init__(self, engine, name: str = "short_key"):
+        self.engine = engine
+        self.name = name
+
+    def lease(self, count: int) -> int:
+        """Reserve `count` consecutive IDs and return the first one."""
+        try:
+            return self._lease(count)
+        except IntegrityError:
+            # Another process created the counter row first; advance that one
+            return self._lease(count)
+
+    def _lease(self, count: int) -> int:
+        from app.models.sequence import KeySequence
+
+        advance = (
+            update(KeySequence)
+            .where(KeySequence.name == self.name)
+            .values(next_id=KeySequence.next_id + count)
+        )
+        # The lease commits on its own connection, so it survives a rolled back shorten
+        with self.engine.begin() as conn:
+            if conn.dialect.update_returning:
+                end = conn.execute(advance.returning(KeySequence.next_id)).scalar()
+            elif conn.execute(advance).rowcount:
+                # No UPDATE ... RETURNING (MySQL): the row stays locked by the
+                # update until commit, so reading it back sees our own value
+                end = conn.execute(
+                    select(KeySequence.next_id).where(KeySequence.name == self.name)
+                ).scalar()
+            else:
+                end = None
+            if end is None:
+                end = FIRST_ID + count
+                conn.execute(insert(KeySequence).values(name=self.name, next_id=end))
+        return end - count
+
+class RedisSequence:
+    """ID sequence stored as a Redis counter, advanced with INCRBY."""
+
+    def __init__(self, client, key: str = "sequence:short_key"):
+        self.client = client
+        self.key = key
+
+    def lease(self, count: int) -> int:
+        """Reserve `count` consecutive IDs and return the first one."""
+        end = self.client.incrby(self.key, count)
+        return FIRST_ID + end - count
+
+class KeyAllocator:
+    """
+    Hands out short keys from blocks of IDs leased from a sequence.
+
+    Every ID is leased exactly once, so keys are unique without checking
+    the database; one sequence round trip covers `block_size` keys. IDs of
+    a block that is not used up before a restart are skipped.
+    """
+
+    def __init__(self, sequence, block_size: int = 1000, scrambled: bool = True):
+        self.sequence = sequence
+        self.block_size = block_size
+        self.scrambled = scrambled
+        self.next_id = 0
+        self.end_id = 0
+        self.lock = threading.Lock()
+
+    def allocate_ids(self, count: int = 1) -> list[int]:
+        """Take `count` IDs, leasing new blocks as needed."""
+        ids = []
+        with self.lock:
+            while len(ids) < count:
+                if self.next_id >= self.end_id:
+                    size = max(self.block_size, count - len(ids))
+                    self.next_id = self.sequence.lease(size)
+                    self.end_id = self.next_id + size
+                take = min(count - len(ids), self.end_id - self.next_id)
+                ids.extend(range(self.next_id, self.next_id + take))
+                self.next_id += take
+        return ids
+
+    def allocate(self, count: int = 1) -> list[tuple[int, str]]:
+        """Take `count` (ID, short key) pairs."""
+        return [(num, encode_key(num, self.scrambled)) for num in self.allocate_ids(count)]
+
+    async def allocate_async(self, count: int = 1) -> list[tuple[int, str]]:
+        """`allocate` for the event loop; only leasing a new block runs in a thread."""
+        with self.lock:
+            if self.end_id - self.next_id >= count:
+                ids = range(self.next_id, self.next_id + count)
+                self.next_id += count
+                return [(num, encode_key(num, self.scrambled)) for num in ids]
+        return await asyncio.to_thread(self.allocate, count)
+
+def create_key_allocator() -> KeyAllocator:
+    if settings.KEY_SEQUENCE == "redis":
+        from app.core.cache import redis_client
+        sequence = RedisSequence(redis_client)
+    else:
+        from app.core.database import engine
+        sequence = DatabaseSequence(engine)
+    return KeyAllocator(sequence, block_size=settings.KEY_BLOCK_SIZE, scrambled=settings.SCRAMBLE_KEYS)
+
+key_allocator = create_key_allocator()
+
+def create_short_key() -> tuple[int, str]:
+    """
+    Create a row ID and its short key.
+
+    Both are unique by construction, so no existence query is needed. Using
+    the ID as the primary key keeps key and row one-to-one.
+    """
+    return key_allocator.allocate()[0]
+
+async def create_short_key_async() -> tuple[int, str]:
+    """Async `create_short_key`."""
+    return (await key_allocator.allocate_async())[0]
@@ -0,0 +1,47 @@
+import logging
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from app.core import cache
+from app.core.database import async_engine
+from app.models.url import URL
+
+logger = logging.getLogger(__name__)
+
+WARMUP_LOCK = "warmup:lock"
+WARMUP_LOCK_TTL = 300  # Other processes starting within this window skip the warm-up
+WARMUP_CHUNK = 1000
+
+async def warm_cache(top_n: int) -> int:
+    """
+    Load the `top_n` most clicked links into Redis.
+
+    Rows are read in one query using the click_count index and written with
+    one pipelined SETEX round trip per chunk, each with its popularity TTL.
+    Only the first process to start within WARMUP_LOCK_TTL seconds warms the
+    cache. Failures are logged, since a cold cache only costs database reads.
+
+    Returns:
+        The number of links loaded
+    """
+    if top_n <= 0:
+        return 0
+    try:
+        if not await cache.async_redis_client.set(WARMUP_LOCK, 1, nx=True, ex=WARMUP_LOCK_TTL):
+            return 0
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(
+                select(URL.short_key, URL.original_url, URL.click_count)
+                .order_by(URL.click_count.desc())
+                .limit(top_n)
+            )).all()
+        for start in range(0, len(rows), WARMUP_CHUNK):
+            async with cache.async_redis_client.pipeline(transaction=False) as pipe:
+                for row in rows[start:start + WARMUP_CHUNK]:
+                    pipe.setex(f"url:{row.short_key}", cache.popularity_ttl(row.click_count or 0), row.original_url)
+                await pipe.execute()
+    except (RedisError, SQLAlchemyError):
+        logger.exception("Cache warm-up failed")
+        return 0
+    logger.info("Warmed the cache with %d links", len(rows))
+    return len(rows)
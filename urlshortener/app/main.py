@@ -1,18 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.endpoints import router
-from app.core.database import engine
-from app.models import url
+from app.api import bulk, endpoints, sync_endpoints
+from app.core.cache import async_redis_client, start_invalidation_listener
+from app.core.clicks import click_buffer
+from app.core.config import settings
+from app.core.database import async_engine, engine
+from app.core.warmup import warm_cache
+from app.models import url, sequence
 
 # Create database tables
 url.Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Drop local cache entries when another process changes a link
+    listener = start_invalidation_listener()
+    flusher = asyncio.create_task(click_buffer.flush_loop(settings.CLICK_FLUSH_INTERVAL))
+    # Load the most clicked links into Redis without delaying startup
+    warmup = asyncio.create_task(warm_cache(settings.CACHE_WARMUP_TOP_N))
+    yield
+    warmup.cancel()
+    flusher.cancel()
+    try:
+        await flusher
+    except asyncio.CancelledError:
+        pass
+    listener.stop()
+    await async_redis_client.aclose()
+    await async_engine.dispose()
+
 app = FastAPI(
     title="URL Shortener",
     description="A simple URL shortening service",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-app.include_router(router)
+app.include_router(bulk.router)
+# Async handlers by default; the sync ones run in FastAPI's thread pool
+app.include_router(endpoints.router if settings.ASYNC_ENDPOINTS else sync_endpoints.router)
 
 @app.get("/")
 def read_root():
@@ -20,6 +47,9 @@ def read_root():
         "message": "Welcome to URL Shortener API",
         "endpoints": {
             "Shorten URL": "/shorten/",
-            "Access shortened URL": "/{short_key}"
+            "Shorten URLs in bulk": "/shorten/bulk",
+            "Access shortened URL": "/{short_key}",
+            "Cache statistics": "/stats/cache",
+            "Click statistics": "/stats/clicks"
         }
     } 
\ No newline at end of file
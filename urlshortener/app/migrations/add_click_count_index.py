@@ -0,0 +1,21 @@
+"""
+Index urls.click_count, used by the startup cache warm-up to find the most
+clicked links without a table scan. Safe to run again. Run from the
+urlshortener directory:
+    python -m app.migrations.add_click_count_index
+"""
+from sqlalchemy import Index, inspect
+from app.core.database import engine
+from app.models.url import URL
+
+def migrate():
+    with engine.begin() as conn:
+        indexes = {index["name"] for index in inspect(conn).get_indexes("urls")}
+        if "ix_urls_click_count" in indexes:
+            print("click_count index already exists")
+            return
+        Index("ix_urls_click_count", URL.click_count).create(conn)
+    print("Added click_count index")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,76 @@
+"""
+Add the url_hash dedup column to an existing urls table.
+
+Adds the column and its unique index, fills in the hash of every row in
+batches and drops the index on original_url. For URLs stored more than
+once, only the oldest row gets the hash; the others keep NULL and still
+redirect. Safe to run again, e.g. after enabling DEDUP_URLS on a table
+written without it. Run from the urlshortener directory:
+    python -m app.migrations.add_url_hash
+"""
+import argparse
+from sqlalchemy import Index, LargeBinary, bindparam, inspect, select, text, update
+from app.core.database import engine
+from app.core.shortener import hash_url
+from app.models.url import URL
+
+def add_column(conn) -> bool:
+    columns = {column["name"] for column in inspect(conn).get_columns("urls")}
+    if "url_hash" in columns:
+        return False
+    column_type = LargeBinary(32).compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE urls ADD COLUMN url_hash {column_type}"))
+    return True
+
+def update_indexes(conn):
+    indexes = {index["name"] for index in inspect(conn).get_indexes("urls")}
+    if "ix_urls_url_hash" not in indexes:
+        Index("ix_urls_url_hash", URL.url_hash, unique=True).create(conn)
+    if "ix_urls_original_url" in indexes:
+        Index("ix_urls_original_url", URL.original_url).drop(conn)
+
+def backfill(batch_size: int) -> tuple[int, int]:
+    """
+    Hash every row without a hash, one committed batch at a time.
+
+    Returns:
+        The number of rows hashed and of duplicate rows left without a hash
+    """
+    hashed = duplicates = 0
+    last_id = None
+    while True:
+        with engine.begin() as conn:
+            query = select(URL.id, URL.original_url).where(URL.url_hash.is_(None)).order_by(URL.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(URL.id > last_id)
+            rows = conn.execute(query).all()
+            if not rows:
+                return hashed, duplicates
+            last_id = rows[-1].id
+
+            first = {}
+            for row in rows:
+                first.setdefault(hash_url(row.original_url), row.id)
+            existing = set(conn.execute(select(URL.url_hash).where(URL.url_hash.in_(first))).scalars())
+            updates = [{"row_id": row_id, "hash": url_hash} for url_hash, row_id in first.items() if url_hash not in existing]
+            if updates:
+                conn.execute(
+                    update(URL.__table__).where(URL.id == bindparam("row_id")).values(url_hash=bindparam("hash")),
+                    updates
+                )
+            hashed += len(updates)
+            duplicates += len(rows) - len(updates)
+
+def migrate(batch_size: int = 5000):
+    with engine.begin() as conn:
+        added = add_column(conn)
+        update_indexes(conn)
+    print("Added url_hash column" if added else "url_hash column already exists")
+    hashed, duplicates = backfill(batch_size)
+    print(f"Hashed {hashed} rows; {duplicates} duplicate rows keep no hash")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add and fill the url_hash dedup column")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    migrate(args.batch_size)
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, String, BigInteger
+from app.core.database import Base
+
+class KeySequence(Base):
+    __tablename__ = "key_sequences"
+
+    name = Column(String, primary_key=True)
+    next_id = Column(BigInteger, nullable=False)
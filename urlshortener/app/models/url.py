@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, LargeBinary
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -6,7 +6,9 @@ class URL(Base):
     __tablename__ = "urls"
 
     id = Column(BigInteger, primary_key=True, index=True)
-    original_url = Column(String, index=True)
+    original_url = Column(String)
+    # SHA-256 of the normalized URL; set in dedup mode, looked up instead of original_url
+    url_hash = Column(LargeBinary(32), unique=True, index=True, nullable=True)
     short_key = Column(String, unique=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    click_count = Column(Integer, default=0) 
\ No newline at end of file
+    click_count = Column(Integer, default=0, index=True) 
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+Load benchmark of the sync and async request paths.
+
+Starts the app once per path with a fresh SQLite database and drives it
+with a local aiohttp load generator. Run from the urlshortener directory:
+    python benchmark.py --links 2000 --requests 20000 --concurrency 200
+    python benchmark.py --fake-redis --no-local-cache --json results.json
+
+--fake-redis serves Redis from fakeredis in the server process
+(pip install fakeredis); otherwise REDIS_URL must point at a Redis server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+PATHS = {"sync": "false", "async": "true"}
+
+def summarize(latencies_ns: list[int], elapsed_s: float) -> dict:
+    """Reduce request latencies to requests/s and p50/p99/max in milliseconds."""
+    latencies_ns = sorted(latencies_ns)
+    count = len(latencies_ns)
+
+    def percentile(p: float) -> float:
+        if not count:
+            return 0.0
+        return round(latencies_ns[min(count - 1, int(p * count))] / 1e6, 2)
+
+    return {
+        "requests": count,
+        "requests_per_sec": int(count / elapsed_s) if elapsed_s else 0,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+        "max_ms": percentile(1.0)
+    }
+
+def serve(port: int, fake_redis: bool) -> None:
+    """Run the app in this process; called in the server subprocess."""
+    import uvicorn
+
+    if fake_redis:
+        import fakeredis
+        from app.core import cache
+
+        server = fakeredis.FakeServer()
+        cache.redis_client = fakeredis.FakeRedis(server=server)
+        cache.async_redis_client = fakeredis.FakeAsyncRedis(server=server)
+    from app.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _wait_for_server(session, base: str, server: subprocess.Popen, timeout_s: float = 30.0) -> None:
+    import aiohttp
+
+    deadline = time.monotonic() + timeout_s
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            async with session.get(f"{base}/stats/cache") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not start")
+        await asyncio.sleep(0.1)
+
+async def _run_load(request, count: int, concurrency: int) -> dict:
+    """Issue `count` requests from `concurrency` clients; `request(i)` sends the i-th."""
+    latencies: list[int] = []
+    next_index = 0
+
+    async def client() -> None:
+        nonlocal next_index
+        while next_index < count:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter_ns()
+            await request(index)
+            latencies.append(time.perf_counter_ns() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+async def _drive(server: subprocess.Popen, port: int, links: int, requests: int, concurrency: int) -> dict:
+    import aiohttp
+
+    base = f"http://127.0.0.1:{port}"
+    keys: list[str] = []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await _wait_for_server(session, base, server)
+
+        async def shorten(index: int) -> None:
+            payload = {"original_url": f"https://example.com/page/{index}"}
+            async with session.post(f"{base}/shorten/", json=payload) as response:
+                keys.append((await response.json())["short_url"].rsplit("/", 1)[1])
+
+        async def redirect(index: int) -> None:
+            # Skewed toward a few popular links, like real traffic
+            key = keys[min(int(random.paretovariate(1.2)) - 1, len(keys) - 1)]
+            async with session.get(f"{base}/{key}", allow_redirects=False) as response:
+                if response.status != 307:
+                    raise RuntimeError(f"redirect failed with {response.status}")
+
+        results = {"shorten": await _run_load(shorten, links, concurrency)}
+        random.shuffle(keys)
+        results["redirect"] = await _run_load(redirect, requests, concurrency)
+        async with session.get(f"{base}/stats/cache") as response:
+            results["cache"] = await response.json()
+    return results
+
+def bench_path(path: str, links: int, requests: int, concurrency: int,
+               fake_redis: bool, local_cache: bool) -> dict:
+    """Benchmark one request path against a fresh database."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{directory}/benchmark.db",
+            "REDIS_URL": os.getenv("REDIS_URL", "redis://localhost:6379"),
+            "BASE_URL": f"http://127.0.0.1:{port}",
+            "ASYNC_ENDPOINTS": PATHS[path],
+        }
+        if not local_cache:
+            env["LOCAL_CACHE_SIZE"] = "0"
+        command = [sys.executable, __file__, "serve", "--port", str(port)]
+        if fake_redis:
+            command.append("--fake-redis")
+        server = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            return {"path": path, **asyncio.run(_drive(server, port, links, requests, concurrency))}
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sync and async request paths")
+    parser.add_argument("mode", nargs="?", choices=["run", "serve"], default="run")
+    parser.add_argument("--paths", nargs="+", choices=list(PATHS), default=list(PATHS))
+    parser.add_argument("--links", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--fake-redis", action="store_true")
+    parser.add_argument("--no-local-cache", action="store_true", help="Send every redirect to Redis")
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        serve(args.port, args.fake_redis)
+        sys.exit(0)
+
+    results = []
+    for path in args.paths:
+        result = bench_path(path, args.links, args.requests, args.concurrency,
+                            args.fake_redis, not args.no_local_cache)
+        results.append(result)
+        for phase in ("shorten", "redirect"):
+            stats = result[phase]
+            print(f"{path:>5} {phase:<8} {stats['requests_per_sec']:>7} req/s  "
+                  f"p50 {stats['p50_ms']:>7} ms  p99 {stats['p99_ms']:>7} ms  max {stats['max_ms']:>7} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)